@@ -0,0 +1,320 @@
+import base64
+import binascii
+import json
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+
+import anyio
+from starlette.applications import Starlette
+from starlette.exceptions import HTTPException
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+from auditoria import SistemaAuditoria100Efetivo
+from catalogo_regras import CAMINHO_CATALOGO_PADRAO, FonteRegras
+from extracao_pdf import extrair_texto, iterar_paginas
+from instrumentacao import InstrumentacaoRegras
+
+# --------------------------------------------------
+# API HTTP DO AUDITOR
+# --------------------------------------------------
+#
+# Uso:
+#   python api_auditoria.py --porta 8000 --workers 4
+#   uvicorn api_auditoria:app --workers 4
+#
+# Rotas:
+#   POST /auditar        corpo application/pdf (bytes do PDF), text/plain
+#                        (texto já extraído) ou JSON {"texto": ...} /
+#                        {"pdf_base64": ...}; com ?stream=1 responde em
+#                        NDJSON, um evento por página e o resultado no fim
+#                        (texto já extraído: só o resultado)
+#   POST /auditar/lote   JSON {"documentos": [{"id": ..., "texto" | "pdf_base64": ...}]};
+#                        responde em NDJSON, uma linha por documento
+#   GET  /saude          versão das regras e processo
+#   GET  /metricas       instrumentação das regras no formato do Prometheus
+#
+# Cada processo monta um único auditor, já na inicialização, e o reutiliza
+# em todas as requisições. O paralelismo vem de vários workers do uvicorn.
+
+MAXIMO_BYTES = int(float(os.environ.get('BUROCRATA_API_MAXIMO_MB', 50)) * 1024 * 1024)
+MAXIMO_LOTE = int(os.environ.get('BUROCRATA_API_MAXIMO_LOTE', 64))
+
+# Análises simultâneas por processo. A análise disputa o GIL: mais de uma
+# ao mesmo tempo não aumenta a vazão e infla o tempo medido de cada regra,
+# que é o que o orçamento limita.
+CONCORRENCIA = int(os.environ.get('BUROCRATA_API_CONCORRENCIA', 1))
+
+TIPOS_PDF = ('application/pdf', 'application/octet-stream')
+
+_fonte_regras = None
+_auditoria = None
+_instrumentacao = InstrumentacaoRegras()
+_lock = threading.Lock()
+_limitador = None
+
+
+def obter_auditoria():
+    """Auditor do processo, refeito apenas quando o catálogo muda"""
+    global _fonte_regras, _auditoria
+    with _lock:
+        if _fonte_regras is None:
+            _fonte_regras = FonteRegras(os.environ.get('BUROCRATA_CATALOGO', CAMINHO_CATALOGO_PADRAO))
+
+        regras = _fonte_regras.atuais()
+        if _auditoria is None or _auditoria.regras is not regras:
+            # Tempo máximo de cada regra por documento; 0 desliga o limite
+            orcamento_ms = float(os.environ.get('BUROCRATA_ORCAMENTO_REGRA_MS', 250))
+            _auditoria = SistemaAuditoria100Efetivo(
+                instrumentacao=_instrumentacao,
+                orcamento_regra_segundos=orcamento_ms / 1000 or None,
+                regras=regras
+            )
+        return _auditoria
+
+
+def _executar(funcao, *args):
+    """Roda a análise fora do loop de eventos, respeitando CONCORRENCIA"""
+    return anyio.to_thread.run_sync(funcao, *args, limiter=_limitador)
+
+
+# --------------------------------------------------
+# ANÁLISE
+# --------------------------------------------------
+
+def montar_resultado(auditoria, problemas, inconclusivos):
+    return {
+        'status': 'ok',
+        'problemas': problemas,
+        'metricas': auditoria.gerar_metricas_avancadas(problemas),
+        'inconclusivos': inconclusivos,
+        'versao_regras': auditoria.versao_regras
+    }
+
+
+def auditar_documento(texto=None, pdf=None):
+    """Resultado de um documento, no mesmo formato de status da auditoria em lote"""
+    auditoria = obter_auditoria()
+    inicio = time.perf_counter()
+
+    try:
+        if pdf is not None:
+            # O paralelismo é entre workers: extração serial dentro do processo
+            texto = extrair_texto(pdf, trabalhadores=1)
+
+        if not texto.strip():
+            resultado = {'status': 'sem_texto', 'versao_regras': auditoria.versao_regras}
+        else:
+            resultado = montar_resultado(auditoria, *auditoria.analisar_contrato_guardado(texto))
+    except Exception as e:
+        resultado = {'status': 'erro', 'erro': f"Erro ao processar documento: {str(e)}"}
+
+    resultado['duracao'] = round(time.perf_counter() - inicio, 4)
+    return resultado
+
+
+def _proxima_pagina(paginas, analise):
+    """Extrai e analisa a próxima página; False quando o PDF acabou"""
+    texto_pagina = next(paginas, None)
+    if texto_pagina is None:
+        return False
+    analise.adicionar_pagina(texto_pagina)
+    return True
+
+
+async def _eventos_paginas(texto=None, pdf=None):
+    """Eventos NDJSON de uma análise página a página"""
+    if pdf is None:
+        # Texto já extraído não tem páginas: mesmo caminho, e mesmas
+        # posições, de /auditar sem stream
+        resultado = await _executar(lambda: auditar_documento(texto=texto))
+        yield _linha({'evento': 'resultado', **resultado})
+        return
+
+    auditoria = obter_auditoria()
+    inicio = time.perf_counter()
+    analise = auditoria.iniciar_analise_incremental()
+    paginas = iterar_paginas(pdf, trabalhadores=1)
+
+    try:
+        while await _executar(_proxima_pagina, paginas, analise):
+            parciais = analise.problemas()
+            yield _linha({
+                'evento': 'pagina',
+                'pagina': analise.paginas,
+                'total_problemas': len(parciais),
+                'ids': [p['id'] for p in parciais]
+            })
+
+        if analise.tem_texto:
+            resultado = montar_resultado(auditoria, await _executar(analise.finalizar), analise.inconclusivos())
+        else:
+            resultado = {'status': 'sem_texto', 'versao_regras': auditoria.versao_regras}
+    except Exception as e:
+        resultado = {'status': 'erro', 'erro': f"Erro ao processar documento: {str(e)}"}
+    finally:
+        # Fecha o PDF também quando o cliente desiste no meio
+        paginas.close()
+
+    resultado['paginas'] = analise.paginas
+    resultado['duracao'] = round(time.perf_counter() - inicio, 4)
+    yield _linha({'evento': 'resultado', **resultado})
+
+
+async def _eventos_lote(documentos):
+    for documento in documentos:
+        resultado = await _executar(lambda: auditar_documento(**documento['entrada']))
+        yield _linha({'id': documento['id'], **resultado})
+
+
+def _linha(dados):
+    return json.dumps(dados, ensure_ascii=False) + '\n'
+
+
+# --------------------------------------------------
+# ENTRADA
+# --------------------------------------------------
+
+async def _ler_corpo(request):
+    """Corpo da requisição, recusando o que passar de MAXIMO_BYTES"""
+    tamanho_declarado = request.headers.get('content-length')
+    if tamanho_declarado and tamanho_declarado.isdigit() and int(tamanho_declarado) > MAXIMO_BYTES:
+        raise HTTPException(413, f"Corpo maior que {MAXIMO_BYTES} bytes")
+
+    partes = []
+    total = 0
+    async for parte in request.stream():
+        total += len(parte)
+        if total > MAXIMO_BYTES:
+            raise HTTPException(413, f"Corpo maior que {MAXIMO_BYTES} bytes")
+        partes.append(parte)
+    return b''.join(partes)
+
+
+def _entrada_json(dados, onde='corpo'):
+    """Argumentos de auditar_documento a partir de {"texto"} ou {"pdf_base64"}"""
+    if not isinstance(dados, dict):
+        raise HTTPException(400, f"{onde}: esperado um objeto JSON")
+
+    if isinstance(dados.get('texto'), str):
+        return {'texto': dados['texto']}
+    if isinstance(dados.get('pdf_base64'), str):
+        try:
+            return {'pdf': base64.b64decode(dados['pdf_base64'], validate=True)}
+        except binascii.Error:
+            raise HTTPException(400, f"{onde}: pdf_base64 inválido")
+    raise HTTPException(400, f"{onde}: informe 'texto' ou 'pdf_base64'")
+
+
+def _decodificar_json(corpo):
+    try:
+        return json.loads(corpo)
+    except ValueError:
+        raise HTTPException(400, "JSON inválido")
+
+
+async def _ler_entrada(request):
+    corpo = await _ler_corpo(request)
+    tipo = request.headers.get('content-type', '').split(';')[0].strip().lower()
+
+    if tipo in TIPOS_PDF:
+        return {'pdf': corpo}
+    if tipo == 'text/plain':
+        try:
+            return {'texto': corpo.decode('utf-8')}
+        except UnicodeDecodeError:
+            raise HTTPException(400, "Texto deve estar em UTF-8")
+    if tipo == 'application/json':
+        return _entrada_json(_decodificar_json(corpo))
+    raise HTTPException(415, "Use application/pdf, text/plain ou application/json")
+
+
+# --------------------------------------------------
+# ROTAS
+# --------------------------------------------------
+
+async def auditar(request):
+    entrada = await _ler_entrada(request)
+
+    if request.query_params.get('stream') in ('1', 'true'):
+        return StreamingResponse(_eventos_paginas(**entrada), media_type='application/x-ndjson')
+
+    resultado = await _executar(lambda: auditar_documento(**entrada))
+    return JSONResponse(resultado, status_code=422 if resultado['status'] == 'erro' else 200)
+
+
+async def auditar_lote(request):
+    dados = _decodificar_json(await _ler_corpo(request))
+    documentos = dados.get('documentos') if isinstance(dados, dict) else None
+    if not isinstance(documentos, list) or not documentos:
+        raise HTTPException(400, "Informe 'documentos' com ao menos um item")
+    if len(documentos) > MAXIMO_LOTE:
+        raise HTTPException(413, f"Lote com mais de {MAXIMO_LOTE} documentos")
+
+    # Toda a entrada é validada antes de começar a responder
+    validados = [
+        {
+            'id': documento.get('id', indice) if isinstance(documento, dict) else indice,
+            'entrada': _entrada_json(documento, f"documentos[{indice}]")
+        }
+        for indice, documento in enumerate(documentos)
+    ]
+    return StreamingResponse(_eventos_lote(validados), media_type='application/x-ndjson')
+
+
+async def saude(request):
+    auditoria = obter_auditoria()
+    return JSONResponse({
+        'status': 'ok',
+        'versao_regras': auditoria.versao_regras,
+        'erro_catalogo': _fonte_regras.ultimo_erro,
+        'pid': os.getpid()
+    })
+
+
+async def metricas(request):
+    return PlainTextResponse(_instrumentacao.exportar_prometheus(), media_type='text/plain; version=0.0.4')
+
+
+async def _erro_http(request, exc):
+    return JSONResponse({'status': 'erro', 'erro': exc.detail}, status_code=exc.status_code)
+
+
+@asynccontextmanager
+async def _ciclo_de_vida(app):
+    global _limitador
+    _limitador = anyio.CapacityLimiter(CONCORRENCIA)
+    # Regras e motor prontos antes da primeira requisição
+    await anyio.to_thread.run_sync(obter_auditoria)
+    yield
+
+
+app = Starlette(
+    routes=[
+        Route('/auditar', auditar, methods=['POST']),
+        Route('/auditar/lote', auditar_lote, methods=['POST']),
+        Route('/saude', saude),
+        Route('/metricas', metricas),
+    ],
+    exception_handlers={HTTPException: _erro_http},
+    lifespan=_ciclo_de_vida
+)
+
+
+def main(argv=None):
+    import argparse
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Servidor HTTP do auditor de contratos")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=1, help="Processos do servidor, cada um com seu auditor")
+    args = parser.parse_args(argv)
+
+    uvicorn.run('api_auditoria:app', host=args.host, port=args.porta, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
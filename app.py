@@ -1,10 +1,26 @@
 import streamlit as st
-import pdfplumber
-import re
-import unicodedata
+import hashlib
+import html
+import importlib
+import os
 from datetime import datetime
-import pandas as pd
-import io
+import json
+import sqlite3
+import time
+import uuid
+
+import aquecimento
+from auditoria import SistemaAuditoria100Efetivo
+from catalogo_regras import CAMINHO_CATALOGO_PADRAO, FonteRegras
+from cache_resultados import CacheResultados
+from instrumentacao import InstrumentacaoRegras
+from fila_auditorias import FilaAuditorias, FilaCheia, NA_FILA, ERRO
+from renderizacao import renderizar_cards
+from exportacao import CacheExportacoes, formatos_disponiveis, gerar_localizacoes, nome_arquivo, tipo_mime
+from extracao_pdf import OCR_ATIVO, extrair_documentos, iterar_paginas, ocr_disponivel
+from indice_corpus import IndiceCorpus
+from ocorrencias import TabelaOcorrencias
+from similaridade import IndiceModelos
 
 # --------------------------------------------------
 # CONFIGURAÇÃO
@@ -19,795 +35,411 @@ st.set_page_config(
 # --------------------------------------------------
 # ESTILOS PROFISSIONAIS - TEMA ESCURO COM DOURADO
 # --------------------------------------------------
-st.markdown("""
-<style>
-    /* Fundo preto e texto branco */
-    .stApp {
-        background-color: #000000;
-        color: #ffffff;
-    }
-    
-    /* Títulos e texto geral */
-    h1, h2, h3, h4, h5, h6, p, span, div, label {
-        color: #ffffff !important;
-    }
-    
-    /* Inputs e file uploaders - PRETO COM BORDA DOURADA MELHORADO */
-    .stFileUploader > div {
-        background-color: #000000 !important;
-    }
-    
-    .stFileUploader > div > div {
-        background-color: #000000 !important;
-        border: 2px solid #d4af37 !important;
-        border-radius: 15px !important;
-        color: #ffffff !important;
-    }
-    
-    .stFileUploader > div > div:hover {
-        border-color: #e6c158 !important;
-        box-shadow: 0 0 15px rgba(212, 175, 55, 0.3) !important;
-    }
-    
-    .stFileUploader label {
-        color: #ffffff !important;
-        font-weight: 600 !important;
-    }
-    
-    .stFileUploader label p {
-        color: #cccccc !important;
-        font-weight: normal !important;
-    }
-    
-    /* Ícone dentro do file uploader */
-    .stFileUploader > div > div svg {
-        fill: #d4af37 !important;
-    }
-    
-    /* Texto dentro do file uploader */
-    .stFileUploader > div > div span {
-        color: #ffffff !important;
-    }
-    
-    /* Botões do Streamlit */
-    .stButton > button {
-        background: linear-gradient(135deg, #d4af37, #b8941f) !important;
-        color: #000000 !important;
-        border: none !important;
-        padding: 12px 30px !important;
-        border-radius: 25px !important;
-        font-weight: 700 !important;
-        font-size: 1em !important;
-        transition: all 0.3s ease !important;
-        text-transform: uppercase !important;
-        letter-spacing: 1px !important;
-    }
-    
-    .stButton > button:hover {
-        background: linear-gradient(135deg, #e6c158, #d4af37) !important;
-        transform: translateY(-2px) !important;
-        box-shadow: 0 5px 15px rgba(212, 175, 55, 0.4) !important;
-    }
-    
-    /* Cabeçalho principal */
-    .main-header {
-        text-align: center;
-        padding: 30px;
-        background: linear-gradient(135deg, #000000 0%, #1a1a1a 100%);
-        color: #ffffff;
-        border-radius: 15px;
-        margin-bottom: 40px;
-        box-shadow: 0 10px 30px rgba(212, 175, 55, 0.2);
-        border: 2px solid #d4af37;
-    }
-    
-    /* Cartões de métricas */
-    .metric-card {
-        background: rgba(26, 26, 26, 0.9);
-        padding: 25px;
-        border-radius: 15px;
-        box-shadow: 0 5px 15px rgba(0, 0, 0, 0.3);
-        text-align: center;
-        border-top: 4px solid;
-        border-left: 1px solid #d4af37;
-        border-right: 1px solid #d4af37;
-        transition: transform 0.3s ease;
-    }
-    
-    .metric-card:hover {
-        transform: translateY(-5px);
-        box-shadow: 0 8px 25px rgba(212, 175, 55, 0.3);
-    }
-    
-    /* Container de ícones de problemas */
-    .problems-icons-container {
-        background: rgba(20, 20, 20, 0.9);
-        padding: 30px;
-        border-radius: 15px;
-        margin: 30px 0;
-        box-shadow: 0 5px 15px rgba(0, 0, 0, 0.4);
-        border: 1px solid rgba(212, 175, 55, 0.3);
-        text-align: center;
-    }
-    
-    /* Ícones de problemas - CAIXAS VERMELHAS */
-    .problem-icon {
-        display: inline-block;
-        margin: 15px;
-        padding: 20px;
-        border-radius: 15px;
-        background: rgba(30, 30, 30, 0.9);
-        transition: all 0.3s ease;
-        cursor: pointer;
-        position: relative;
-        min-width: 100px;
-        border: 2px solid transparent;
-    }
-    
-    .problem-icon:hover {
-        transform: translateY(-5px) scale(1.05);
-        box-shadow: 0 10px 25px rgba(212, 175, 55, 0.3);
-    }
-    
-    .critical-icon {
-        border-color: #ff4444 !important;
-        background: rgba(255, 68, 68, 0.15) !important;
-        box-shadow: 0 5px 15px rgba(255, 68, 68, 0.2) !important;
-    }
-    
-    .critical-icon:hover {
-        border-color: #ff4444 !important;
-        background: rgba(255, 68, 68, 0.25) !important;
-        box-shadow: 0 10px 25px rgba(255, 68, 68, 0.3) !important;
-    }
-    
-    .medium-icon {
-        border-color: #ffaa44 !important;
-        background: rgba(255, 170, 68, 0.15) !important;
-        box-shadow: 0 5px 15px rgba(255, 170, 68, 0.2) !important;
-    }
-    
-    .medium-icon:hover {
-        border-color: #ffaa44 !important;
-        background: rgba(255, 170, 68, 0.25) !important;
-        box-shadow: 0 10px 25px rgba(255, 170, 68, 0.3) !important;
-    }
-    
-    .low-icon {
-        border-color: #44aaff !important;
-        background: rgba(68, 170, 255, 0.15) !important;
-        box-shadow: 0 5px 15px rgba(68, 170, 255, 0.2) !important;
-    }
-    
-    .low-icon:hover {
-        border-color: #44aaff !important;
-        background: rgba(68, 170, 255, 0.25) !important;
-        box-shadow: 0 10px 25px rgba(68, 170, 255, 0.3) !important;
-    }
-    
-    .icon-emoji {
-        font-size: 2.5em;
-        margin-bottom: 10px;
-        display: block;
-    }
-    
-    .icon-title {
-        font-size: 0.9em;
-        font-weight: bold;
-        color: #ffffff;
-        margin: 5px 0;
-    }
-    
-    .icon-severity {
-        font-size: 0.75em;
-        padding: 3px 10px;
-        border-radius: 12px;
-        display: inline-block;
-        font-weight: bold;
-    }
-    
-    .severity-critical {
-        background: #ff4444;
-        color: white;
-    }
-    
-    .severity-medium {
-        background: #ffaa44;
-        color: white;
-    }
-    
-    .severity-low {
-        background: #44aaff;
-        color: white;
-    }
-    
-    /* TOOLTIP COMPLETO COM TODOS OS DETALHES */
-    .problem-tooltip {
-        position: absolute;
-        bottom: 100%;
-        left: 50%;
-        transform: translateX(-50%);
-        background: rgba(0, 0, 0, 0.98);
-        color: white;
-        padding: 25px;
-        border-radius: 15px;
-        width: 500px;
-        box-shadow: 0 15px 35px rgba(0, 0, 0, 0.8);
-        border: 2px solid #d4af37;
-        z-index: 1000;
-        opacity: 0;
-        visibility: hidden;
-        transition: all 0.3s ease;
-        text-align: left;
-        backdrop-filter: blur(10px);
-    }
-    
-    .problem-icon:hover .problem-tooltip {
-        opacity: 1;
-        visibility: visible;
-        bottom: calc(100% + 15px);
-    }
-    
-    /* Cabeçalho do tooltip */
-    .tooltip-header {
-        display: flex;
-        align-items: center;
-        margin-bottom: 20px;
-        padding-bottom: 15px;
-        border-bottom: 2px solid rgba(212, 175, 55, 0.5);
-    }
-    
-    .tooltip-emoji {
-        font-size: 2.5em;
-        margin-right: 20px;
-    }
-    
-    .tooltip-title {
-        flex: 1;
-        font-size: 1.3em;
-        font-weight: bold;
-        color: #d4af37;
-    }
-    
-    /* Seções do tooltip */
-    .tooltip-section {
-        margin: 18px 0;
-        padding: 15px;
-        border-radius: 10px;
-        background: rgba(30, 30, 30, 0.7);
-        border-left: 4px solid;
-        transition: all 0.3s ease;
-    }
-    
-    .tooltip-section:hover {
-        transform: translateX(5px);
-        background: rgba(40, 40, 40, 0.8);
-    }
-    
-    .section-violation {
-        border-left-color: #ff4444;
-        background: rgba(255, 68, 68, 0.1);
-    }
-    
-    .section-law {
-        border-left-color: #d4af37;
-        background: rgba(212, 175, 55, 0.1);
-    }
-    
-    .section-context {
-        border-left-color: #44aaff;
-        background: rgba(68, 170, 255, 0.1);
-    }
-    
-    .section-solution {
-        border-left-color: #00ff00;
-        background: rgba(0, 255, 0, 0.1);
-    }
-    
-    .section-confidence {
-        border-left-color: #ff44ff;
-        background: rgba(255, 68, 255, 0.1);
-    }
-    
-    .section-label {
-        font-weight: bold;
-        display: block;
-        margin-bottom: 8px;
-        font-size: 0.95em;
-        text-transform: uppercase;
-        letter-spacing: 0.5px;
-        color: #ffffff;
-    }
-    
-    .section-content {
-        font-size: 0.95em;
-        line-height: 1.6;
-        color: #cccccc;
-    }
-    
-    .section-highlight {
-        color: #ffffff;
-        font-weight: bold;
-    }
-    
-    /* Linha divisória */
-    .tooltip-divider {
-        height: 1px;
-        background: rgba(212, 175, 55, 0.3);
-        margin: 15px 0;
-    }
-    
-    /* Badge de confiança */
-    .confidence-badge {
-        display: inline-block;
-        padding: 8px 15px;
-        border-radius: 20px;
-        font-size: 0.9em;
-        font-weight: bold;
-        margin-top: 10px;
-        text-align: center;
-        width: 100%;
-        background: rgba(212, 175, 55, 0.2);
-        border: 1px solid #d4af37;
-        color: #d4af37;
-    }
-    
-    /* Container de upload customizado */
-    .upload-container {
-        border: 3px dashed #d4af37;
-        border-radius: 20px;
-        padding: 60px 40px;
-        text-align: center;
-        background: rgba(26, 26, 26, 0.7);
-        margin: 30px 0;
-        transition: all 0.3s;
-        backdrop-filter: blur(10px);
-    }
-    
-    .upload-container:hover {
-        background: rgba(40, 40, 40, 0.7);
-        border-color: #e6c158;
-    }
-    
-    /* Linhas divisorias douradas */
-    .gold-divider {
-        border: none;
-        height: 2px;
-        background: linear-gradient(90deg, transparent, #d4af37, transparent);
-        margin: 40px 0;
-    }
-    
-    /* Status do sistema */
-    .system-status {
-        display: inline-block;
-        padding: 3px 10px;
-        border-radius: 12px;
-        font-size: 0.8em;
-        font-weight: 600;
-        background: rgba(0, 255, 0, 0.1);
-        color: #00ff00;
-        border: 1px solid rgba(0, 255, 0, 0.3);
-    }
-    
-    /* Container de análise/explicação - TEXTO BRANCO */
-    .analysis-container {
-        background: rgba(20, 20, 20, 0.9);
-        padding: 30px;
-        border-radius: 15px;
-        margin: 30px 0;
-        box-shadow: 0 5px 15px rgba(0, 0, 0, 0.4);
-        border: 1px solid rgba(212, 175, 55, 0.3);
-        color: #ffffff;
-    }
-    
-    .analysis-title {
-        color: #d4af37;
-        font-size: 1.4em;
-        font-weight: bold;
-        margin-bottom: 20px;
-        text-align: center;
-    }
-    
-    .analysis-content {
-        color: #ffffff;
-        line-height: 1.6;
-        font-size: 1em;
-    }
-    
-    .analysis-step {
-        margin: 15px 0;
-        padding: 15px;
-        background: rgba(30, 30, 30, 0.7);
-        border-radius: 10px;
-        border-left: 4px solid #d4af37;
-    }
-    
-    .analysis-step-title {
-        color: #d4af37;
-        font-weight: bold;
-        margin-bottom: 5px;
-    }
-    
-    /* Responsividade */
-    @media (max-width: 768px) {
-        .metric-card {
-            margin-bottom: 20px;
-        }
-        .problem-icon {
-            margin: 10px;
-            padding: 15px;
-            min-width: 80px;
-        }
-        .icon-emoji {
-            font-size: 2em;
-        }
-        .problem-tooltip {
-            width: 320px;
-            left: 50%;
-            transform: translateX(-50%);
-        }
-    }
-    
-    /* Animação de entrada */
-    @keyframes fadeIn {
-        from { opacity: 0; transform: translateY(20px); }
-        to { opacity: 1; transform: translateY(0); }
-    }
+# O CSS fica em static/estilos.css. Com server.enableStaticServing (ver
+# .streamlit/config.toml) ele é servido como arquivo estático, que o
+# navegador guarda em cache; a versão na URL muda junto com o conteúdo.
+CAMINHO_ESTILOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'estilos.css')
+
+@st.cache_resource
+def ler_estilos():
+    """Conteúdo e versão (hash) da folha de estilos"""
+    with open(CAMINHO_ESTILOS, 'rb') as arquivo:
+        conteudo = arquivo.read()
+    return conteudo.decode('utf-8'), hashlib.sha256(conteudo).hexdigest()[:12]
+
+def aplicar_estilos():
+    conteudo, versao = ler_estilos()
+    if st.get_option('server.enableStaticServing'):
+        st.markdown(f'<link rel="stylesheet" href="app/static/estilos.css?v={versao}">', unsafe_allow_html=True)
+    else:
+        # Sem arquivos estáticos habilitados, o CSS vai embutido na página
+        st.markdown(f"<style>\n{conteudo}</style>", unsafe_allow_html=True)
+
+aplicar_estilos()
+
+# --------------------------------------------------
+# FUNÇÕES AUXILIARES
+# --------------------------------------------------
+
+def dica_ocr():
+    """Complemento do aviso de PDF sem texto quando o OCR está ligado mas não instalado"""
+    if OCR_ATIVO and not ocr_disponivel():
+        return " Se for um documento digitalizado, instale o Tesseract e o pytesseract para lê-lo por OCR."
+    return ""
+
+@st.cache_resource
+def obter_fonte_regras():
+    """Catálogo de regras do processo, recarregado quando o arquivo muda"""
+    # Ex.: BUROCRATA_CATALOGO=/etc/burocrata/regras.yaml
+    return FonteRegras(os.environ.get('BUROCRATA_CATALOGO', CAMINHO_CATALOGO_PADRAO))
+
+@st.cache_resource(max_entries=2)
+def montar_auditoria(versao_catalogo, _regras):
+    """Auditor de uma versão do catálogo, compartilhado entre sessões
+
+    A análise só lê o estado do auditor, então a mesma instância pode
+    atender várias sessões ao mesmo tempo.
+    """
+    # Tempo máximo de cada regra por documento; 0 desliga o limite
+    orcamento_ms = float(os.environ.get('BUROCRATA_ORCAMENTO_REGRA_MS', 250))
+    return SistemaAuditoria100Efetivo(
+        instrumentacao=obter_instrumentacao(),
+        orcamento_regra_segundos=orcamento_ms / 1000 or None,
+        regras=_regras,
+        # Ocorrências por janela: revisões de um contrato só reanalisam o que mudou
+        cache_janelas=CacheResultados(capacidade=int(os.environ.get('BUROCRATA_CACHE_JANELAS', 50000))),
+        # Modelos de contrato já vistos: parecidos só reanalisam as cláusulas que mudaram
+        modelos=IndiceModelos(capacidade=int(os.environ.get('BUROCRATA_MODELOS', 256)))
+    )
+
+def obter_auditoria():
+    """Auditor das regras em vigor
+
+    Quando o catálogo muda, as próximas análises recebem um auditor novo;
+    sessões em andamento terminam com a instância antiga. A versão das
+    regras muda junto, invalidando o cache de resultados.
+    """
+    regras = obter_fonte_regras().atuais()
+    return montar_auditoria(regras.versao, regras)
+
+def recarregar_auditoria():
+    """Relê o catálogo imediatamente e retorna o auditor das regras novas"""
+    obter_fonte_regras().recarregar()
+    return obter_auditoria()
+
+@st.cache_resource
+def obter_instrumentacao():
+    """Tempo e ocorrências por regra, agregados entre sessões e recargas"""
+    return InstrumentacaoRegras()
+
+@st.cache_resource
+def obter_cache_resultados():
+    """Cache de resultados compartilhado entre sessões do processo"""
+    # Segundo nível em disco opcional, ex.: BUROCRATA_CACHE_DB=/var/cache/burocrata.db
+    return CacheResultados(
+        capacidade=int(os.environ.get('BUROCRATA_CACHE_TAMANHO', 128)),
+        caminho_disco=os.environ.get('BUROCRATA_CACHE_DB')
+    )
+
+@st.cache_resource
+def obter_cache_paginas():
+    """Texto das páginas já extraídas, pela assinatura de cada página"""
+    return CacheResultados(capacidade=int(os.environ.get('BUROCRATA_CACHE_PAGINAS', 2000)))
+
+@st.cache_resource
+def obter_indice():
+    """Índice do corpus alimentado pelas auditorias, ou None se desligado"""
+    # Ex.: BUROCRATA_INDICE_DB=/var/lib/burocrata/corpus.db
+    caminho = os.environ.get('BUROCRATA_INDICE_DB')
+    return IndiceCorpus(caminho) if caminho else None
+
+@st.cache_resource
+def obter_exportacoes():
+    """Relatórios já gerados, compartilhados entre sessões do processo"""
+    return CacheExportacoes()
+
+class ErroAuditoria(Exception):
+    """Falha de uma auditoria, com a mensagem que vai para o usuário"""
+
+def auditar_conteudo(conteudo, auditoria, cache, ao_progredir=None, nome=None):
+    """Extrai e analisa o PDF, reaproveitando o resultado de envios idênticos
+
+    As páginas são analisadas conforme são extraídas; ao_progredir, se
+    informado, recebe o número de páginas lidas e os problemas parciais.
+    Roda nas threads da fila: não usa elementos do Streamlit.
+    """
+    chave = cache.gerar_chave(conteudo, auditoria.versao_regras)
     
-    .fade-in {
-        animation: fadeIn 0.6s ease-out;
-    }
+    resultado = cache.obter(chave)
+    if resultado is not None:
+        return resultado
     
-    /* Scrollbar customizada */
-    ::-webkit-scrollbar {
-        width: 10px;
-    }
+    analise = auditoria.iniciar_analise_incremental(guardar_clausulas=obter_indice() is not None)
+    try:
+        for texto_pagina in iterar_paginas(conteudo, cache_paginas=obter_cache_paginas()):
+            analise.adicionar_pagina(texto_pagina)
+            if ao_progredir:
+                ao_progredir(analise.paginas, analise.problemas())
+    except Exception as e:
+        raise ErroAuditoria(f"Erro ao processar PDF: {str(e)}")
     
-    ::-webkit-scrollbar-track {
-        background: #1a1a1a;
-    }
+    if not analise.tem_texto:
+        raise ErroAuditoria("Não foi possível extrair texto do PDF." + dica_ocr())
     
-    ::-webkit-scrollbar-thumb {
-        background: #d4af37;
-        border-radius: 5px;
-    }
+    return concluir_auditoria(auditoria, analise, cache, chave, nome)
+
+def concluir_auditoria(auditoria, analise, cache, chave, nome=None):
+    """Finaliza a análise, guarda no cache e exporta as métricas das regras"""
+    problemas = analise.finalizar()
+    resultado = {
+        'problemas': problemas,
+        'metricas': auditoria.gerar_metricas_avancadas(problemas),
+        'inconclusivos': analise.inconclusivos(),
+        # Todas as ocorrências, em colunas, com o texto em torno delas
+        'ocorrencias': analise.tabela.para_dict(),
+        'modelo': analise.uso_modelo()
+    }
+    
+    # Resultado inconclusivo depende da carga da máquina: não vai para o cache
+    if not resultado['inconclusivos']:
+        cache.guardar(chave, resultado)
+        indexar(auditoria, analise, resultado, chave, nome)
+    
+    # Exportação contínua opcional, ex.: BUROCRATA_METRICAS_ARQUIVO=/var/lib/node_exporter/burocrata.prom
+    caminho_metricas = os.environ.get('BUROCRATA_METRICAS_ARQUIVO')
+    if caminho_metricas and auditoria.instrumentacao is not None:
+        try:
+            auditoria.instrumentacao.gravar(caminho_metricas)
+        except OSError:
+            pass
+    
+    return resultado
+
+def indexar(auditoria, analise, resultado, chave, nome):
+    """Leva a auditoria ao índice do corpus, se ele estiver configurado"""
+    indice = obter_indice()
+    if indice is None or analise.clausulas is None:
+        return
+    try:
+        indice.registrar(
+            # A chave do cache começa pelo SHA-256 do PDF
+            chave.partition(':')[0], resultado['problemas'], resultado['metricas'], analise.clausulas,
+            nome=nome, carteira=os.environ.get('BUROCRATA_INDICE_CARTEIRA'),
+            versao_regras=auditoria.versao_regras
+        )
+    except sqlite3.Error:
+        # O índice é um subproduto: falha nele não derruba a auditoria
+        pass
+
+def auditar_conteudos(nomes, conteudos, auditoria, cache, ao_progredir=None):
+    """Audita vários PDFs de uma vez, com a extração simultânea no pool compartilhado
+    
+    Retorna, na ordem dos arquivos, os resultados (None em caso de erro) e
+    as mensagens de erro. ao_progredir, se informado, recebe documentos
+    prontos e total.
+    """
+    chaves = [cache.gerar_chave(conteudo, auditoria.versao_regras) for conteudo in conteudos]
+    
+    resultados = [cache.obter(chave) for chave in chaves]
+    erros = []
+    pendentes = [indice for indice, resultado in enumerate(resultados) if resultado is None]
+    prontos = len(conteudos) - len(pendentes)
+    if ao_progredir:
+        ao_progredir(prontos, len(conteudos))
+    
+    # Cada documento é analisado assim que a extração dele termina
+    documentos = extrair_documentos([conteudos[i] for i in pendentes], cache_paginas=obter_cache_paginas())
+    for posicao, paginas, erro in documentos:
+        indice = pendentes[posicao]
+        
+        if erro is not None:
+            erros.append(f"{nomes[indice]}: erro ao processar PDF: {str(erro)}")
+        else:
+            analise = auditoria.iniciar_analise_incremental(guardar_clausulas=obter_indice() is not None)
+            for texto_pagina in paginas:
+                analise.adicionar_pagina(texto_pagina)
+            
+            if analise.tem_texto:
+                resultados[indice] = concluir_auditoria(auditoria, analise, cache, chaves[indice], nomes[indice])
+            else:
+                erros.append(f"{nomes[indice]}: não foi possível extrair texto do PDF.{dica_ocr()}")
+        
+        prontos += 1
+        if ao_progredir:
+            ao_progredir(prontos, len(conteudos))
     
-    ::-webkit-scrollbar-thumb:hover {
-        background: #e6c158;
-    }
+    return resultados, erros
+
+def combinar_resultados(auditoria, nomes, resultados):
+    """Visão única do conjunto de documentos, com o detalhamento de cada um"""
+    validos = [(nome, resultado) for nome, resultado in zip(nomes, resultados) if resultado]
+    if not validos:
+        return None
     
-    /* Remover margens padrão do Streamlit */
-    .block-container {
-        padding-top: 0;
-        padding-bottom: 0;
-    }
+    problemas = auditoria.combinar_problemas([resultado['problemas'] for _, resultado in validos])
+    for problema in problemas:
+        problema['documentos'] = [
+            nome for nome, resultado in validos
+            if any(p['id'] == problema['id'] for p in resultado['problemas'])
+        ]
     
-    /* Ajuste para textos */
-    .stMarkdown {
-        color: white !important;
+    inconclusivos = {}
+    for _, resultado in validos:
+        for item in resultado.get('inconclusivos') or []:
+            inconclusivos.setdefault(item['id'], item)
+    
+    return {
+        'problemas': problemas,
+        'metricas': auditoria.gerar_metricas_avancadas(problemas),
+        'inconclusivos': list(inconclusivos.values()),
+        'documentos': [
+            {'nome': nome, 'resultado': resultado}
+            for nome, resultado in zip(nomes, resultados)
+        ]
     }
-</style>
-""", unsafe_allow_html=True)
 
-# --------------------------------------------------
-# SISTEMA DE AUDITORIA 100% EFETIVO
-# --------------------------------------------------
+@st.cache_resource
+def obter_fila():
+    """Fila de auditorias do processo, compartilhada entre sessões"""
+    return FilaAuditorias(
+        trabalhadores=int(os.environ.get('BUROCRATA_FILA_TRABALHADORES', 2)),
+        max_fila=int(os.environ.get('BUROCRATA_FILA_MAXIMO', 32)),
+        max_por_dono=int(os.environ.get('BUROCRATA_FILA_POR_SESSAO', 2)),
+        retencao_segundos=float(os.environ.get('BUROCRATA_FILA_RETENCAO', 1800))
+    )
 
-class SistemaAuditoria100Efetivo:
-    def __init__(self):
-        # Configurações completas de detecção
-        self.padroes_completos = {
-            'reajuste_ilegal': {
-                'nome': 'REAJUSTE ILEGAL',
-                'gravidade': 'critical',
-                'descricao_detalhada': 'Reajuste deve seguir índices oficiais (IGP-M, IPCA, INCC). Reajuste livre é abusivo.',
-                'lei': 'Lei do Inquilinato 8.245/91 e Art. 7º',
-                'icone': '📈',
-                'contestacao': 'Exija reajuste por índice oficial. Valor máximo: variação do índice escolhido.',
-                'cor': '#ff4444',
-                'padroes': [
-                    r'reajuste.*?(livre|arbitrario|arbitrária|discricionario|discricionária)',
-                    r'reajuste.*?(independente|fora|sem).*?(índice|indice|inflação|inflacao|IGP|IPCA|INCC)',
-                    r'valor.*?(aluguel|mensalidade).*?(reajustar|alterar|aumentar).*?(qualquer|a qualquer|livre)',
-                    r'aluguel.*?(ser|estar).*?(sujeito).*?(reajuste).*?(livre|discricionario)',
-                    r'aumento.*?(livre|arbitrario).*?(aluguel)'
-                ]
-            },
-            'garantia_dupla': {
-                'nome': 'GARANTIA DUPLA',
-                'gravidade': 'critical',
-                'descricao_detalhada': 'Não pode exigir fiador E caução simultaneamente. Deve oferecer opções alternativas.',
-                'lei': 'Art. 37, Lei 8.245/91',
-                'icone': '🔒',
-                'contestacao': 'Escolha apenas uma garantia: fiador OU caução OU seguro-fiança.',
-                'cor': '#ff4444',
-                'padroes': [
-                    r'(fiador|fiadores).*?(e|mais|alem|além|com).*?(caucao|caução|deposito|depósito|garantia)',
-                    r'(caucao|caução|deposito|depósito).*?(e|mais|alem|além|com).*?(fiador|fiadores)',
-                    r'exige.*?(fiador).*?(e).*?(caução|caucao)',
-                    r'obrigatório.*?(fiador).*?(e).*?(caução|caucao)',
-                    r'simultaneamente.*?(fiador|caução|caucao)'
-                ]
-            },
-            'benfeitorias_ilegal': {
-                'nome': 'BENFEITORIAS ILEGAIS',
-                'gravidade': 'critical',
-                'descricao_detalhada': 'Não pode renunciar a direitos de indenização por benfeitorias necessárias. Cláusula abusiva.',
-                'lei': 'Art. 35, Lei 8.245/91 e Código Civil Art. 1.233',
-                'icone': '🏗️',
-                'contestacao': 'Guarde notas fiscais e exija reembolso por benfeitorias necessárias.',
-                'cor': '#ff4444',
-                'padroes': [
-                    r'renuncia.*?(benfeitoria|reforma|obra|melhoria|conserto|reparo)',
-                    r'(nao|não).*?(direito|indenização|indenizacao|reembolso|ressarcimento).*?(benfeitoria|reforma)',
-                    r'integra.*?(imovel|imóvel).*?(renuncia|sem.*?direito)',
-                    r'renuncia.*?(desde já|desde.*?já).*?(qualquer.*?direito)',
-                    r'benfeitoria.*?(necessária|necessaria|útil|util).*?(não.*?indenizada|não.*?paga)'
-                ]
-            },
-            'venda_despeja': {
-                'nome': 'VENDA COM PRAZO CURTO',
-                'gravidade': 'critical',
-                'descricao_detalhada': 'Prazo mínimo de 90 dias para desocupação em caso de venda. 15 dias é ilegal.',
-                'lei': 'Art. 27, Lei 8.245/91',
-                'icone': '🏠',
-                'contestacao': 'Exija 90 dias para desocupação. Contrate advogado se necessário.',
-                'cor': '#ff4444',
-                'padroes': [
-                    r'(15|quinze|30|trinta|45|quarenta e cinco).*?(dias|dia).*?(desocupar|desocupação|desocupacao|saída|saida)',
-                    r'desocupar.*?(15|quinze|30|trinta).*?(dias|dia)',
-                    r'prazo.*?(máximo|maximo|mínimo|minimo).*?(15|quinze|30|trinta).*?(dias)',
-                    r'venda.*?(rescindir|rescisão|rescisao|terminar).*?(15|quinze|30).*?(dias)',
-                    r'alienação|alienacao.*?imovel.*?(15|quinze|30|trinta).*?(dias)'
-                ]
-            },
-            'multa_abusiva': {
-                'nome': 'MULTA ABUSIVA',
-                'gravidade': 'critical',
-                'descricao_detalhada': 'Multa integral por todo período é abusiva. Deve ser proporcional.',
-                'lei': 'Art. 4º, Lei 8.245/91 e CDC Art. 51',
-                'icone': '💰',
-                'contestacao': 'Negocie multa proporcional ao tempo restante de contrato.',
-                'cor': '#ff4444',
-                'padroes': [
-                    r'multa.*?(integral|total|cheia|completa)',
-                    r'(12|doze).*?(meses|mês).*?(multa)',
-                    r'multa.*?(equivalente|correspondente).*?(todo.*?período|todo.*?prazo)',
-                    r'indenização.*?(integral|total).*?(locador)',
-                    r'pagamento.*?(integral|total).*?(aluguel.*?restante)'
-                ]
-            },
-            'vistoria_unilateral': {
-                'nome': 'VISTORIA UNILATERAL',
-                'gravidade': 'critical',
-                'descricao_detalhada': 'Vistoria unilateral e débito automático sem comprovação são abusivos.',
-                'lei': 'CDC Art. 51 e Lei 8.245/91',
-                'icone': '🔍',
-                'contestacao': 'Exija vistoria conjunta e comprovação documentada dos reparos.',
-                'cor': '#ff4444',
-                'padroes': [
-                    r'vistoria.*?(exclusivamente|apenas|somente).*?(locador)',
-                    r'concorda.*?(antecipadamente|desde já).*?(orçamento|orcamento)',
-                    r'débito|debito.*?(automático|automatico).*?(cartão|cartao|conta)',
-                    r'sem.*?(necessidade|contraprova|comprovação)',
-                    r'autoriza.*?(débito|debito).*?(sem.*?autorização)'
-                ]
-            },
-            'renovacao_abusiva': {
-                'nome': 'RENOVAÇÃO ABUSIVA',
-                'gravidade': 'critical',
-                'descricao_detalhada': 'Renovação automática com reajuste livre é cláusula abusiva.',
-                'lei': 'CDC Art. 51 e Lei 8.245/91',
-                'icone': '🔄',
-                'contestacao': 'Renegocie com reajuste por índice oficial ou rescinda com 30 dias de antecedência.',
-                'cor': '#ff4444',
-                'padroes': [
-                    r'renovar.*?(automaticamente|automática).*?(indeterminado|indeterminada)',
-                    r'prazo.*?(findo|terminado).*?(renovar.*?automaticamente)',
-                    r'reajuste.*?(livre|arbitrario).*?(renovação|renovacao)',
-                    r'renovação.*?automatica.*?(reajuste.*?livre)',
-                    r'contrato.*?(renovar-se|renovar).*?(automaticamente)'
-                ]
-            },
-            'proibicao_animais': {
-                'nome': 'PROIBIÇÃO DE ANIMAIS',
-                'gravidade': 'medium',
-                'descricao_detalhada': 'Proibição total pode ser considerada abusiva se animal não causar danos.',
-                'lei': 'CDC Art. 51 e Súmula 482 STJ',
-                'icone': '🐕',
-                'contestacao': 'Negocie com garantias de bom comportamento do animal.',
-                'cor': '#ffaa44',
-                'padroes': [
-                    r'proibido.*?(animal|animais|pet|bicho)',
-                    r'vedado.*?(animal|animais)',
-                    r'nao.*?(permitido|autorizado).*?(animal|animais)',
-                    r'expressamente.*?(proibido|vedado).*?(animal)',
-                    r'condomínio|condominio.*?(proibir|vedar).*?(animal)'
-                ]
+def executar_envio(tarefa, nomes, conteudos, auditoria, cache):
+    """Auditoria de um envio (um ou vários PDFs), executada por uma thread da fila"""
+    if len(conteudos) == 1:
+        def ao_progredir(paginas, parciais):
+            tarefa.progresso = {
+                'paginas': paginas,
+                'problemas': len(parciais),
+                'icones': " ".join(p['icone'] for p in parciais)
             }
-        }
-        
-        # Palavras-chave de contexto para contratos
-        self.palavras_contrato = [
-            'contrato', 'locação', 'locador', 'locatário', 'aluguel', 'imóvel',
-            'cláusula', 'obrigações', 'direitos', 'deveres', 'prazo', 'valor',
-            'multa', 'garantia', 'fiador', 'caução', 'depósito'
-        ]
-    
-    def preparar_texto_para_analise(self, texto):
-        """Prepara texto mantendo a estrutura mas normalizando para análise"""
-        if not texto:
-            return ""
-        
-        # Mantém original para contexto
-        texto_original = texto
-        
-        # Cria versão normalizada para busca
-        texto = texto.lower()
         
-        # Remove acentos
-        texto = unicodedata.normalize('NFKD', texto)
-        texto = ''.join([c for c in texto if not unicodedata.combining(c)])
-        
-        # Padroniza espaços
-        texto = re.sub(r'\s+', ' ', texto)
-        
-        return texto_original, texto
+        return {
+            'resultado': auditar_conteudo(conteudos[0], auditoria, cache, ao_progredir, nomes[0]),
+            'erros': []
+        }
     
-    def buscar_padroes_amplos(self, texto_normalizado, padroes):
-        """Busca padrões com múltiplas estratégias"""
-        resultados = []
-        
-        for padrao in padroes:
-            try:
-                # Busca simples
-                matches = list(re.finditer(padrao, texto_normalizado, re.IGNORECASE))
-                resultados.extend(matches)
-            except:
-                continue
-        
-        return resultados
+    def ao_progredir(prontos, total):
+        tarefa.progresso = {'documentos': prontos, 'total': total}
     
-    def analisar_contrato_completo(self, texto):
-        """Análise completa e abrangente do contrato"""
-        texto_original, texto_normalizado = self.preparar_texto_para_analise(texto)
-        
-        problemas_detectados = []
-        
-        # Analisar cada tipo de problema
-        for chave, config in self.padroes_completos.items():
-            padroes = config.get('padroes', [])
-            
-            if not padroes:
-                continue
-            
-            # Buscar ocorrências
-            matches = self.buscar_padroes_amplos(texto_normalizado, padroes)
+    resultados, erros = auditar_conteudos(nomes, conteudos, auditoria, cache, ao_progredir)
+    return {
+        'resultado': combinar_resultados(auditoria, nomes, resultados),
+        'erros': erros
+    }
+
+def tabelas_ocorrencias(resultado):
+    """Pares (documento, TabelaOcorrencias) de um resultado simples ou combinado"""
+    if resultado.get('ocorrencias'):
+        return [(None, TabelaOcorrencias.de_dict(resultado['ocorrencias']))]
+    return [
+        (documento['nome'], TabelaOcorrencias.de_dict(documento['resultado']['ocorrencias']))
+        for documento in resultado.get('documentos') or []
+        if documento['resultado'] and documento['resultado'].get('ocorrencias')
+    ]
+
+def mostrar_localizacoes(problemas, tabelas, limite=20):
+    """Onde cada problema aparece: página e trecho de cada ocorrência"""
+    with st.expander("📍 ONDE CADA CLÁUSULA APARECE"):
+        for problema in problemas:
+            itens = []
+            for documento, tabela in tabelas:
+                if problema['id'] not in tabela.chaves:
+                    continue
+                for linha in tabela.linhas(problema['id'], limite - len(itens)):
+                    pagina = f"p. {linha['pagina']}" if linha['pagina'] else "posição " + str(linha['inicio'])
+                    origem = f"{html.escape(documento)} • {pagina}" if documento else pagina
+                    itens.append(
+                        f'<li><span style="color: #d4af37;">{origem}</span> — {html.escape(linha["contexto"])}</li>'
+                    )
+                if len(itens) >= limite:
+                    break
             
-            if matches:
-                # Calcular confiança baseada no número de correspondências
-                confianca = min(0.5 + (len(matches) * 0.2), 1.0)
-                
-                # Extrair contexto da melhor correspondência
-                melhor_match = matches[0]
-                inicio = max(0, melhor_match.start() - 150)
-                fim = min(len(texto_normalizado), melhor_match.end() + 150)
-                contexto = texto_normalizado[inicio:fim]
-                
-                # Limpar e formatar contexto
-                contexto = re.sub(r'\s+', ' ', contexto).strip()
-                if len(contexto) > 250:
-                    contexto = contexto[:250] + "..."
-                
-                # Determinar nível de confiança
-                if confianca >= 0.9:
-                    nivel_confianca = "ALTA"
-                    cor_confianca = "#00ff00"
-                elif confianca >= 0.7:
-                    nivel_confianca = "MÉDIA"
-                    cor_confianca = "#ffff00"
-                else:
-                    nivel_confianca = "BAIXA"
-                    cor_confianca = "#ff4444"
-                
-                problemas_detectados.append({
-                    'id': chave,
-                    'nome': config['nome'],
-                    'gravidade': config['gravidade'],
-                    'descricao_detalhada': config['descricao_detalhada'],
-                    'lei': config['lei'],
-                    'icone': config['icone'],
-                    'contestacao': config['contestacao'],
-                    'contexto': contexto,
-                    'confianca': confianca,
-                    'nivel_confianca': nivel_confianca,
-                    'cor_confianca': cor_confianca,
-                    'cor_gravidade': config['cor'],
-                    'posicao': melhor_match.start(),
-                    'ocorrencias': len(matches)
-                })
-        
-        # Ordenar por gravidade e número de ocorrências
-        ordem_gravidade = {'critical': 0, 'medium': 1, 'low': 2}
-        problemas_detectados.sort(key=lambda x: (
-            ordem_gravidade.get(x['gravidade'], 3),
-            -x['ocorrencias'],
-            -x['confianca']
-        ))
-        
-        return problemas_detectados
+            restantes = problema['ocorrencias'] - len(itens)
+            if restantes > 0:
+                itens.append(f'<li style="color: #cccccc;">… e mais {restantes} ocorrência(s) no relatório de localizações</li>')
+            st.markdown(f"""
+            <div style="margin: 10px 0; color: #ffffff;">
+                <strong>{problema['icone']} {problema['nome']}</strong>
+                <ul style="margin: 5px 0 0 0;">{"".join(itens)}</ul>
+            </div>
+            """, unsafe_allow_html=True)
+
+def mostrar_andamento(tarefa, fila):
+    """Situação de uma auditoria ainda não terminada"""
+    progresso = tarefa.progresso
+    if tarefa.estado == NA_FILA:
+        a_frente = fila.posicao(tarefa)
+        mensagem = f"⏳ Na fila • {a_frente} auditoria(s) à frente" if a_frente else "⏳ Na fila • começa em instantes"
+    elif 'total' in progresso:
+        mensagem = f"📚 {progresso['documentos']} de {progresso['total']} documento(s) analisado(s)"
+    elif progresso:
+        mensagem = f"📄 {progresso['paginas']} página(s) analisada(s) • {progresso['problemas']} problema(s) até agora {progresso['icones']}"
+    else:
+        mensagem = "📄 Lendo o documento..."
     
-    def gerar_metricas_avancadas(self, problemas):
-        """Gera métricas detalhadas da análise"""
-        total = len(problemas)
-        
-        criticos = sum(1 for p in problemas if p['gravidade'] == 'critical')
-        medios = sum(1 for p in problemas if p['gravidade'] == 'medium')
-        leves = sum(1 for p in problemas if p['gravidade'] == 'low')
+    st.markdown(f"""
+    <div style="text-align: center; margin: 20px 0; padding: 15px; background: rgba(212, 175, 55, 0.1); border-radius: 10px; border: 1px solid #d4af37;">
+        <p style="color: #d4af37; margin: 0; font-size: 1em;">
+            {mensagem}
+        </p>
+    </div>
+    """, unsafe_allow_html=True)
+
+def mostrar_diagnostico_regras(auditoria):
+    """Painel de depuração com o custo de cada regra (BUROCRATA_DEBUG=1)"""
+    instrumentacao = obter_instrumentacao()
+    
+    # pandas só é carregado quando o diagnóstico está ligado
+    import pandas as pd
+    
+    with st.expander("🛠️ DIAGNÓSTICO DAS REGRAS"):
+        fonte = obter_fonte_regras()
+        st.caption(f"Catálogo: {fonte.caminho} • versão {auditoria.regras.versao}")
+        if fonte.ultimo_erro:
+            st.warning(f"O catálogo alterado foi rejeitado; as regras anteriores continuam em uso.\n\n{fonte.ultimo_erro}")
         
-        # Score baseado na gravidade e confiança
-        penalidade = 0
-        for p in problemas:
-            peso = p['confianca']
-            if p['gravidade'] == 'critical':
-                penalidade += 30 * peso
-            elif p['gravidade'] == 'medium':
-                penalidade += 15 * peso
+        st.caption(f"{instrumentacao.analises} análise(s) medida(s) neste processo. Resultados vindos do cache não são medidos.")
         
-        score = max(100 - penalidade, 0)
+        if instrumentacao.ultima is not None:
+            ultima = instrumentacao.ultima
+            st.markdown(f"**Última análise:** {ultima.segundos_total * 1000:.1f} ms")
+            # Depois de uma recarga do catálogo os índices podem apontar para outras regras
+            mesma_versao = ultima.versao_regras == auditoria.versao_regras
+            st.dataframe(
+                pd.DataFrame(ultima.linhas_regras(auditoria.motor if mesma_versao else None)),
+                use_container_width=True
+            )
+            if not mesma_versao:
+                st.caption(f"Medida com as regras da versão {ultima.versao_regras}; os padrões não são exibidos.")
         
-        # Nível de risco
-        if criticos >= 3:
-            nivel_risco = 'RISCO EXTREMO'
-        elif criticos >= 1:
-            nivel_risco = 'ALTO RISCO'
-        elif medios >= 2:
-            nivel_risco = 'ATENÇÃO'
-        else:
-            nivel_risco = 'BAIXO RISCO'
+        exportacao = instrumentacao.exportar_json()
+        if exportacao['regras']:
+            st.markdown("**Acumulado por regra**")
+            st.dataframe(pd.DataFrame([
+                {
+                    'categoria': r['categoria'],
+                    'regra': r['regra'],
+                    'analises': r['segundos']['total'],
+                    'segundos_total': r['segundos']['soma'],
+                    'media_ms': r['segundos']['soma'] / r['segundos']['total'] * 1000,
+                    'ocorrencias': r['ocorrencias'],
+                    'bytes_examinados': r['bytes_examinados']
+                }
+                for r in exportacao['regras']
+            ]).sort_values('segundos_total', ascending=False), use_container_width=True)
         
-        return {
-            'total_problemas': total,
-            'criticos': criticos,
-            'medios': medios,
-            'leves': leves,
-            'score_conformidade': score,
-            'nivel_risco': nivel_risco,
-            'tem_criticos': criticos > 0
-        }
-
-# --------------------------------------------------
-# FUNÇÕES AUXILIARES
-# --------------------------------------------------
-
-def extrair_texto_pdf_completo(arquivo):
-    """Extrai texto de PDF com tratamento robusto"""
-    try:
-        with pdfplumber.open(arquivo) as pdf:
-            texto_completo = ""
-            
-            for i, pagina in enumerate(pdf.pages):
-                try:
-                    texto_pagina = pagina.extract_text()
-                    if texto_pagina:
-                        texto_completo += f"\n{texto_pagina}\n"
-                except:
-                    continue
-            
-            if not texto_completo.strip():
-                st.error("❌ Não foi possível extrair texto do PDF.")
-                return None
-            
-            return texto_completo
-    except Exception as e:
-        st.error(f"❌ Erro ao processar PDF: {str(e)}")
-        return None
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button(
+                label="Métricas (Prometheus)",
+                data=instrumentacao.exportar_prometheus(),
+                file_name="burocrata_regras.prom",
+                mime="text/plain"
+            )
+        with col2:
+            st.download_button(
+                label="Métricas (JSON)",
+                data=json.dumps(exportacao, ensure_ascii=False, indent=2),
+                file_name="burocrata_regras.json",
+                mime="application/json"
+            )
 
 # --------------------------------------------------
 # INTERFACE PRINCIPAL - COM unsafe_allow_html=True CORRETO
 # --------------------------------------------------
 
 def main():
+    # Regras e extrator de PDF carregam em segundo plano enquanto a página é exibida
+    aquecimento.aquecer([
+        ('regras', obter_auditoria),
+        ('pdfplumber', lambda: importlib.import_module('pdfplumber'))
+    ])
+    
     # Cabeçalho profissional
     st.markdown("""
     <div class="main-header fade-in">
@@ -865,209 +497,250 @@ def main():
     
     with col_upload:
         # O próprio st.file_uploader já terá o estilo aplicado via CSS
-        arquivo = st.file_uploader(
-            "Selecione seu contrato de aluguel (PDF)",
+        arquivos = st.file_uploader(
+            "Selecione seu contrato de aluguel e anexos (PDF)",
             type=["pdf"],
-            help="Arraste ou clique para selecionar seu contrato PDF",
+            help="Arraste ou clique para selecionar o contrato, aditivos e demais documentos em PDF",
+            accept_multiple_files=True,
             key="file_uploader"
         )
     
-    # Inicializar sistema
-    auditoria = SistemaAuditoria100Efetivo()
-    
-    # Processar arquivo
-    if arquivo:
-        with st.spinner("🔍 Analisando com detecção 100% efetiva..."):
-            # Extrair texto
-            texto = extrair_texto_pdf_completo(arquivo)
-            
-            if texto:
-                # Analisar documento
-                problemas = auditoria.analisar_contrato_completo(texto)
-                metricas = auditoria.gerar_metricas_avancadas(problemas)
-                
-                # Divisor
-                st.markdown('<hr class="gold-divider">', unsafe_allow_html=True)
-                
-                # Título dos resultados
-                st.markdown(f"""
-                <div style="text-align: center; margin: 40px 0;">
-                    <h2 style="color: #d4af37; font-size: 2.2em;">📊 RESULTADO DA ANÁLISE</h2>
-                    <p style="color: #cccccc; font-size: 1.1em;">
-                        Documento: <span style="color: #d4af37; font-weight: bold;">{arquivo.name}</span>
+    # Processar arquivos
+    if arquivos:
+        # Auditor compartilhado, criado na primeira análise do processo
+        auditoria = obter_auditoria()
+        fila = obter_fila()
+        sessao = st.session_state.setdefault('sessao', uuid.uuid4().hex)
+        nomes = [arquivo.name for arquivo in arquivos]
+        
+        # A auditoria roda na fila; a página só acompanha o andamento
+        assinatura = tuple((arquivo.name, arquivo.size) for arquivo in arquivos)
+        envio = st.session_state.get('envio')
+        tarefa = None
+        if envio and envio['assinatura'] == assinatura:
+            tarefa = fila.obter(envio['tarefa'])
+        
+        if tarefa is None:
+            try:
+                tarefa = fila.enviar(
+                    executar_envio, nomes, [arquivo.getvalue() for arquivo in arquivos],
+                    auditoria, obter_cache_resultados(),
+                    descricao=", ".join(nomes), dono=sessao
+                )
+            except FilaCheia:
+                st.markdown("""
+                <div style="text-align: center; margin: 20px 0; padding: 20px; background: rgba(255, 170, 0, 0.1); border-radius: 10px; border: 1px solid #ffaa00;">
+                    <h3 style="color: #ffaa00; margin: 0 0 10px 0;">⏳ SERVIDOR OCUPADO</h3>
+                    <p style="color: #cccccc; margin: 0;">
+                        Muitas auditorias em andamento no momento. Aguarde alguns instantes e tente novamente.
                     </p>
                 </div>
                 """, unsafe_allow_html=True)
+                if st.button("🔄 TENTAR NOVAMENTE"):
+                    st.rerun()
+                return
+            st.session_state['envio'] = {'assinatura': assinatura, 'tarefa': tarefa.id}
+        
+        if not tarefa.terminada:
+            mostrar_andamento(tarefa, fila)
+            time.sleep(1)
+            st.rerun()
+        
+        if tarefa.estado == ERRO:
+            st.error(f"❌ {tarefa.erro}")
+            resultado = None
+        else:
+            for erro in tarefa.resultado['erros']:
+                st.error(f"❌ {erro}")
+            resultado = tarefa.resultado['resultado']
+        
+        nome_documento = nomes[0] if len(nomes) == 1 else f"{len(nomes)} documentos"
+        
+        if resultado:
+            problemas = resultado['problemas']
+            metricas = resultado['metricas']
                 
-                # Métricas principais
-                col1, col2, col3 = st.columns(3)
+            # Divisor
+            st.markdown('<hr class="gold-divider">', unsafe_allow_html=True)
                 
-                with col1:
-                    cor_total = "#ff4444" if metricas['total_problemas'] > 0 else "#00ff00"
-                    st.markdown(f"""
-                    <div class="metric-card" style="border-top-color: {cor_total};">
-                        <h3 style="margin: 0; font-size: 2.5em; color: {cor_total};">{metricas['total_problemas']}</h3>
-                        <p style="margin: 10px 0 0 0; font-weight: 600; font-size: 1.1em;">PROBLEMAS</p>
-                    </div>
-                    """, unsafe_allow_html=True)
+            # Título dos resultados
+            st.markdown(f"""
+            <div style="text-align: center; margin: 40px 0;">
+                <h2 style="color: #d4af37; font-size: 2.2em;">📊 RESULTADO DA ANÁLISE</h2>
+                <p style="color: #cccccc; font-size: 1.1em;">
+                    Documento: <span style="color: #d4af37; font-weight: bold;">{html.escape(nome_documento)}</span>
+                </p>
+            </div>
+            """, unsafe_allow_html=True)
                 
-                with col2:
-                    cor_criticos = "#ff4444" if metricas['criticos'] > 0 else "#00ff00"
-                    st.markdown(f"""
-                    <div class="metric-card" style="border-top-color: {cor_criticos};">
-                        <h3 style="margin: 0; font-size: 2.5em; color: {cor_criticos};">{metricas['criticos']}</h3>
-                        <p style="margin: 10px 0 0 0; font-weight: 600; font-size: 1.1em;">CRÍTICOS</p>
-                    </div>
-                    """, unsafe_allow_html=True)
+            # Métricas principais
+            col1, col2, col3 = st.columns(3)
                 
-                with col3:
-                    cor_score = "#ff4444" if metricas['score_conformidade'] < 60 else "#ffaa44" if metricas['score_conformidade'] < 80 else "#00ff00"
-                    st.markdown(f"""
-                    <div class="metric-card" style="border-top-color: {cor_score};">
-                        <h3 style="margin: 0; font-size: 2.5em; color: {cor_score};">{metricas['score_conformidade']:.0f}</h3>
-                        <p style="margin: 10px 0 0 0; font-weight: 600; font-size: 1.1em;">SCORE</p>
-                    </div>
-                    """, unsafe_allow_html=True)
+            with col1:
+                cor_total = "#ff4444" if metricas['total_problemas'] > 0 else "#00ff00"
+                st.markdown(f"""
+                <div class="metric-card" style="border-top-color: {cor_total};">
+                    <h3 style="margin: 0; font-size: 2.5em; color: {cor_total};">{metricas['total_problemas']}</h3>
+                    <p style="margin: 10px 0 0 0; font-weight: 600; font-size: 1.1em;">PROBLEMAS</p>
+                </div>
+                """, unsafe_allow_html=True)
                 
-                # Divisor
-                st.markdown('<hr class="gold-divider">', unsafe_allow_html=True)
+            with col2:
+                cor_criticos = "#ff4444" if metricas['criticos'] > 0 else "#00ff00"
+                st.markdown(f"""
+                <div class="metric-card" style="border-top-color: {cor_criticos};">
+                    <h3 style="margin: 0; font-size: 2.5em; color: {cor_criticos};">{metricas['criticos']}</h3>
+                    <p style="margin: 10px 0 0 0; font-weight: 600; font-size: 1.1em;">CRÍTICOS</p>
+                </div>
+                """, unsafe_allow_html=True)
                 
-                # ÍCONES DOS PROBLEMAS DETECTADOS
-                if problemas:
-                    st.markdown("""
-                    <div style="text-align: center; margin: 30px 0;">
-                        <h3 style="color: #d4af37; font-size: 1.8em;">⚠️ CLÁUSULAS ABUSIVAS DETECTADAS</h3>
-                        <p style="color: #cccccc; font-size: 1em;">
-                            Passe o mouse sobre cada ícone para ver todos os detalhes
-                        </p>
-                    </div>
-                    """, unsafe_allow_html=True)
-                    
-                    # Usar HTML diretamente para evitar problemas de escape
-                    html_icons = """
-                    <div class="problems-icons-container fade-in">
-                    """
-                    
-                    # Adicionar cada ícone
-                    for idx, problema in enumerate(problemas):
-                        classe_css = {
-                            'critical': 'critical-icon',
-                            'medium': 'medium-icon',
-                            'low': 'low-icon'
-                        }.get(problema['gravidade'], 'low-icon')
-                        
-                        severidade_css = {
-                            'critical': 'severity-critical',
-                            'medium': 'severity-medium',
-                            'low': 'severity-low'
-                        }.get(problema['gravidade'], 'severity-low')
-                        
-                        texto_severidade = {
-                            'critical': 'CRÍTICO',
-                            'medium': 'MÉDIO',
-                            'low': 'BAIXO'
-                        }.get(problema['gravidade'], 'BAIXO')
-                        
-                        html_icons += f"""
-                        <div class="problem-icon {classe_css}">
-                            <span class="icon-emoji">{problema['icone']}</span>
-                            <div class="icon-title">{problema['nome']}</div>
-                            <span class="icon-severity {severidade_css}">{texto_severidade}</span>
-                            
-                            <div class="problem-tooltip">
-                                <div class="tooltip-header">
-                                    <span class="tooltip-emoji">{problema['icone']}</span>
-                                    <span class="tooltip-title">{problema['nome']}</span>
-                                </div>
-                                
-                                <div class="tooltip-section section-violation">
-                                    <span class="section-label">DESCRIÇÃO DO PROBLEMA</span>
-                                    <span class="section-content">{problema['descricao_detalhada']}</span>
-                                </div>
-                                
-                                <div class="tooltip-divider"></div>
-                                
-                                <div class="tooltip-section section-law">
-                                    <span class="section-label">BASE LEGAL</span>
-                                    <span class="section-content">{problema['lei']}</span>
-                                </div>
-                                
-                                <div class="tooltip-divider"></div>
-                                
-                                <div class="tooltip-section section-solution">
-                                    <span class="section-label">AÇÃO RECOMENDADA</span>
-                                    <span class="section-content section-highlight">{problema['contestacao']}</span>
-                                </div>
-                                
-                                <div class="tooltip-divider"></div>
-                                
-                                <div class="tooltip-section section-confidence">
-                                    <span class="section-label">NÍVEL DE CONFIABILIDADE</span>
-                                    <div class="confidence-badge">
-                                        {problema['nivel_confianca']} ({problema['confianca']:.0%})
-                                    </div>
-                                </div>
-                            </div>
-                        </div>
+            with col3:
+                cor_score = "#ff4444" if metricas['score_conformidade'] < 60 else "#ffaa44" if metricas['score_conformidade'] < 80 else "#00ff00"
+                st.markdown(f"""
+                <div class="metric-card" style="border-top-color: {cor_score};">
+                    <h3 style="margin: 0; font-size: 2.5em; color: {cor_score};">{metricas['score_conformidade']:.0f}</h3>
+                    <p style="margin: 10px 0 0 0; font-weight: 600; font-size: 1.1em;">SCORE</p>
+                </div>
+                """, unsafe_allow_html=True)
+                
+            # Detalhamento por documento
+            if resultado.get('documentos'):
+                linhas_documentos = ""
+                for documento in resultado['documentos']:
+                    resultado_documento = documento['resultado']
+                    if resultado_documento is None:
+                        colunas = '<td colspan="4" style="padding: 8px; color: #ff4444;">Não foi possível analisar</td>'
+                    else:
+                        metricas_documento = resultado_documento['metricas']
+                        icones = " ".join(p['icone'] for p in resultado_documento['problemas']) or "✅"
+                        colunas = f"""
+                        <td style="padding: 8px; text-align: center;">{metricas_documento['total_problemas']}</td>
+                        <td style="padding: 8px; text-align: center;">{metricas_documento['criticos']}</td>
+                        <td style="padding: 8px; text-align: center;">{metricas_documento['score_conformidade']:.0f}</td>
+                        <td style="padding: 8px;">{metricas_documento['nivel_risco']} {icones}</td>
                         """
+                    linhas_documentos += f"""
+                    <tr style="border-top: 1px solid rgba(212, 175, 55, 0.2);">
+                        <td style="padding: 8px; color: #d4af37;">{html.escape(documento['nome'])}</td>{colunas}
+                    </tr>
+                    """
                     
-                    html_icons += "</div>"
-                    st.markdown(html_icons, unsafe_allow_html=True)
+                st.markdown(f"""
+                <div style="margin: 30px 0; padding: 20px; background: rgba(20, 20, 20, 0.9); border-radius: 15px; border: 1px solid rgba(212, 175, 55, 0.3);">
+                    <h3 style="color: #d4af37; font-size: 1.4em; margin: 0 0 15px 0;">📚 POR DOCUMENTO</h3>
+                    <table style="width: 100%; color: #ffffff; border-collapse: collapse;">
+                        <tr style="color: #cccccc;">
+                            <th style="padding: 8px; text-align: left;">Documento</th>
+                            <th style="padding: 8px;">Problemas</th>
+                            <th style="padding: 8px;">Críticos</th>
+                            <th style="padding: 8px;">Score</th>
+                            <th style="padding: 8px; text-align: left;">Risco</th>
+                        </tr>
+                        {linhas_documentos}
+                    </table>
+                </div>
+                """, unsafe_allow_html=True)
+                
+            # Contrato reconhecido como variação de um modelo já analisado
+            uso_modelo = resultado.get('modelo')
+            if uso_modelo:
+                st.markdown(f"""
+                <div style="text-align: center; margin: 10px 0; color: #cccccc; font-size: 0.9em;">
+                    📄 Modelo de contrato reconhecido ({uso_modelo['similaridade']:.0%} semelhante):
+                    {uso_modelo['reaproveitadas']} de {uso_modelo['clausulas']} cláusulas já conhecidas
+                </div>
+                """, unsafe_allow_html=True)
+                
+            # Categorias que não puderam ser verificadas por completo
+            inconclusivos = resultado.get('inconclusivos') or []
+            if inconclusivos:
+                nomes_inconclusivos = ", ".join(f"{i['icone']} {i['nome']}" for i in inconclusivos)
+                st.markdown(f"""
+                <div style="text-align: center; margin: 20px 0; padding: 15px; background: rgba(255, 170, 68, 0.1); border-radius: 10px; border: 1px solid #ffaa44;">
+                    <p style="color: #ffaa44; margin: 0; font-size: 1em;">
+                        ⏱️ <strong>Análise inconclusiva:</strong> {nomes_inconclusivos}<br>
+                        A verificação destas cláusulas excedeu o tempo limite. Revise-as manualmente.
+                    </p>
+                </div>
+                """, unsafe_allow_html=True)
+                
+            # Divisor
+            st.markdown('<hr class="gold-divider">', unsafe_allow_html=True)
+                
+            # ÍCONES DOS PROBLEMAS DETECTADOS
+            if problemas:
+                st.markdown("""
+                <div style="text-align: center; margin: 30px 0;">
+                    <h3 style="color: #d4af37; font-size: 1.8em;">⚠️ CLÁUSULAS ABUSIVAS DETECTADAS</h3>
+                    <p style="color: #cccccc; font-size: 1em;">
+                        Passe o mouse sobre cada ícone para ver todos os detalhes
+                    </p>
+                </div>
+                """, unsafe_allow_html=True)
                     
-                    # Botão para exportar relatório
-                    st.markdown('<hr class="gold-divider">', unsafe_allow_html=True)
+                # Cards montados a partir dos fragmentos em cache
+                st.markdown(renderizar_cards(problemas), unsafe_allow_html=True)
+                
+                # Resultados guardados antes da tabela de ocorrências não a têm
+                tabelas = tabelas_ocorrencias(resultado)
+                if tabelas:
+                    mostrar_localizacoes(problemas, tabelas)
                     
-                    # Criar relatório
-                    dados_exportar = []
-                    for p in problemas:
-                        dados_exportar.append({
-                            'Cláusula Problemática': p['nome'],
-                            'Gravidade': p['gravidade'].upper(),
-                            'Descrição': p['descricao_detalhada'],
-                            'Base Legal': p['lei'],
-                            'Ação Recomendada': p['contestacao'],
-                            'Confiança': f"{p['confianca']:.1%}",
-                            'Ocorrências': p['ocorrencias'],
-                            'Trecho Encontrado': p['contexto']
-                        })
+                # Botão para exportar relatório
+                st.markdown('<hr class="gold-divider">', unsafe_allow_html=True)
                     
-                    df_relatorio = pd.DataFrame(dados_exportar)
+                col1, col2, col3 = st.columns([1, 2, 1])
+                with col2:
+                    formato = st.selectbox(
+                        "Formato do relatório",
+                        formatos_disponiveis(),
+                        format_func=str.upper,
+                        key="formato_relatorio"
+                    )
                     
-                    # Converter para CSV
-                    csv_buffer = io.StringIO()
-                    df_relatorio.to_csv(csv_buffer, index=False, encoding='utf-8-sig')
-                    csv_str = csv_buffer.getvalue()
+                    # O relatório só é gerado quando o botão é clicado
+                    exportacoes = obter_exportacoes()
+                    st.download_button(
+                        label="📥 BAIXAR RELATÓRIO COMPLETO",
+                        data=lambda: exportacoes.obter(problemas, formato),
+                        file_name=nome_arquivo(f"auditoria_contrato_{datetime.now().strftime('%Y%m%d_%H%M%S')}", formato),
+                        mime=tipo_mime(formato),
+                        use_container_width=True,
+                        type="primary"
+                    )
                     
-                    col1, col2, col3 = st.columns([1, 2, 1])
-                    with col2:
+                    if tabelas:
+                        nomes_categorias = {chave: config['nome'] for chave, config in auditoria.padroes_completos.items()}
                         st.download_button(
-                            label="📥 BAIXAR RELATÓRIO COMPLETO",
-                            data=csv_str,
-                            file_name=f"auditoria_contrato_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                            mime="text/csv",
-                            use_container_width=True,
-                            type="primary"
+                            label="📍 BAIXAR LOCALIZAÇÕES",
+                            data=lambda: gerar_localizacoes(tabelas, nomes_categorias, formato),
+                            file_name=nome_arquivo(f"localizacoes_contrato_{datetime.now().strftime('%Y%m%d_%H%M%S')}", formato),
+                            mime=tipo_mime(formato),
+                            use_container_width=True
                         )
                         
-                        # Informação adicional
-                        st.markdown("""
-                        <div style="text-align: center; margin-top: 20px; padding: 15px; background: rgba(212, 175, 55, 0.1); border-radius: 10px; border: 1px solid #d4af37;">
-                            <p style="color: #d4af37; margin: 0; font-size: 0.9em;">
-                                <strong>💡 Dica:</strong> Passe o mouse sobre os ícones vermelhos para ver todos os detalhes completos
-                            </p>
-                        </div>
-                        """, unsafe_allow_html=True)
-                else:
-                    # Mensagem de sucesso
+                    # Informação adicional
                     st.markdown("""
-                    <div style="text-align: center; padding: 40px; background: rgba(0, 100, 0, 0.2); border-radius: 15px; margin: 40px 0; border: 2px solid #00ff00;">
-                        <div style="font-size: 4em; color: #00ff00;">✅</div>
-                        <h3 style="color: #00ff00; margin: 20px 0; font-size: 1.8em;">CONTRATO REGULAR!</h3>
-                        <p style="color: #cccccc; font-size: 1.1em;">
-                            Nenhuma cláusula abusiva foi detectada em seu contrato.
+                    <div style="text-align: center; margin-top: 20px; padding: 15px; background: rgba(212, 175, 55, 0.1); border-radius: 10px; border: 1px solid #d4af37;">
+                        <p style="color: #d4af37; margin: 0; font-size: 0.9em;">
+                            <strong>💡 Dica:</strong> Passe o mouse sobre os ícones vermelhos para ver todos os detalhes completos
                         </p>
                     </div>
                     """, unsafe_allow_html=True)
+            else:
+                # Mensagem de sucesso
+                st.markdown("""
+                <div style="text-align: center; padding: 40px; background: rgba(0, 100, 0, 0.2); border-radius: 15px; margin: 40px 0; border: 2px solid #00ff00;">
+                    <div style="font-size: 4em; color: #00ff00;">✅</div>
+                    <h3 style="color: #00ff00; margin: 20px 0; font-size: 1.8em;">CONTRATO REGULAR!</h3>
+                    <p style="color: #cccccc; font-size: 1.1em;">
+                        Nenhuma cláusula abusiva foi detectada em seu contrato.
+                    </p>
+                </div>
+                """, unsafe_allow_html=True)
+        
+        if os.environ.get('BUROCRATA_DEBUG'):
+            mostrar_diagnostico_regras(auditoria)
     else:
         # Mensagem adicional se nenhum arquivo for enviado
         st.markdown("""
@@ -0,0 +1,58 @@
+import threading
+import time
+
+# --------------------------------------------------
+# AQUECIMENTO EM SEGUNDO PLANO
+# --------------------------------------------------
+#
+# Carrega o que a primeira auditoria vai precisar (regras compiladas,
+# pdfplumber) numa thread, enquanto a página já é exibida. Quem precisar
+# do recurso antes do fim simplesmente o carrega; os caches de cada
+# recurso evitam trabalho duplicado.
+
+_lock = threading.Lock()
+_thread = None
+_duracoes = {}   # nome -> segundos
+_erros = {}      # nome -> mensagem
+
+
+def _executar(tarefas):
+    for nome, funcao in tarefas:
+        inicio = time.perf_counter()
+        try:
+            funcao()
+        except Exception as e:
+            # O erro reaparece (e é tratado) quando o recurso for usado de fato
+            _erros[nome] = str(e)
+        _duracoes[nome] = time.perf_counter() - inicio
+
+
+def aquecer(tarefas):
+    """Executa as tarefas (pares nome, função) uma única vez por processo"""
+    global _thread
+    with _lock:
+        if _thread is not None:
+            return False
+        _thread = threading.Thread(target=_executar, args=(list(tarefas),), name='aquecimento', daemon=True)
+        _thread.start()
+        return True
+
+
+def aguardar(timeout=None):
+    """Espera o aquecimento terminar; True se terminou"""
+    thread = _thread
+    if thread is None:
+        return False
+    thread.join(timeout)
+    return not thread.is_alive()
+
+
+def estado():
+    """Situação do aquecimento e o tempo de cada tarefa concluída"""
+    thread = _thread
+    return {
+        'iniciado': thread is not None,
+        'concluido': thread is not None and not thread.is_alive(),
+        'segundos': {nome: round(segundos, 4) for nome, segundos in _duracoes.items()},
+        'erros': dict(_erros)
+    }
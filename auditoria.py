@@ -0,0 +1,626 @@
+import re
+import json
+import time
+import hashlib
+from bisect import bisect_right
+
+from motor_regras import OrcamentoRegras, segmentar_clausulas
+from ocorrencias import MARGEM_CONTEXTO, TabelaOcorrencias, guardar_trechos, limpar_contexto, pagina_da_posicao
+from similaridade import TAMANHO_PREFIXO, assinatura_minhash
+from catalogo_regras import carregar_regras
+from normalizacao import normalizar_texto, normalizar_com_mapa
+from instrumentacao import MedicaoAnalise
+
+# --------------------------------------------------
+# SISTEMA DE AUDITORIA 100% EFETIVO
+# --------------------------------------------------
+
+# Entra em versao_regras: incrementar quando o formato dos problemas ou das
+# ocorrências mudar, para que resultados antigos em cache não sejam usados
+# (2: contextos com o texto original)
+FORMATO_RESULTADOS = 2
+
+class SistemaAuditoria100Efetivo:
+    def __init__(self, tamanho_maximo_janela=1500, instrumentacao=None, orcamento_regra_segundos=None, regras=None,
+                 cache_janelas=None, modelos=None):
+        # Nenhuma correspondência pode ultrapassar uma cláusula ou este tamanho
+        self.tamanho_maximo_janela = tamanho_maximo_janela
+        
+        # InstrumentacaoRegras opcional: recebe as medições de cada análise
+        self.instrumentacao = instrumentacao
+        
+        # Tempo máximo de cada regra por análise (None = sem limite)
+        self.orcamento_regra_segundos = orcamento_regra_segundos
+        
+        # Cache opcional (ex.: CacheResultados) das ocorrências de cada janela
+        # pelo texto dela: versões revisadas de um contrato só têm as
+        # janelas alteradas analisadas de novo
+        self.cache_janelas = cache_janelas
+        
+        # IndiceModelos opcional: contratos parecidos com um já analisado
+        # reaproveitam as ocorrências das janelas iguais às do modelo
+        self.modelos = modelos
+        
+        # Categorias do catálogo externo (regras.json), já validadas e compiladas
+        if regras is None:
+            regras = carregar_regras()
+        self.regras = regras
+        self.padroes_completos = regras.padroes_completos
+        
+        # Palavras-chave de contexto para contratos
+        self.palavras_contrato = [
+            'contrato', 'locação', 'locador', 'locatário', 'aluguel', 'imóvel',
+            'cláusula', 'obrigações', 'direitos', 'deveres', 'prazo', 'valor',
+            'multa', 'garantia', 'fiador', 'caução', 'depósito'
+        ]
+        
+        # Padrões compilados uma única vez, agrupados por categoria
+        self.motor = regras.motor
+        
+        # Versão do conjunto de regras, usada para invalidar resultados em cache
+        assinatura = json.dumps(
+            [self.padroes_completos, self.tamanho_maximo_janela, FORMATO_RESULTADOS],
+            sort_keys=True,
+            ensure_ascii=False
+        )
+        self.versao_regras = hashlib.sha256(assinatura.encode('utf-8')).hexdigest()[:16]
+    
+    def preparar_texto_para_analise(self, texto, com_mapa=False):
+        """Prepara texto mantendo a estrutura mas normalizando para análise
+
+        Com com_mapa=True retorna também o MapaPosicoes que leva posições
+        do texto normalizado de volta ao original.
+        """
+        if not texto:
+            return ""
+        
+        # Mantém original para contexto
+        texto_original = texto
+        
+        # Minúsculas, sem acentos e espaços padronizados em uma única passada
+        if com_mapa:
+            texto, mapa = normalizar_com_mapa(texto)
+            return texto_original, texto, mapa
+        
+        return texto_original, normalizar_texto(texto)
+    
+    def buscar_padroes_amplos(self, texto_normalizado, padroes):
+        """Busca padrões com múltiplas estratégias"""
+        resultados = []
+        
+        for padrao in padroes:
+            try:
+                # Busca simples
+                matches = list(re.finditer(padrao, texto_normalizado, re.IGNORECASE))
+                resultados.extend(matches)
+            except re.error:
+                # Padrão inválido é ignorado
+                continue
+        
+        return resultados
+    
+    def analisar_contrato_completo(self, texto):
+        """Análise completa e abrangente do contrato"""
+        problemas_detectados, _ = self.analisar_contrato_guardado(texto)
+        return problemas_detectados
+    
+    def analisar_contrato_guardado(self, texto, tabela=None, clausulas=None):
+        """Como analisar_contrato_completo, retornando também as categorias inconclusivas
+
+        Com orcamento_regra_segundos, a regra que passa do limite para de ser
+        testada; a categoria dela entra em inconclusivos (listar_inconclusivos).
+        tabela, se informada (nova_tabela_ocorrencias), recebe todas as
+        ocorrências, não só a usada no contexto de cada problema. clausulas,
+        se informada (uma lista), recebe os pares (posição, texto normalizado)
+        de cada cláusula, para o índice do corpus.
+        """
+        medicao = self.iniciar_medicao()
+        orcamento = self.iniciar_orcamento()
+        inicio_analise = time.perf_counter()
+        
+        texto_original, texto_normalizado, mapa = self.preparar_texto_para_analise(texto, com_mapa=True)
+        
+        problemas_detectados = []
+        if tabela is not None:
+            tabela.tamanho_texto = len(texto_normalizado)
+        
+        # Segmentar em cláusulas para limitar o alcance dos padrões
+        janelas = None
+        if clausulas is not None:
+            janelas = segmentar_clausulas(texto_normalizado, self.tamanho_maximo_janela)
+            clausulas.extend((inicio, texto_normalizado[inicio:fim]) for inicio, fim in janelas)
+        
+        # Pré-filtro: sem nenhum literal obrigatório não há o que analisar
+        candidatos = self.motor.pre_filtrar(texto_normalizado)
+        if not candidatos:
+            self.concluir_medicao(medicao, time.perf_counter() - inicio_analise)
+            return problemas_detectados, []
+        
+        if janelas is None:
+            janelas = segmentar_clausulas(texto_normalizado, self.tamanho_maximo_janela)
+        
+        # Contrato parecido com um modelo conhecido só analisa as janelas que mudaram
+        assinatura, encontrado = self.buscar_modelo(texto_normalizado)
+        coletadas = {} if self.modelos is not None else None
+        
+        # Buscar ocorrências das categorias candidatas com o motor compilado
+        ocorrencias_por_categoria = self.buscar_janelas(
+            texto_normalizado, janelas, candidatos, medicao, orcamento,
+            encontrado[0] if encontrado else None, coletadas
+        )
+        self.registrar_modelo(assinatura, encontrado, coletadas, orcamento)
+        
+        if tabela is not None:
+            for chave, lista in ocorrencias_por_categoria.items():
+                for inicio, fim, indice in lista:
+                    tabela.adicionar(chave, indice, inicio, fim)
+            guardar_trechos(tabela, texto_normalizado, texto_original=texto_original, mapa=mapa)
+        
+        # Analisar cada tipo de problema
+        for chave in self.padroes_completos:
+            matches = ocorrencias_por_categoria.get(chave)
+            
+            if matches:
+                # Extrair contexto da melhor correspondência
+                melhor_inicio, melhor_fim, _ = matches[0]
+                contexto = self.extrair_contexto(texto_normalizado, melhor_inicio, melhor_fim, texto_original, mapa)
+                
+                problemas_detectados.append(
+                    self.montar_problema(chave, len(matches), melhor_inicio, contexto)
+                )
+        
+        self.concluir_medicao(medicao, time.perf_counter() - inicio_analise, orcamento)
+        return self.ordenar_problemas(problemas_detectados), self.listar_inconclusivos(orcamento)
+    
+    def buscar_janelas(self, texto_normalizado, janelas, candidatos, medicao=None, orcamento=None,
+                       modelo=None, coletadas=None):
+        """Como motor.buscar, reaproveitando as janelas já analisadas (modelo e cache_janelas)
+        
+        As ocorrências de uma janela só dependem do texto dela (e do
+        caractere anterior, visto por \\b e lookbehinds), então janelas
+        iguais em outro documento ou em outra versão do mesmo contrato dão
+        o mesmo resultado. As categorias ausentes de candidatos não têm
+        literal no texto inteiro, logo nem na janela. coletadas, se
+        informado, recebe as ocorrências de cada janela pela chave dela.
+        """
+        if self.cache_janelas is None and modelo is None and coletadas is None:
+            return self.motor.buscar(texto_normalizado, janelas, candidatos, medicao, orcamento)
+        
+        resultados = {}
+        novas = []
+        chaves_novas = []
+        for inicio, fim in janelas:
+            chave = _chave_janela(texto_normalizado, inicio, fim)
+            achados = modelo.janelas.get(chave) if modelo is not None else None
+            if achados is None and self.cache_janelas is not None:
+                achados = self.cache_janelas.obter(chave)
+            if achados is None:
+                novas.append((inicio, fim))
+                chaves_novas.append(chave)
+                continue
+            if coletadas is not None:
+                coletadas[chave] = achados
+            for categoria, lista in achados.items():
+                resultados.setdefault(categoria, []).extend(
+                    (inicio + relativo_inicio, inicio + relativo_fim, indice)
+                    for relativo_inicio, relativo_fim, indice in lista
+                )
+        
+        if novas:
+            encontrados = self.motor.buscar(texto_normalizado, novas, candidatos, medicao, orcamento)
+            for categoria, lista in encontrados.items():
+                resultados.setdefault(categoria, []).extend(lista)
+            
+            # Regra interrompida pelo orçamento deixa a janela incompleta
+            if orcamento is None or not orcamento.excedidas:
+                inicios = [inicio for inicio, _ in novas]
+                por_janela = [{} for _ in novas]
+                for categoria, lista in encontrados.items():
+                    for inicio, fim, indice in lista:
+                        posicao = bisect_right(inicios, inicio) - 1
+                        por_janela[posicao].setdefault(categoria, []).append(
+                            (inicio - inicios[posicao], fim - inicios[posicao], indice)
+                        )
+                for chave, achados in zip(chaves_novas, por_janela):
+                    if self.cache_janelas is not None:
+                        self.cache_janelas.guardar(chave, achados)
+                    if coletadas is not None:
+                        coletadas[chave] = achados
+        
+        # Mesma ordem do motor: por regra e, em cada regra, por posição
+        for lista in resultados.values():
+            lista.sort(key=lambda ocorrencia: (ocorrencia[2], ocorrencia[0]))
+        return resultados
+    
+    def buscar_modelo(self, texto_normalizado):
+        """Assinatura do texto e o (Modelo, similaridade) parecido, se houver"""
+        if self.modelos is None:
+            return None, None
+        assinatura = assinatura_minhash(texto_normalizado)
+        return assinatura, self.modelos.buscar(assinatura)
+    
+    def registrar_modelo(self, assinatura, encontrado, coletadas, orcamento=None):
+        """Guarda o contrato analisado como modelo, se nenhum modelo serviu para ele
+        
+        Um modelo parecido pela assinatura mas com menos da metade das
+        cláusulas iguais (outro modelo com o mesmo começo) também não serve.
+        """
+        if self.modelos is None or not coletadas:
+            return
+        if encontrado is not None:
+            reaproveitadas = sum(1 for chave in coletadas if chave in encontrado[0].janelas)
+            if 2 * reaproveitadas >= len(coletadas):
+                return
+        # Janelas interrompidas pelo orçamento não estão em coletadas
+        if orcamento is not None and orcamento.excedidas:
+            return
+        self.modelos.adicionar(assinatura, coletadas)
+    
+    def iniciar_orcamento(self):
+        """OrcamentoRegras para uma nova análise, ou None sem limite"""
+        if not self.orcamento_regra_segundos:
+            return None
+        return OrcamentoRegras(self.orcamento_regra_segundos)
+    
+    def listar_inconclusivos(self, orcamento):
+        """Categorias com alguma regra interrompida pelo orçamento de tempo"""
+        if orcamento is None:
+            return []
+        
+        inconclusivos = []
+        for chave, regras in orcamento.inconclusivas().items():
+            config = self.padroes_completos[chave]
+            inconclusivos.append({
+                'id': chave,
+                'nome': config['nome'],
+                'icone': config['icone'],
+                'regras': regras
+            })
+        return inconclusivos
+    
+    def iniciar_medicao(self):
+        """MedicaoAnalise para uma nova análise, ou None sem instrumentação"""
+        if self.instrumentacao is None:
+            return None
+        return MedicaoAnalise(self.versao_regras)
+    
+    def concluir_medicao(self, medicao, segundos, orcamento=None):
+        """Entrega a medição de uma análise concluída à instrumentação"""
+        if medicao is None:
+            return
+        medicao.segundos_total += segundos
+        if orcamento is not None:
+            medicao.excedidas |= orcamento.excedidas
+        self.instrumentacao.registrar(medicao)
+    
+    def nova_tabela_ocorrencias(self):
+        """TabelaOcorrencias vazia, com as categorias deste auditor"""
+        return TabelaOcorrencias(self.padroes_completos)
+    
+    def extrair_contexto(self, texto_normalizado, inicio_match, fim_match, texto_original=None, mapa=None):
+        """Trecho em torno de uma correspondência, limpo para exibição
+
+        Com texto_original e mapa (MapaPosicoes), o trecho sai do texto
+        original, com maiúsculas e acentos.
+        """
+        inicio = max(0, inicio_match - MARGEM_CONTEXTO)
+        fim = min(len(texto_normalizado), fim_match + MARGEM_CONTEXTO)
+        if mapa is not None:
+            return limpar_contexto(mapa.alinhar(texto_original, texto_normalizado, inicio, fim))
+        return limpar_contexto(texto_normalizado[inicio:fim])
+    
+    def montar_problema(self, chave, ocorrencias, posicao, contexto):
+        """Monta o registro de um problema detectado"""
+        config = self.padroes_completos[chave]
+        
+        # Calcular confiança baseada no número de correspondências
+        confianca = min(0.5 + (ocorrencias * 0.2), 1.0)
+        
+        # Determinar nível de confiança
+        if confianca >= 0.9:
+            nivel_confianca = "ALTA"
+            cor_confianca = "#00ff00"
+        elif confianca >= 0.7:
+            nivel_confianca = "MÉDIA"
+            cor_confianca = "#ffff00"
+        else:
+            nivel_confianca = "BAIXA"
+            cor_confianca = "#ff4444"
+        
+        return {
+            'id': chave,
+            'nome': config['nome'],
+            'gravidade': config['gravidade'],
+            'descricao_detalhada': config['descricao_detalhada'],
+            'lei': config['lei'],
+            'icone': config['icone'],
+            'contestacao': config['contestacao'],
+            'contexto': contexto,
+            'confianca': confianca,
+            'nivel_confianca': nivel_confianca,
+            'cor_confianca': cor_confianca,
+            'cor_gravidade': config['cor'],
+            'posicao': posicao,
+            'ocorrencias': ocorrencias
+        }
+    
+    def ordenar_problemas(self, problemas_detectados):
+        """Ordena por gravidade e número de ocorrências"""
+        ordem_gravidade = {'critical': 0, 'medium': 1, 'low': 2}
+        problemas_detectados.sort(key=lambda x: (
+            ordem_gravidade.get(x['gravidade'], 3),
+            -x['ocorrencias'],
+            -x['confianca']
+        ))
+        
+        return problemas_detectados
+    
+    def combinar_problemas(self, listas_problemas):
+        """Junta os problemas de vários documentos, uma entrada por categoria
+
+        As ocorrências são somadas (e a confiança recalculada); posição e
+        contexto vêm do primeiro documento em que a categoria aparece.
+        """
+        primeiros = {}
+        totais = {}
+        for problemas in listas_problemas:
+            for problema in problemas:
+                chave = problema['id']
+                totais[chave] = totais.get(chave, 0) + problema['ocorrencias']
+                primeiros.setdefault(chave, problema)
+
+        combinados = [
+            self.montar_problema(chave, totais[chave], primeiros[chave]['posicao'], primeiros[chave]['contexto'])
+            for chave in self.padroes_completos
+            if chave in totais
+        ]
+        return self.ordenar_problemas(combinados)
+
+    def iniciar_analise_incremental(self, guardar_clausulas=False):
+        """Cria uma análise que recebe o contrato página a página"""
+        return AnaliseIncremental(self, guardar_clausulas)
+    
+    def gerar_metricas_avancadas(self, problemas):
+        """Gera métricas detalhadas da análise"""
+        total = len(problemas)
+        
+        criticos = sum(1 for p in problemas if p['gravidade'] == 'critical')
+        medios = sum(1 for p in problemas if p['gravidade'] == 'medium')
+        leves = sum(1 for p in problemas if p['gravidade'] == 'low')
+        
+        # Score baseado na gravidade e confiança
+        penalidade = 0
+        for p in problemas:
+            peso = p['confianca']
+            if p['gravidade'] == 'critical':
+                penalidade += 30 * peso
+            elif p['gravidade'] == 'medium':
+                penalidade += 15 * peso
+        
+        score = max(100 - penalidade, 0)
+        
+        # Nível de risco
+        if criticos >= 3:
+            nivel_risco = 'RISCO EXTREMO'
+        elif criticos >= 1:
+            nivel_risco = 'ALTO RISCO'
+        elif medios >= 2:
+            nivel_risco = 'ATENÇÃO'
+        else:
+            nivel_risco = 'BAIXO RISCO'
+        
+        return {
+            'total_problemas': total,
+            'criticos': criticos,
+            'medios': medios,
+            'leves': leves,
+            'score_conformidade': score,
+            'nivel_risco': nivel_risco,
+            'tem_criticos': criticos > 0
+        }
+
+def _chave_janela(texto, inicio, fim):
+    anterior = texto[inicio - 1] if inicio else ''
+    return hashlib.blake2b(f"{anterior}\x00{texto[inicio:fim]}".encode('utf-8'), digest_size=16).hexdigest()
+
+class AnaliseIncremental:
+    """Análise do contrato página a página, com resultados parciais
+
+    Só a cláusula ainda aberta no fim da última página (e a margem usada
+    no contexto dos achados) fica em memória. Ao final, o resultado é o
+    mesmo de analisar_contrato_completo sobre o texto inteiro.
+    """
+    
+    MARGEM_CONTEXTO = MARGEM_CONTEXTO
+    
+    def __init__(self, auditoria, guardar_clausulas=False):
+        self.auditoria = auditoria
+        self.buffer = ""
+        # Texto original alinhado ao buffer, posição a posição, para os contextos
+        self.exibicao = ""
+        self.base = 0           # posição global do início do buffer
+        self.inicio_aberto = 0  # posição global da janela ainda aberta
+        self.paginas = 0
+        self.tem_texto = False
+        
+        # Todas as ocorrências, em colunas; as ainda sem o texto do contexto
+        # completo ficam em pendentes até a próxima página chegar
+        self.tabela = auditoria.nova_tabela_ocorrencias()
+        self.pendentes = []
+        self.totais = {}
+        # Posição global do início de cada página, para numerar as ocorrências
+        self.inicios_paginas = []
+        # chave -> [indice_regra, inicio, fim, contexto ou None]
+        self.melhores = {}
+        
+        # Tempo de análise acumulado entre as páginas (sem a extração)
+        self.medicao = auditoria.iniciar_medicao()
+        self.segundos = 0.0
+        
+        # O orçamento de cada regra vale para o documento inteiro
+        self.orcamento = auditoria.iniciar_orcamento()
+        
+        # Pares (posição, texto normalizado) das cláusulas, para o índice do corpus
+        self.clausulas = [] if guardar_clausulas else None
+        
+        # Modelo parecido: procurado quando o início do contrato (TAMANHO_PREFIXO) chega
+        self.modelo_pendente = auditoria.modelos is not None
+        self.assinatura = None
+        self.modelo = None
+        self.coletadas = {} if auditoria.modelos is not None else None
+    
+    @property
+    def fim_buffer(self):
+        return self.base + len(self.buffer)
+    
+    def adicionar_pagina(self, texto_pagina):
+        """Normaliza a página, analisa as cláusulas já fechadas e descarta o resto"""
+        self.paginas += 1
+        self.inicios_paginas.append(self.fim_buffer)
+        if not texto_pagina:
+            return
+        if texto_pagina.strip():
+            self.tem_texto = True
+        
+        inicio = time.perf_counter()
+        
+        # Mesmo formato de extracao_pdf.extrair_texto: página entre quebras de linha
+        original, normalizado, mapa = self.auditoria.preparar_texto_para_analise(
+            f"\n{texto_pagina}\n", com_mapa=True
+        )
+        exibicao = mapa.alinhar(original, normalizado, 0, len(normalizado))
+        if self.buffer.endswith(' ') and normalizado.startswith(' '):
+            normalizado = normalizado[1:]
+            exibicao = exibicao[1:]
+        self.buffer += normalizado
+        self.exibicao += exibicao
+        
+        self._processar(final=False)
+        self.segundos += time.perf_counter() - inicio
+    
+    def finalizar(self):
+        """Analisa a última cláusula aberta e retorna os problemas definitivos"""
+        inicio = time.perf_counter()
+        self._processar(final=True)
+        problemas = self.problemas()
+        
+        self.auditoria.registrar_modelo(self.assinatura, self.modelo, self.coletadas, self.orcamento)
+        
+        self.segundos += time.perf_counter() - inicio
+        self.auditoria.concluir_medicao(self.medicao, self.segundos, self.orcamento)
+        return problemas
+    
+    def uso_modelo(self):
+        """Modelo reaproveitado nesta análise e quantas cláusulas vieram dele, ou None"""
+        if self.modelo is None:
+            return None
+        modelo, valor = self.modelo
+        return {
+            'modelo': modelo.id,
+            'similaridade': round(valor, 3),
+            'clausulas': len(self.coletadas),
+            'reaproveitadas': sum(1 for chave in self.coletadas if chave in modelo.janelas)
+        }
+    
+    def inconclusivos(self):
+        """Categorias com regras interrompidas pelo orçamento até agora"""
+        return self.auditoria.listar_inconclusivos(self.orcamento)
+    
+    def problemas(self):
+        """Problemas encontrados até agora, no formato de analisar_contrato_completo"""
+        problemas_detectados = []
+        for chave in self.auditoria.padroes_completos:
+            if chave not in self.melhores:
+                continue
+            
+            _, inicio, fim, contexto = self.melhores[chave]
+            if contexto is None:
+                # Contexto provisório com o texto disponível
+                contexto = self._contexto(inicio, fim)
+            
+            problemas_detectados.append(
+                self.auditoria.montar_problema(chave, self.totais[chave], inicio, contexto)
+            )
+        
+        return self.auditoria.ordenar_problemas(problemas_detectados)
+    
+    def _contexto(self, inicio, fim):
+        return self.auditoria.extrair_contexto(self.exibicao, inicio - self.base, fim - self.base)
+    
+    def _processar(self, final):
+        auditoria = self.auditoria
+        
+        if self.modelo_pendente:
+            # Nada foi analisado nem descartado ainda: o buffer começa no início do texto
+            if not final and self.fim_buffer < TAMANHO_PREFIXO:
+                return
+            self.assinatura, self.modelo = auditoria.buscar_modelo(self.buffer)
+            self.modelo_pendente = False
+        deslocamento = self.inicio_aberto - self.base
+        
+        janelas = segmentar_clausulas(self.buffer[deslocamento:], auditoria.tamanho_maximo_janela)
+        janelas = [(inicio + deslocamento, fim + deslocamento) for inicio, fim in janelas]
+        
+        if final or not janelas:
+            fechadas = janelas
+            self.inicio_aberto = self.fim_buffer
+        else:
+            # A última janela pode continuar na próxima página
+            fechadas = janelas[:-1]
+            self.inicio_aberto = self.base + janelas[-1][0]
+        
+        if fechadas and self.clausulas is not None:
+            self.clausulas.extend((self.base + inicio, self.buffer[inicio:fim]) for inicio, fim in fechadas)
+        
+        if fechadas:
+            candidatos = auditoria.motor.pre_filtrar(self.buffer)
+            if candidatos:
+                encontrados = auditoria.buscar_janelas(
+                    self.buffer, fechadas, candidatos, self.medicao, self.orcamento,
+                    self.modelo[0] if self.modelo else None, self.coletadas
+                )
+                self._registrar(encontrados)
+        
+        # Contextos pendentes ficam prontos quando já há texto suficiente depois deles
+        for melhor in self.melhores.values():
+            if melhor[3] is None and (final or melhor[2] + self.MARGEM_CONTEXTO <= self.fim_buffer):
+                melhor[3] = self._contexto(melhor[1], melhor[2])
+        
+        # O mesmo vale para o texto em torno de cada ocorrência da tabela
+        tabela = self.tabela
+        tabela.tamanho_texto = self.fim_buffer
+        prontas = []
+        pendentes = []
+        for indice in self.pendentes:
+            (prontas if final or tabela.margem(indice)[1] <= self.fim_buffer else pendentes).append(indice)
+        if prontas:
+            guardar_trechos(tabela, self.exibicao, self.base, prontas)
+        self.pendentes = pendentes
+        
+        # Descarta o texto que não é mais necessário
+        manter = self.inicio_aberto - self.MARGEM_CONTEXTO
+        for _, inicio, _, contexto in self.melhores.values():
+            if contexto is None:
+                manter = min(manter, inicio - self.MARGEM_CONTEXTO)
+        if pendentes:
+            manter = min(manter, min(tabela.margem(indice)[0] for indice in pendentes))
+        manter = max(manter, self.base)
+        
+        self.buffer = self.buffer[manter - self.base:]
+        self.exibicao = self.exibicao[manter - self.base:]
+        self.base = manter
+    
+    def _registrar(self, encontrados):
+        for chave, lista in encontrados.items():
+            self.totais[chave] = self.totais.get(chave, 0) + len(lista)
+            
+            for inicio, fim, indice in lista:
+                inicio += self.base
+                fim += self.base
+                self.pendentes.append(len(self.tabela))
+                self.tabela.adicionar(chave, indice, inicio, fim, pagina_da_posicao(self.inicios_paginas, inicio))
+                
+                # Melhor correspondência: primeira da regra declarada antes
+                melhor = self.melhores.get(chave)
+                if melhor is None or indice < melhor[0]:
+                    self.melhores[chave] = [indice, inicio, fim, None]
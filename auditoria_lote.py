@@ -0,0 +1,278 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from auditoria import SistemaAuditoria100Efetivo
+from catalogo_regras import CAMINHO_CATALOGO_PADRAO, carregar_regras
+from exportacao import exigir_formato, gravar_tabela
+from extracao_pdf import extrair_texto
+from indice_corpus import IndiceCorpus
+from similaridade import IndiceModelos
+
+# --------------------------------------------------
+# AUDITORIA EM LOTE (SEM INTERFACE)
+# --------------------------------------------------
+#
+# Uso:
+#   python auditoria_lote.py contratos/ --saida resultados.csv
+#   python auditoria_lote.py "lotes/2024-*/*.pdf" --saida resultados.parquet -t 16
+#   python auditoria_lote.py contratos/ --saida resultados.xlsx   (exige openpyxl)
+#   python auditoria_lote.py contratos/ --saida r.csv --indice corpus.db --carteira X
+#
+# O progresso é gravado em JSONL a cada arquivo; rodar o mesmo comando de
+# novo continua de onde parou, pulando os arquivos já auditados.
+
+FORMATOS = ('csv', 'jsonl', 'parquet', 'xlsx')
+
+COLUNAS_METRICAS = [
+    'total_problemas', 'criticos', 'medios', 'leves',
+    'score_conformidade', 'nivel_risco', 'tem_criticos'
+]
+
+COLUNAS_CSV = ['arquivo', 'sha256', 'status', 'erro'] + COLUNAS_METRICAS + ['problemas', 'inconclusivos', 'duracao']
+
+# Tipos das colunas no Parquet (as demais são texto)
+TIPOS_COLUNAS = {
+    'total_problemas': 'int64', 'criticos': 'int64', 'medios': 'int64', 'leves': 'int64',
+    'score_conformidade': 'double', 'tem_criticos': 'bool', 'duracao': 'double'
+}
+
+_auditoria = None
+
+
+def _inicializar_trabalhador(orcamento_regra_segundos=None, caminho_catalogo=CAMINHO_CATALOGO_PADRAO):
+    """Cada processo monta o auditor uma única vez"""
+    global _auditoria
+    _auditoria = SistemaAuditoria100Efetivo(
+        orcamento_regra_segundos=orcamento_regra_segundos,
+        regras=carregar_regras(caminho_catalogo),
+        # Lotes de uma carteira repetem os mesmos modelos de contrato
+        modelos=IndiceModelos()
+    )
+
+
+def auditar_caminho(caminho, com_clausulas=False):
+    """Extrai e analisa um PDF, retornando o registro de resultado
+
+    Com com_clausulas, o registro traz também as cláusulas normalizadas
+    ('clausulas'), que vão para o índice do corpus e não para o progresso.
+    """
+    if _auditoria is None:
+        _inicializar_trabalhador()
+
+    inicio = time.perf_counter()
+    registro = {'arquivo': caminho, 'sha256': None, 'status': 'ok', 'erro': None}
+
+    try:
+        with open(caminho, 'rb') as arquivo:
+            conteudo = arquivo.read()
+        registro['sha256'] = hashlib.sha256(conteudo).hexdigest()
+
+        # O paralelismo já é entre arquivos: extração serial dentro do processo
+        texto = extrair_texto(conteudo, trabalhadores=1)
+
+        if not texto.strip():
+            registro['status'] = 'sem_texto'
+        else:
+            clausulas = [] if com_clausulas else None
+            problemas, inconclusivos = _auditoria.analisar_contrato_guardado(texto, clausulas=clausulas)
+            registro.update(_auditoria.gerar_metricas_avancadas(problemas))
+            registro['problemas'] = problemas
+            registro['inconclusivos'] = inconclusivos
+            registro['versao_regras'] = _auditoria.versao_regras
+            if com_clausulas:
+                registro['clausulas'] = clausulas
+    except Exception as e:
+        registro['status'] = 'erro'
+        registro['erro'] = str(e)
+
+    registro['duracao'] = round(time.perf_counter() - inicio, 4)
+    return registro
+
+
+def listar_pdfs(entradas):
+    """Expande diretórios (recursivamente) e globs em caminhos de PDF únicos"""
+    caminhos = []
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            encontrados = glob.glob(os.path.join(entrada, '**', '*.pdf'), recursive=True)
+            encontrados += glob.glob(os.path.join(entrada, '**', '*.PDF'), recursive=True)
+        else:
+            encontrados = glob.glob(entrada, recursive=True)
+        caminhos.extend(os.path.abspath(c) for c in encontrados if os.path.isfile(c))
+
+    return sorted(set(caminhos))
+
+
+def ler_progresso(caminho_progresso):
+    """Último registro de cada arquivo já gravado no JSONL de progresso"""
+    registros = {}
+    if not os.path.exists(caminho_progresso):
+        return registros
+
+    with open(caminho_progresso, encoding='utf-8') as arquivo:
+        for linha in arquivo:
+            try:
+                registro = json.loads(linha)
+            except json.JSONDecodeError:
+                # Linha truncada por interrupção no meio da escrita
+                continue
+            registros[registro['arquivo']] = registro
+
+    return registros
+
+
+def _linha_tabular(registro):
+    linha = {coluna: registro.get(coluna) for coluna in COLUNAS_CSV}
+    linha['problemas'] = ';'.join(p['id'] for p in registro.get('problemas', []))
+    linha['inconclusivos'] = ';'.join(i['id'] for i in registro.get('inconclusivos', []))
+    return linha
+
+
+def exportar(registros, caminho_saida, formato):
+    """Grava os registros no formato final"""
+    if formato == 'jsonl':
+        # Compacta o próprio progresso, mantendo um registro por arquivo
+        temporario = caminho_saida + '.tmp'
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            for registro in registros:
+                arquivo.write(json.dumps(registro, ensure_ascii=False) + '\n')
+        os.replace(temporario, caminho_saida)
+    else:
+        # Linhas geradas sob demanda e gravadas em blocos
+        gravar_tabela(
+            (_linha_tabular(registro) for registro in registros),
+            COLUNAS_CSV, caminho_saida, formato, tipos=TIPOS_COLUNAS
+        )
+
+
+def indexar(indice, registro, clausulas, carteira=None):
+    """Leva ao índice do corpus um documento auditado por completo"""
+    if registro['status'] != 'ok' or registro['inconclusivos']:
+        return
+    try:
+        indice.registrar(
+            registro['sha256'], registro['problemas'], registro, clausulas,
+            nome=registro['arquivo'], carteira=carteira, versao_regras=registro['versao_regras']
+        )
+    except sqlite3.Error as e:
+        # O índice é um subproduto: a auditoria segue mesmo sem ele
+        print(f"Falha ao indexar {registro['arquivo']}: {e}", file=sys.stderr)
+
+
+def executar(entradas, caminho_saida, formato=None, trabalhadores=None, refazer_erros=True,
+             orcamento_regra_segundos=None, caminho_catalogo=CAMINHO_CATALOGO_PADRAO,
+             caminho_indice=None, carteira=None):
+    """Audita todos os PDFs das entradas e grava os resultados; retorna o resumo
+
+    Com caminho_indice, cada documento auditado também vai para o índice
+    do corpus (indice_corpus.py), na carteira informada.
+    """
+    if formato is None:
+        formato = os.path.splitext(caminho_saida)[1].lstrip('.').lower()
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato de saída não suportado: {formato}")
+    # Dependência opcional ausente falha antes de auditar, não no fim
+    if formato != 'jsonl':
+        exigir_formato(formato)
+
+    caminho_progresso = caminho_saida if formato == 'jsonl' else caminho_saida + '.progresso.jsonl'
+    concluidos = ler_progresso(caminho_progresso)
+
+    # Arquivos com erro voltam para a fila ao retomar, salvo pedido contrário
+    pendentes = [
+        caminho for caminho in listar_pdfs(entradas)
+        if caminho not in concluidos
+        or (refazer_erros and concluidos[caminho]['status'] == 'erro')
+    ]
+
+    # Valida o catálogo antes de abrir os processos
+    carregar_regras(caminho_catalogo)
+    indice = IndiceCorpus(caminho_indice) if caminho_indice else None
+
+    trabalhadores = trabalhadores or os.cpu_count() or 1
+    total = len(pendentes)
+    inicio = time.perf_counter()
+    feitos = 0
+
+    print(f"{total} arquivo(s) pendente(s), {len(concluidos)} já no progresso", file=sys.stderr)
+
+    with open(caminho_progresso, 'a', encoding='utf-8') as progresso:
+        def gravar(registro):
+            nonlocal feitos
+            clausulas = registro.pop('clausulas', None)
+            if indice is not None:
+                # Gravado só pelo processo principal: sem disputa pelo SQLite
+                indexar(indice, registro, clausulas, carteira)
+
+            concluidos[registro['arquivo']] = registro
+            progresso.write(json.dumps(registro, ensure_ascii=False) + '\n')
+            progresso.flush()
+
+            feitos += 1
+            if feitos % 25 == 0 or feitos == total:
+                taxa = feitos / max(time.perf_counter() - inicio, 1e-9)
+                print(f"[{feitos}/{total}] {taxa:.2f} docs/s", file=sys.stderr)
+
+        if trabalhadores == 1:
+            _inicializar_trabalhador(orcamento_regra_segundos, caminho_catalogo)
+            for caminho in pendentes:
+                gravar(auditar_caminho(caminho, indice is not None))
+        else:
+            with ProcessPoolExecutor(
+                max_workers=trabalhadores,
+                initializer=_inicializar_trabalhador,
+                initargs=(orcamento_regra_segundos, caminho_catalogo)
+            ) as pool:
+                futuros = [pool.submit(auditar_caminho, caminho, indice is not None) for caminho in pendentes]
+                for futuro in as_completed(futuros):
+                    gravar(futuro.result())
+
+    decorrido = time.perf_counter() - inicio
+    exportar(sorted(concluidos.values(), key=lambda r: r['arquivo']), caminho_saida, formato)
+
+    return {
+        'processados': feitos,
+        'total_registros': len(concluidos),
+        'erros': sum(1 for r in concluidos.values() if r['status'] == 'erro'),
+        'segundos': round(decorrido, 2),
+        'docs_por_segundo': round(feitos / decorrido, 2) if decorrido > 0 else 0.0
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Auditoria em lote de contratos em PDF")
+    parser.add_argument('entradas', nargs='+', help="Diretórios ou globs de arquivos PDF")
+    parser.add_argument('-o', '--saida', required=True, help="Arquivo de resultados (.csv, .jsonl, .parquet ou .xlsx)")
+    parser.add_argument('-f', '--formato', choices=FORMATOS, help="Formato de saída (padrão: extensão da saída)")
+    parser.add_argument('-t', '--trabalhadores', type=int, help="Processos em paralelo (padrão: núcleos da CPU)")
+    parser.add_argument('--nao-refazer-erros', action='store_true', help="Ao retomar, não tenta de novo arquivos com erro")
+    parser.add_argument('--catalogo', default=CAMINHO_CATALOGO_PADRAO, help="Catálogo de regras (.json ou .yaml)")
+    parser.add_argument('--orcamento-regra-ms', type=float, help="Tempo máximo de cada regra por documento (padrão: sem limite)")
+    parser.add_argument('--indice', help="Índice SQLite do corpus a alimentar (ver indice_corpus.py)")
+    parser.add_argument('--carteira', help="Carteira dos documentos no índice")
+    args = parser.parse_args(argv)
+
+    resumo = executar(
+        args.entradas,
+        args.saida,
+        formato=args.formato,
+        trabalhadores=args.trabalhadores,
+        refazer_erros=not args.nao_refazer_erros,
+        orcamento_regra_segundos=args.orcamento_regra_ms / 1000 if args.orcamento_regra_ms else None,
+        caminho_catalogo=args.catalogo,
+        caminho_indice=args.indice,
+        carteira=args.carteira
+    )
+    print(json.dumps(resumo, ensure_ascii=False), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
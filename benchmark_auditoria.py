@@ -0,0 +1,496 @@
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from auditoria import SistemaAuditoria100Efetivo
+from extracao_pdf import extrair_texto
+from instrumentacao import MedicaoAnalise
+from metricas_lote import colunas_de_problemas, linhas_metricas, metricas_em_lote
+from motor_regras import segmentar_clausulas, trechos_padrao
+
+# --------------------------------------------------
+# BENCHMARK DO MOTOR DE AUDITORIA
+# --------------------------------------------------
+#
+# Uso:
+#   python benchmark_auditoria.py --saida bench_atual.json
+#   python benchmark_auditoria.py --paginas 1 10 --comparar bench_anterior.json
+#   python benchmark_auditoria.py --paginas --tamanho-adversarial 0 --inicio 5
+#   python benchmark_auditoria.py --paginas --tamanho-adversarial 0 --metricas 50000
+#
+# Gera contratos sintéticos (PDF) com gatilhos de todas as categorias e
+# textos adversariais para os '.*?' (inclusive o pior caso de cada regra),
+# mede cada etapa e grava em JSON.
+# Com --inicio, mede também o início a frio do app em processos novos; com
+# --metricas, as métricas de uma carteira sintética, contrato a contrato e
+# em lote.
+
+PAGINAS_PADRAO = [1, 10, 100, 500]
+
+# Um gatilho por categoria de padroes_completos
+GATILHOS = {
+    'reajuste_ilegal': "O reajuste do aluguel será livre, a critério do locador.",
+    'garantia_dupla': "O locatário apresentará fiador e também caução de três aluguéis.",
+    'benfeitorias_ilegal': "O locatário renuncia a qualquer indenização por benfeitoria realizada.",
+    'venda_despeja': "Em caso de venda o locatário terá 15 dias para desocupar o imóvel.",
+    'multa_abusiva': "A multa rescisória será integral, equivalente a todo o período.",
+    'vistoria_unilateral': "A vistoria de saída será feita exclusivamente pelo locador.",
+    'renovacao_abusiva': "Findo o prazo, o contrato renovar-se-á automaticamente por prazo indeterminado.",
+    'proibicao_animais': "É proibido manter animais de qualquer espécie no imóvel."
+}
+
+FRASES_NEUTRAS = [
+    "O locatário pagará o aluguel até o quinto dia útil de cada mês.",
+    "As despesas ordinárias de condomínio correm por conta do locatário.",
+    "O imóvel destina-se exclusivamente ao uso residencial.",
+    "As partes elegem o foro da comarca de situação do imóvel.",
+    "O locador entregará o imóvel em perfeitas condições de uso.",
+    "Qualquer tolerância das partes não implicará novação contratual.",
+    "O pagamento será feito por boleto bancário emitido pela administradora.",
+    "O locatário manterá o imóvel limpo e conservado durante a locação."
+]
+
+LINHAS_POR_PAGINA = 45
+
+
+# --------------------------------------------------
+# GERAÇÃO DE CONTRATOS SINTÉTICOS
+# --------------------------------------------------
+
+def _escapar_pdf(texto):
+    texto = texto.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+    return texto.encode('cp1252', errors='replace')
+
+
+def gerar_pdf(paginas):
+    """PDF mínimo com uma lista de linhas por página (Helvetica, WinAnsi)"""
+    objetos = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # árvore de páginas, preenchida depois
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"
+    ]
+
+    referencias = []
+    for linhas in paginas:
+        conteudo = b"BT /F1 9 Tf 11 TL 40 800 Td " + b" ".join(
+            b"(" + _escapar_pdf(linha) + b") '" for linha in linhas
+        ) + b" ET"
+        objetos.append(b"<< /Length %d >>\nstream\n" % len(conteudo) + conteudo + b"\nendstream")
+        objetos.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (len(objetos))
+        )
+        referencias.append(b"%d 0 R" % len(objetos))
+
+    objetos[1] = b"<< /Type /Pages /Kids [" + b" ".join(referencias) + b"] /Count %d >>" % len(paginas)
+
+    saida = bytearray(b"%PDF-1.4\n")
+    posicoes = []
+    for numero, objeto in enumerate(objetos, 1):
+        posicoes.append(len(saida))
+        saida += b"%d 0 obj\n" % numero + objeto + b"\nendobj\n"
+
+    inicio_xref = len(saida)
+    saida += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1)
+    for posicao in posicoes:
+        saida += b"%010d 00000 n \n" % posicao
+    saida += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objetos) + 1, inicio_xref)
+    return bytes(saida)
+
+
+def gerar_contrato(numero_paginas, semente=0):
+    """Linhas de cada página de um contrato com cláusulas numeradas e todos os gatilhos"""
+    aleatorio = random.Random(semente)
+    total_linhas = numero_paginas * LINHAS_POR_PAGINA
+    gatilhos = list(GATILHOS.values())
+
+    # Gatilhos distribuídos pelo documento inteiro
+    posicoes_gatilhos = {
+        (i + 1) * total_linhas // (len(gatilhos) + 1): gatilho
+        for i, gatilho in enumerate(gatilhos)
+    }
+
+    linhas = []
+    clausula = 1
+    for indice in range(total_linhas):
+        if indice in posicoes_gatilhos:
+            linhas.append(posicoes_gatilhos[indice])
+        elif indice % 12 == 0:
+            linhas.append(f"CLÁUSULA {clausula}ª - DISPOSIÇÕES GERAIS")
+            clausula += 1
+        else:
+            linhas.append(aleatorio.choice(FRASES_NEUTRAS))
+
+    return [linhas[i:i + LINHAS_POR_PAGINA] for i in range(0, total_linhas, LINHAS_POR_PAGINA)]
+
+
+def gerar_textos_adversariais(tamanho=50_000):
+    """Textos com âncoras dos padrões que nunca completam a correspondência"""
+    ancoras = "reajuste valor aluguel aumento fiador exige renuncia nao integra prazo sem contrato multa "
+    sem_pontuacao = (ancoras * (tamanho // len(ancoras) + 1))[:tamanho]
+
+    # Mesmas âncoras, agora em frases curtas terminadas por ponto
+    com_pontuacao = ". ".join(ancoras.strip() for _ in range(tamanho // len(ancoras) + 1))[:tamanho]
+
+    return {
+        f'adversarial_sem_pontuacao_{tamanho}': sem_pontuacao,
+        f'adversarial_frases_curtas_{tamanho}': com_pontuacao
+    }
+
+
+def gerar_piores_casos(motor, tamanho=1500):
+    """(chave, indice) -> pior caso da regra, montado a partir do padrão
+
+    O primeiro trecho seguido dos trechos intermediários repetidos até o
+    tamanho, sem o último: cada '.*?' tem muitas ocorrências para tentar
+    e a correspondência nunca se completa. Regras sem lacuna ficam de fora.
+    """
+    textos = {}
+    for chave, padroes in motor.padroes.items():
+        for indice, padrao in enumerate(padroes):
+            trechos = trechos_padrao(padrao)
+            if len(trechos) < 2:
+                continue
+            meio = ' '.join(trechos[1:-1]) or trechos[0]
+            repeticoes = tamanho // (len(meio) + 1) + 1
+            textos[(chave, indice)] = (trechos[0] + ' ' + (meio + ' ') * repeticoes)[:tamanho]
+    return textos
+
+
+# --------------------------------------------------
+# MEDIÇÕES
+# --------------------------------------------------
+
+def _cronometrar(funcao, repeticoes):
+    tempos = []
+    resultado = None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return resultado, {
+        'min_s': round(min(tempos), 6),
+        'mediana_s': round(statistics.median(tempos), 6)
+    }
+
+
+def _pico_memoria(funcao):
+    """Pico de memória alocada (KB) durante a chamada"""
+    tracemalloc.start()
+    try:
+        funcao()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(pico / 1024, 1)
+
+
+def custo_por_regra(auditoria, texto_normalizado):
+    """Tempo e ocorrências de cada regra isolada, dentro das janelas de cláusula"""
+    janelas = segmentar_clausulas(texto_normalizado, auditoria.tamanho_maximo_janela)
+    custos = []
+
+    for chave, (_, regras) in auditoria.motor.categorias.items():
+        for indice, regra in enumerate(regras):
+            inicio = time.perf_counter()
+            ocorrencias = 0
+            for inicio_janela, fim_janela in janelas:
+                for _ in regra.finditer(texto_normalizado, inicio_janela, fim_janela):
+                    ocorrencias += 1
+            custos.append({
+                'categoria': chave,
+                'indice': indice,
+                'padrao': auditoria.motor.padroes[chave][indice],
+                'segundos': round(time.perf_counter() - inicio, 6),
+                'ocorrencias': ocorrencias
+            })
+
+    custos.sort(key=lambda c: -c['segundos'])
+    return custos
+
+
+def medir_cenario(auditoria, nome, repeticoes, pdf=None, texto=None):
+    """Mede extração, normalização, busca e métricas de um cenário"""
+    resultado = {'cenario': nome, 'etapas': {}, 'memoria_pico_kb': {}}
+
+    if pdf is not None:
+        resultado['bytes_pdf'] = len(pdf)
+        texto, resultado['etapas']['extracao'] = _cronometrar(
+            lambda: extrair_texto(pdf, trabalhadores=1), repeticoes
+        )
+        resultado['memoria_pico_kb']['extracao'] = _pico_memoria(
+            lambda: extrair_texto(pdf, trabalhadores=1)
+        )
+
+    resultado['caracteres'] = len(texto)
+
+    (_, texto_normalizado), resultado['etapas']['normalizacao'] = _cronometrar(
+        lambda: auditoria.preparar_texto_para_analise(texto), repeticoes
+    )
+
+    motor = auditoria.motor
+    candidatos, resultado['etapas']['pre_filtro'] = _cronometrar(
+        lambda: motor.pre_filtrar(texto_normalizado), repeticoes
+    )
+    janelas, resultado['etapas']['segmentacao'] = _cronometrar(
+        lambda: segmentar_clausulas(texto_normalizado, auditoria.tamanho_maximo_janela), repeticoes
+    )
+    _, resultado['etapas']['busca'] = _cronometrar(
+        lambda: motor.buscar(texto_normalizado, janelas, candidatos), repeticoes
+    )
+    medicao = MedicaoAnalise(auditoria.versao_regras)
+    motor.buscar(texto_normalizado, janelas, candidatos, medicao)
+    resultado['maior_chamada'] = _maior_chamada(medicao, motor)
+
+    # Análise completa (normalização + busca + montagem dos problemas)
+    problemas, resultado['etapas']['analise_total'] = _cronometrar(
+        lambda: auditoria.analisar_contrato_completo(texto), repeticoes
+    )
+    _, resultado['etapas']['metricas'] = _cronometrar(
+        lambda: auditoria.gerar_metricas_avancadas(problemas), repeticoes
+    )
+    resultado['memoria_pico_kb']['analise_total'] = _pico_memoria(
+        lambda: auditoria.analisar_contrato_completo(texto)
+    )
+
+    resultado['problemas'] = sorted(p['id'] for p in problemas)
+    resultado['regras'] = custo_por_regra(auditoria, texto_normalizado)
+    return resultado
+
+
+def _maior_chamada(medicao, motor):
+    """Chamada de match mais lenta da medição, com a regra que a fez"""
+    if not medicao.maior_chamada:
+        return None
+    (chave, indice), segundos = max(medicao.maior_chamada.items(), key=lambda item: item[1])
+    return {
+        'categoria': chave,
+        'regra': indice,
+        'padrao': motor.padroes[chave][indice],
+        'segundos': round(segundos, 6)
+    }
+
+
+def medir_piores_casos(auditoria, repeticoes):
+    """Uma chamada de match de cada regra no seu pior caso, do tamanho de uma janela"""
+    motor = auditoria.motor
+    regras = []
+    for (chave, indice), texto in gerar_piores_casos(motor, auditoria.tamanho_maximo_janela).items():
+        regra = motor.categorias[chave][1][indice]
+        _, tempos = _cronometrar(lambda: regra.match(texto), repeticoes)
+        regras.append({
+            'categoria': chave,
+            'indice': indice,
+            'padrao': motor.padroes[chave][indice],
+            'caracteres': len(texto),
+            **tempos
+        })
+
+    regras.sort(key=lambda r: -r['mediana_s'])
+    pior = regras[0]
+    return {
+        'cenario': 'pior_caso_regras',
+        'etapas': {'maior_chamada': {'min_s': pior['min_s'], 'mediana_s': pior['mediana_s']}},
+        'regras': regras
+    }
+
+
+# Roda em um processo novo a cada repetição. primeira_renderizacao é o fim
+# da primeira execução do script; aquecimento, o fim do aquecimento em
+# segundo plano (regras e pdfplumber). Tempos contados do início do processo.
+CODIGO_INICIO = """
+import json, sys, time
+inicio = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+importacao = time.perf_counter() - inicio
+teste = AppTest.from_file(sys.argv[1], default_timeout=120)
+teste.run()
+primeira_renderizacao = time.perf_counter() - inicio
+import aquecimento
+aquecimento.aguardar(120)
+print(json.dumps({
+    'importacao': importacao,
+    'primeira_renderizacao': primeira_renderizacao,
+    'aquecimento': time.perf_counter() - inicio,
+    'erro': [e.value for e in teste.exception]
+}))
+"""
+
+
+def medir_inicio(repeticoes):
+    """Tempo até a primeira renderização do app, a frio"""
+    diretorio = os.path.dirname(os.path.abspath(__file__))
+    medicoes = {'importacao': [], 'primeira_renderizacao': [], 'aquecimento': [], 'processo': []}
+
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        saida = subprocess.run(
+            [sys.executable, '-c', CODIGO_INICIO, os.path.join(diretorio, 'app.py')],
+            capture_output=True, text=True, check=True, cwd=diretorio
+        )
+        tempos = json.loads(saida.stdout.strip().splitlines()[-1])
+        if tempos.pop('erro'):
+            raise RuntimeError("O app falhou na primeira execução")
+        tempos['processo'] = time.perf_counter() - inicio
+        for etapa, segundos in tempos.items():
+            medicoes[etapa].append(segundos)
+
+    return {
+        'cenario': 'inicio_frio',
+        'etapas': {
+            etapa: {'min_s': round(min(tempos), 6), 'mediana_s': round(statistics.median(tempos), 6)}
+            for etapa, tempos in medicoes.items()
+        }
+    }
+
+
+def gerar_carteira(auditoria, contratos, semente=0):
+    """Listas de problemas sintéticas (contrato -> problemas), algumas vazias"""
+    aleatorio = random.Random(semente)
+    chaves = list(auditoria.padroes_completos)
+    carteira = {}
+    for numero in range(contratos):
+        problemas = [
+            auditoria.montar_problema(chave, aleatorio.choice([1, 1, 2, 3, 8]), 0, '')
+            for chave in chaves if aleatorio.random() < 0.3
+        ]
+        carteira[f"contrato_{numero}"] = auditoria.ordenar_problemas(problemas)
+    return carteira
+
+
+def medir_metricas_lote(auditoria, contratos, repeticoes):
+    """gerar_metricas_avancadas contrato a contrato contra metricas_em_lote"""
+    carteira = gerar_carteira(auditoria, contratos)
+    resultado = {'cenario': f"metricas_lote_{contratos}", 'etapas': {}}
+
+    esperado, resultado['etapas']['por_contrato'] = _cronometrar(
+        lambda: {nome: auditoria.gerar_metricas_avancadas(problemas) for nome, problemas in carteira.items()},
+        repeticoes
+    )
+    colunas, resultado['etapas']['colunas'] = _cronometrar(lambda: colunas_de_problemas(carteira), repeticoes)
+    metricas, resultado['etapas']['em_lote'] = _cronometrar(
+        lambda: metricas_em_lote(colunas, list(carteira)), repeticoes
+    )
+
+    # O lote só vale se reproduzir o cálculo original exatamente
+    if dict(linhas_metricas(metricas)) != esperado:
+        raise RuntimeError("metricas_em_lote diverge de gerar_metricas_avancadas")
+    resultado['achados'] = len(colunas['contrato'])
+    return resultado
+
+
+def _revisao():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def executar(paginas=PAGINAS_PADRAO, repeticoes=3, tamanho_adversarial=50_000, inicio=0, metricas=0):
+    """Roda todos os cenários e retorna o relatório em forma de dicionário"""
+    auditoria = SistemaAuditoria100Efetivo()
+    cenarios = []
+
+    for numero_paginas in paginas:
+        pdf = gerar_pdf(gerar_contrato(numero_paginas))
+        cenarios.append(medir_cenario(auditoria, f"paginas_{numero_paginas}", repeticoes, pdf=pdf))
+        print(f"paginas_{numero_paginas}: ok", file=sys.stderr)
+
+    if tamanho_adversarial:
+        for nome, texto in gerar_textos_adversariais(tamanho_adversarial).items():
+            cenarios.append(medir_cenario(auditoria, nome, repeticoes, texto=texto))
+            print(f"{nome}: ok", file=sys.stderr)
+        cenarios.append(medir_piores_casos(auditoria, repeticoes))
+        print("pior_caso_regras: ok", file=sys.stderr)
+
+    if inicio:
+        cenarios.append(medir_inicio(inicio))
+        print("inicio_frio: ok", file=sys.stderr)
+
+    if metricas:
+        cenarios.append(medir_metricas_lote(auditoria, metricas, repeticoes))
+        print(f"metricas_lote_{metricas}: ok", file=sys.stderr)
+
+    return {
+        'revisao': _revisao(),
+        'versao_regras': auditoria.versao_regras,
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'data': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'memoria_max_processo_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'cenarios': cenarios
+    }
+
+
+def comparar(atual, anterior, limite=1.2, minimo_s=0.001):
+    """Lista etapas que ficaram mais lentas que limite vezes a referência
+
+    Etapas abaixo de minimo_s nas duas medições são ignoradas (ruído).
+    """
+    referencia = {c['cenario']: c for c in anterior['cenarios']}
+    regressoes = []
+
+    for cenario in atual['cenarios']:
+        base = referencia.get(cenario['cenario'])
+        if base is None:
+            continue
+        for etapa, tempos in cenario['etapas'].items():
+            tempo_base = base['etapas'].get(etapa, {}).get('mediana_s')
+            if not tempo_base or max(tempo_base, tempos['mediana_s']) < minimo_s:
+                continue
+            razao = tempos['mediana_s'] / tempo_base
+            if razao > limite:
+                regressoes.append({
+                    'cenario': cenario['cenario'],
+                    'etapa': etapa,
+                    'antes_s': tempo_base,
+                    'depois_s': tempos['mediana_s'],
+                    'razao': round(razao, 2)
+                })
+
+    return regressoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark da extração e do motor de auditoria")
+    parser.add_argument('--paginas', type=int, nargs='*', default=PAGINAS_PADRAO, help="Tamanhos dos contratos sintéticos")
+    parser.add_argument('--repeticoes', type=int, default=3, help="Repetições por etapa (mediana e mínimo)")
+    parser.add_argument('--tamanho-adversarial', type=int, default=50_000, help="Caracteres dos textos adversariais (0 desliga)")
+    parser.add_argument('--inicio', type=int, default=0, help="Repetições da medição de início a frio do app (0 desliga)")
+    parser.add_argument('--metricas', type=int, default=0, help="Contratos da carteira sintética de métricas em lote (0 desliga)")
+    parser.add_argument('--saida', help="Arquivo JSON com o relatório (padrão: stdout)")
+    parser.add_argument('--comparar', help="Relatório JSON anterior para detectar regressões")
+    parser.add_argument('--limite', type=float, default=1.2, help="Razão de tempo considerada regressão")
+    args = parser.parse_args(argv)
+
+    relatorio = executar(args.paginas, args.repeticoes, args.tamanho_adversarial, args.inicio, args.metricas)
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as arquivo:
+            relatorio['regressoes'] = comparar(relatorio, json.load(arquivo), args.limite)
+
+    texto = json.dumps(relatorio, ensure_ascii=False, indent=2)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(texto)
+    else:
+        print(texto)
+
+    # Código de saída diferente de zero permite barrar regressões no CI
+    return 1 if relatorio.get('regressoes') else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# --------------------------------------------------
+# CACHE DE RESULTADOS POR CONTEÚDO
+# --------------------------------------------------
+
+class CacheResultados:
+    """Cache de auditorias endereçado pelo SHA-256 do PDF e pela versão das regras
+
+    Mantém um LRU limitado em memória e, opcionalmente, um segundo nível
+    em SQLite que sobrevive a reinícios do processo.
+    """
+
+    def __init__(self, capacidade=128, caminho_disco=None):
+        self.capacidade = capacidade
+        self.caminho_disco = caminho_disco
+        self._memoria = OrderedDict()
+        self._lock = threading.Lock()
+
+        if self.caminho_disco:
+            with self._conectar() as conexao:
+                conexao.execute(
+                    "CREATE TABLE IF NOT EXISTS resultados ("
+                    "chave TEXT PRIMARY KEY, valor TEXT NOT NULL, criado_em REAL NOT NULL)"
+                )
+
+    @staticmethod
+    def gerar_chave(conteudo, versao_regras):
+        """Chave do cache: hash do conteúdo do arquivo mais a versão das regras"""
+        return f"{hashlib.sha256(conteudo).hexdigest()}:{versao_regras}"
+
+    @contextmanager
+    def _conectar(self):
+        # Uma conexão por operação: o Streamlit atende sessões em threads distintas
+        conexao = sqlite3.connect(self.caminho_disco, timeout=10)
+        try:
+            with conexao:
+                yield conexao
+        finally:
+            conexao.close()
+
+    def _guardar_memoria(self, chave, valor):
+        with self._lock:
+            self._memoria[chave] = valor
+            self._memoria.move_to_end(chave)
+            while len(self._memoria) > self.capacidade:
+                self._memoria.popitem(last=False)
+
+    def obter(self, chave):
+        """Retorna o resultado guardado ou None"""
+        with self._lock:
+            valor = self._memoria.get(chave)
+            if valor is not None:
+                self._memoria.move_to_end(chave)
+                return valor
+
+        if not self.caminho_disco:
+            return None
+
+        try:
+            with self._conectar() as conexao:
+                linha = conexao.execute(
+                    "SELECT valor FROM resultados WHERE chave = ?", (chave,)
+                ).fetchone()
+        except sqlite3.Error:
+            return None
+
+        if linha is None:
+            return None
+
+        valor = json.loads(linha[0])
+        self._guardar_memoria(chave, valor)
+        return valor
+
+    def guardar(self, chave, valor):
+        """Guarda o resultado (precisa ser serializável em JSON para o disco)"""
+        self._guardar_memoria(chave, valor)
+
+        if not self.caminho_disco:
+            return
+
+        try:
+            with self._conectar() as conexao:
+                conexao.execute(
+                    "INSERT OR REPLACE INTO resultados (chave, valor, criado_em) VALUES (?, ?, ?)",
+                    (chave, json.dumps(valor, ensure_ascii=False), time.time())
+                )
+        except sqlite3.Error:
+            # Falha no disco não impede o uso do cache em memória
+            pass
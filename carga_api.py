@@ -0,0 +1,148 @@
+import argparse
+import base64
+import http.client
+import json
+import statistics
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+from benchmark_auditoria import gerar_contrato, gerar_pdf
+
+# --------------------------------------------------
+# GERADOR DE CARGA PARA A API
+# --------------------------------------------------
+#
+# Uso (com o servidor já no ar):
+#   python api_auditoria.py --workers 4 &
+#   python carga_api.py --concorrencia 8 --requisicoes 200 --paginas 20
+#   python carga_api.py --modo lote --tamanho-lote 16 --saida carga.json
+#
+# Cada cliente mantém uma conexão aberta e envia requisições em sequência;
+# o relatório traz vazão e percentis de latência.
+
+MODOS = ('pdf', 'texto', 'lote', 'stream')
+
+
+def montar_requisicao(modo, paginas, tamanho_lote):
+    """Caminho, cabeçalhos, corpo e número de documentos de uma requisição"""
+    linhas = gerar_contrato(paginas)
+    pdf = gerar_pdf(linhas)
+
+    if modo == 'pdf':
+        return '/auditar', {'Content-Type': 'application/pdf'}, pdf, 1
+    if modo == 'stream':
+        return '/auditar?stream=1', {'Content-Type': 'application/pdf'}, pdf, 1
+    if modo == 'texto':
+        texto = "".join("\n" + "\n".join(pagina) + "\n" for pagina in linhas)
+        return '/auditar', {'Content-Type': 'text/plain; charset=utf-8'}, texto.encode('utf-8'), 1
+
+    documento = base64.b64encode(pdf).decode('ascii')
+    corpo = json.dumps({'documentos': [{'id': i, 'pdf_base64': documento} for i in range(tamanho_lote)]})
+    return '/auditar/lote', {'Content-Type': 'application/json'}, corpo.encode('utf-8'), tamanho_lote
+
+
+def _cliente(url, requisicao, quantidade, latencias, erros, lock):
+    caminho, cabecalhos, corpo, _ = requisicao
+    partes = urlsplit(url)
+    conexao = http.client.HTTPConnection(partes.hostname, partes.port or 80, timeout=300)
+
+    for _ in range(quantidade):
+        inicio = time.perf_counter()
+        try:
+            conexao.request('POST', caminho, body=corpo, headers=cabecalhos)
+            resposta = conexao.getresponse()
+            conteudo = resposta.read()
+            # Lote e stream respondem 200 mesmo com erro em um documento
+            falhou = resposta.status != 200 or b'"status": "erro"' in conteudo
+        except (OSError, http.client.HTTPException):
+            falhou = True
+            conexao.close()
+            conexao = http.client.HTTPConnection(partes.hostname, partes.port or 80, timeout=300)
+
+        with lock:
+            if falhou:
+                erros.append(time.perf_counter() - inicio)
+            else:
+                latencias.append(time.perf_counter() - inicio)
+
+    conexao.close()
+
+
+def _percentil(valores, fracao):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(fracao * len(ordenados)))]
+
+
+def executar(url, modo='pdf', concorrencia=4, requisicoes=100, paginas=20, tamanho_lote=8):
+    """Dispara a carga e retorna o relatório"""
+    requisicao = montar_requisicao(modo, paginas, tamanho_lote)
+    latencias = []
+    erros = []
+    lock = threading.Lock()
+
+    # Requisições divididas entre os clientes o mais igualmente possível
+    clientes = [
+        threading.Thread(
+            target=_cliente,
+            args=(url, requisicao, requisicoes // concorrencia + (i < requisicoes % concorrencia), latencias, erros, lock)
+        )
+        for i in range(concorrencia)
+    ]
+
+    inicio = time.perf_counter()
+    for cliente in clientes:
+        cliente.start()
+    for cliente in clientes:
+        cliente.join()
+    duracao = time.perf_counter() - inicio
+
+    relatorio = {
+        'modo': modo,
+        'paginas': paginas,
+        'documentos_por_requisicao': requisicao[3],
+        'bytes_por_requisicao': len(requisicao[2]),
+        'concorrencia': concorrencia,
+        'requisicoes': requisicoes,
+        'erros': len(erros),
+        'duracao_s': round(duracao, 3),
+        'requisicoes_por_s': round(len(latencias) / duracao, 2),
+        'documentos_por_s': round(len(latencias) * requisicao[3] / duracao, 2)
+    }
+    if latencias:
+        relatorio['latencia_s'] = {
+            'media': round(statistics.mean(latencias), 4),
+            'p50': round(_percentil(latencias, 0.50), 4),
+            'p95': round(_percentil(latencias, 0.95), 4),
+            'p99': round(_percentil(latencias, 0.99), 4),
+            'max': round(max(latencias), 4)
+        }
+    return relatorio
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gerador de carga local para a API do auditor")
+    parser.add_argument('--url', default='http://127.0.0.1:8000', help="Endereço do servidor")
+    parser.add_argument('--modo', choices=MODOS, default='pdf', help="Tipo de requisição")
+    parser.add_argument('--concorrencia', type=int, default=4, help="Clientes simultâneos")
+    parser.add_argument('--requisicoes', type=int, default=100, help="Total de requisições")
+    parser.add_argument('--paginas', type=int, default=20, help="Páginas do contrato sintético")
+    parser.add_argument('--tamanho-lote', type=int, default=8, help="Documentos por requisição no modo lote")
+    parser.add_argument('--saida', help="Arquivo JSON com o relatório (padrão: stdout)")
+    args = parser.parse_args(argv)
+
+    relatorio = executar(args.url, args.modo, args.concorrencia, args.requisicoes, args.paginas, args.tamanho_lote)
+
+    texto = json.dumps(relatorio, ensure_ascii=False, indent=2)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(texto)
+    else:
+        print(texto)
+
+    return 1 if relatorio['erros'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,219 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+from motor_regras import REGEX_REFERENCIA_NUMERADA, MotorRegras, compilar_regra, montar_localizador
+
+# --------------------------------------------------
+# CATÁLOGO EXTERNO DE REGRAS
+# --------------------------------------------------
+#
+# As categorias ficam em regras.json (ou .yaml/.yml, com PyYAML instalado),
+# no mesmo formato de padroes_completos. O catálogo é validado e compilado
+# uma vez por processo e recompilado quando o arquivo muda.
+
+CAMINHO_CATALOGO_PADRAO = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'regras.json')
+
+CAMPOS_OBRIGATORIOS = ('nome', 'gravidade', 'descricao_detalhada', 'lei', 'icone', 'contestacao', 'cor', 'padroes')
+GRAVIDADES = ('critical', 'medium', 'low')
+
+REGEX_CHAVE = re.compile(r'[a-z0-9_]+')
+REGEX_COR = re.compile(r'#[0-9a-fA-F]{6}')
+
+
+class CatalogoInvalido(ValueError):
+    """Catálogo com erros; a lista completa fica em erros"""
+
+    def __init__(self, erros):
+        self.erros = erros
+        super().__init__("Catálogo de regras inválido:\n- " + "\n- ".join(erros))
+
+
+class RegrasCompiladas:
+    """Catálogo validado com o motor já compilado (índice de literais incluído)"""
+
+    def __init__(self, padroes_completos, motor, versao, origem=None):
+        self.padroes_completos = padroes_completos
+        self.motor = motor
+        self.versao = versao    # hash do conteúdo do catálogo
+        self.origem = origem
+
+
+def ler_catalogo(caminho):
+    """Conteúdo bruto do catálogo e o dicionário de categorias"""
+    with open(caminho, 'rb') as arquivo:
+        conteudo = arquivo.read()
+
+    if caminho.endswith(('.yaml', '.yml')):
+        try:
+            import yaml
+        except ImportError:
+            raise CatalogoInvalido(["catálogo em YAML exige o pacote PyYAML"])
+        try:
+            padroes = yaml.safe_load(conteudo)
+        except yaml.YAMLError as e:
+            raise CatalogoInvalido([f"não foi possível ler {caminho}: {e}"])
+    else:
+        try:
+            padroes = json.loads(conteudo)
+        except ValueError as e:
+            raise CatalogoInvalido([f"não foi possível ler {caminho}: {e}"])
+
+    return conteudo, padroes
+
+
+def validar_catalogo(padroes):
+    """Levanta CatalogoInvalido com todos os problemas encontrados"""
+    if not isinstance(padroes, dict) or not padroes:
+        raise CatalogoInvalido(["o catálogo deve ser um objeto com ao menos uma categoria"])
+
+    erros = []
+    for chave, config in padroes.items():
+        if not isinstance(chave, str) or not REGEX_CHAVE.fullmatch(chave):
+            erros.append(f"{chave!r}: use apenas letras minúsculas, números e '_'")
+        if not isinstance(config, dict):
+            erros.append(f"{chave}: a categoria deve ser um objeto")
+            continue
+
+        for campo in CAMPOS_OBRIGATORIOS:
+            if campo not in config:
+                erros.append(f"{chave}: campo obrigatório ausente: {campo}")
+            elif campo != 'padroes' and (not isinstance(config[campo], str) or not config[campo].strip()):
+                erros.append(f"{chave}.{campo}: deve ser um texto não vazio")
+
+        for campo in config:
+            if campo not in CAMPOS_OBRIGATORIOS:
+                erros.append(f"{chave}: campo desconhecido: {campo}")
+
+        if config.get('gravidade') not in GRAVIDADES and isinstance(config.get('gravidade'), str):
+            erros.append(f"{chave}.gravidade: deve ser uma de {', '.join(GRAVIDADES)}")
+        if isinstance(config.get('cor'), str) and not REGEX_COR.fullmatch(config['cor']):
+            erros.append(f"{chave}.cor: use o formato #rrggbb")
+
+        padroes_categoria = config.get('padroes')
+        if 'padroes' in config and (not isinstance(padroes_categoria, list) or not padroes_categoria):
+            erros.append(f"{chave}.padroes: deve ser uma lista não vazia")
+            continue
+
+        compiladas = []
+        for indice, padrao in enumerate(padroes_categoria or []):
+            if not isinstance(padrao, str) or not padrao:
+                erros.append(f"{chave}.padroes[{indice}]: deve ser um texto não vazio")
+                continue
+            try:
+                compiladas.append(compilar_regra(padrao, re.IGNORECASE))
+            except re.error as e:
+                erros.append(f"{chave}.padroes[{indice}]: expressão inválida ({e})")
+                continue
+            if REGEX_REFERENCIA_NUMERADA.search(padrao):
+                erros.append(f"{chave}.padroes[{indice}]: use grupo nomeado, (?P<nome>...) e (?P=nome), em vez de \\1")
+
+        # O motor junta as regras da categoria em uma só expressão: o que é
+        # válido sozinho pode não ser ali (ex.: '(?s)' no meio, grupo repetido)
+        if compiladas and len(compiladas) == len(padroes_categoria):
+            try:
+                montar_localizador(compiladas, re.IGNORECASE)
+            except re.error as e:
+                erros.append(
+                    f"{chave}.padroes: as regras não podem ser combinadas ({e}); "
+                    "use flags locais, como (?s:...), e nomes de grupo distintos"
+                )
+
+    if erros:
+        raise CatalogoInvalido(erros)
+
+
+def compilar_catalogo(caminho):
+    """Lê, valida e compila o catálogo"""
+    conteudo, padroes = ler_catalogo(caminho)
+    validar_catalogo(padroes)
+    versao = hashlib.sha256(conteudo).hexdigest()[:16]
+    try:
+        motor = MotorRegras(padroes)
+    except re.error as e:
+        # Não deveria passar da validação; trata como catálogo inválido
+        raise CatalogoInvalido([f"as regras não compilam no motor ({e})"])
+    return RegrasCompiladas(padroes, motor, versao, origem=caminho)
+
+
+def carregar_regras(caminho=CAMINHO_CATALOGO_PADRAO):
+    """Regras do catálogo, validadas e compiladas"""
+    return compilar_catalogo(caminho)
+
+
+class FonteRegras:
+    """Mantém as regras atuais e as troca quando o arquivo do catálogo muda
+
+    A troca é uma única atribuição: quem já pegou as regras antigas termina
+    com elas. Se o catálogo novo for inválido, as regras atuais continuam
+    valendo e o erro fica em ultimo_erro.
+    """
+
+    def __init__(self, caminho=CAMINHO_CATALOGO_PADRAO, intervalo=1.0):
+        self.caminho = caminho
+        self.intervalo = intervalo
+        self.ultimo_erro = None
+        self._lock = threading.Lock()
+        self._verificado_em = time.monotonic()
+        self._carimbo = self._carimbo_arquivo()
+        self._regras = carregar_regras(caminho)
+
+    def _carimbo_arquivo(self):
+        try:
+            estado = os.stat(self.caminho)
+        except OSError:
+            return None
+        return (estado.st_mtime_ns, estado.st_size)
+
+    def atuais(self):
+        """Regras em vigor, verificando o arquivo no máximo a cada intervalo"""
+        agora = time.monotonic()
+        if agora - self._verificado_em >= self.intervalo:
+            self._verificado_em = agora
+            if self._carimbo_arquivo() != self._carimbo:
+                self.recarregar()
+        return self._regras
+
+    def recarregar(self):
+        """Recompila o catálogo; retorna True se as regras foram trocadas"""
+        with self._lock:
+            carimbo = self._carimbo_arquivo()
+            try:
+                regras = carregar_regras(self.caminho)
+            except (OSError, CatalogoInvalido) as e:
+                self.ultimo_erro = str(e)
+                # Não tenta de novo até o arquivo mudar outra vez
+                self._carimbo = carimbo
+                return False
+
+            self.ultimo_erro = None
+            self._carimbo = carimbo
+            trocou = regras.versao != self._regras.versao
+            self._regras = regras
+            return trocou
+
+
+def main(argv=None):
+    """Valida e compila o catálogo (ex.: na etapa de build)"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Valida e compila o catálogo de regras")
+    parser.add_argument('catalogo', nargs='?', default=CAMINHO_CATALOGO_PADRAO, help="Arquivo do catálogo (.json, .yaml)")
+    args = parser.parse_args(argv)
+
+    try:
+        regras = compilar_catalogo(args.catalogo)
+    except CatalogoInvalido as e:
+        print(e)
+        return 1
+
+    total = sum(len(config['padroes']) for config in regras.padroes_completos.values())
+    print(f"{len(regras.padroes_completos)} categorias, {total} padrões, versão {regras.versao}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,232 @@
+import csv
+import hashlib
+import importlib.util
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from renderizacao import chave_linha, gerar_relatorio_csv, tabela_relatorio
+
+# --------------------------------------------------
+# EXPORTAÇÃO DE RELATÓRIOS
+# --------------------------------------------------
+#
+# Os relatórios só são gerados quando alguém pede o download e ficam em
+# cache pelo hash do resultado. CSV e JSONL usam só a biblioteca padrão;
+# XLSX (openpyxl) e Parquet (pyarrow) são importados apenas na hora de
+# exportar. Para lotes grandes, gravar_tabela escreve em blocos sem montar
+# a tabela inteira em memória.
+
+# formato -> (extensão, tipo MIME, módulo opcional exigido)
+FORMATOS_EXPORTACAO = {
+    'csv': ('csv', 'text/csv', None),
+    'jsonl': ('jsonl', 'application/x-ndjson', None),
+    'xlsx': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'openpyxl'),
+    'parquet': ('parquet', 'application/vnd.apache.parquet', 'pyarrow'),
+}
+
+TAMANHO_BLOCO = 1000
+
+
+class ExportacaoIndisponivel(RuntimeError):
+    """Formato desconhecido ou sem a dependência opcional instalada"""
+
+
+def formatos_disponiveis():
+    """Formatos cuja dependência está instalada, sem importá-la"""
+    return [
+        formato for formato, (_, _, modulo) in FORMATOS_EXPORTACAO.items()
+        if modulo is None or importlib.util.find_spec(modulo) is not None
+    ]
+
+
+def exigir_formato(formato):
+    """Levanta ExportacaoIndisponivel se o formato não puder ser gerado"""
+    if formato not in FORMATOS_EXPORTACAO:
+        raise ExportacaoIndisponivel(f"Formato de exportação não suportado: {formato}")
+    modulo = FORMATOS_EXPORTACAO[formato][2]
+    if modulo is not None and importlib.util.find_spec(modulo) is None:
+        raise ExportacaoIndisponivel(f"Exportar em {formato} exige o pacote {modulo}")
+
+
+def _blocos(linhas, tamanho):
+    bloco = []
+    for linha in linhas:
+        bloco.append(linha)
+        if len(bloco) >= tamanho:
+            yield bloco
+            bloco = []
+    if bloco:
+        yield bloco
+
+
+# --------------------------------------------------
+# GRAVAÇÃO EM BLOCOS
+# --------------------------------------------------
+
+def _gravar_csv(destino, colunas, linhas, tamanho_bloco):
+    texto = io.TextIOWrapper(destino, encoding='utf-8-sig', newline='')
+    escritor = csv.writer(texto)
+    escritor.writerow(colunas)
+    for bloco in _blocos(linhas, tamanho_bloco):
+        escritor.writerows([[linha.get(coluna) for coluna in colunas] for linha in bloco])
+    texto.flush()
+    texto.detach()
+
+
+def _gravar_jsonl(destino, colunas, linhas, tamanho_bloco):
+    for bloco in _blocos(linhas, tamanho_bloco):
+        destino.write("".join(
+            json.dumps({coluna: linha.get(coluna) for coluna in colunas}, ensure_ascii=False) + '\n'
+            for linha in bloco
+        ).encode('utf-8'))
+
+
+def _gravar_xlsx(destino, colunas, linhas, tamanho_bloco):
+    from openpyxl import Workbook
+
+    # write_only: as linhas vão para o arquivo sem ficar na memória
+    pasta = Workbook(write_only=True)
+    planilha = pasta.create_sheet('auditoria')
+    planilha.append(colunas)
+    for bloco in _blocos(linhas, tamanho_bloco):
+        for linha in bloco:
+            planilha.append([linha.get(coluna) for coluna in colunas])
+    pasta.save(destino)
+
+
+def _gravar_parquet(destino, colunas, linhas, tamanho_bloco, tipos):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # Esquema fixo: o tipo não depende do primeiro bloco (ex.: só erros)
+    esquema = pa.schema([(coluna, pa.type_for_alias(tipos.get(coluna, 'string'))) for coluna in colunas])
+    with pq.ParquetWriter(destino, esquema) as escritor:
+        for bloco in _blocos(linhas, tamanho_bloco):
+            escritor.write_table(pa.Table.from_pylist(
+                [{coluna: linha.get(coluna) for coluna in colunas} for linha in bloco], schema=esquema
+            ))
+
+
+def gravar_tabela(linhas, colunas, destino, formato, tipos=None, tamanho_bloco=TAMANHO_BLOCO):
+    """Grava as linhas (dicionários, qualquer iterável) em blocos de tamanho_bloco
+
+    destino é um caminho ou um arquivo binário aberto. tipos mapeia
+    coluna -> tipo do pyarrow ('int64', 'double', 'bool'...), usado no
+    Parquet; colunas ausentes são texto.
+    """
+    exigir_formato(formato)
+
+    if isinstance(destino, str):
+        temporario = f"{destino}.{os.getpid()}.tmp"
+        with open(temporario, 'wb') as arquivo:
+            gravar_tabela(linhas, colunas, arquivo, formato, tipos, tamanho_bloco)
+        os.replace(temporario, destino)
+        return
+
+    if formato == 'csv':
+        _gravar_csv(destino, colunas, linhas, tamanho_bloco)
+    elif formato == 'jsonl':
+        _gravar_jsonl(destino, colunas, linhas, tamanho_bloco)
+    elif formato == 'xlsx':
+        _gravar_xlsx(destino, colunas, linhas, tamanho_bloco)
+    else:
+        _gravar_parquet(destino, colunas, linhas, tamanho_bloco, tipos or {})
+
+
+# --------------------------------------------------
+# RELATÓRIO DE UM RESULTADO
+# --------------------------------------------------
+
+def hash_resultado(problemas):
+    """Identifica o conteúdo do relatório de um resultado"""
+    dados = json.dumps([chave_linha(p) for p in problemas], ensure_ascii=False, default=str)
+    return hashlib.sha256(dados.encode('utf-8')).hexdigest()[:16]
+
+
+class CacheExportacoes:
+    """Relatórios já gerados, por hash do resultado e formato (LRU)"""
+
+    def __init__(self, capacidade=32):
+        self.capacidade = capacidade
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, problemas, formato):
+        """Bytes do relatório, gerado só na primeira vez que é pedido"""
+        chave = (hash_resultado(problemas), formato)
+        with self._lock:
+            conteudo = self._itens.get(chave)
+            if conteudo is not None:
+                self._itens.move_to_end(chave)
+                return conteudo
+
+        conteudo = gerar_relatorio(problemas, formato)
+
+        with self._lock:
+            self._itens[chave] = conteudo
+            while len(self._itens) > self.capacidade:
+                self._itens.popitem(last=False)
+        return conteudo
+
+
+def gerar_relatorio(problemas, formato):
+    """Bytes do relatório dos problemas no formato pedido"""
+    exigir_formato(formato)
+
+    if formato == 'csv':
+        # Mesmo texto dos fragmentos em cache da renderização
+        return gerar_relatorio_csv(problemas).encode('utf-8')
+
+    colunas, valores = tabela_relatorio(problemas)
+    destino = io.BytesIO()
+    gravar_tabela(
+        (dict(zip(colunas, linha)) for linha in valores), colunas, destino, formato,
+        tipos={'Ocorrências': 'int64'}
+    )
+    return destino.getvalue()
+
+
+# --------------------------------------------------
+# LOCALIZAÇÕES DAS OCORRÊNCIAS
+# --------------------------------------------------
+
+COLUNAS_LOCALIZACOES = ['Documento', 'Cláusula Problemática', 'Página', 'Regra', 'Início', 'Fim', 'Trecho Encontrado']
+
+
+def linhas_localizacoes(tabelas, nomes_categorias):
+    """Uma linha por ocorrência; tabelas são pares (documento, TabelaOcorrencias)
+
+    O trecho de cada ocorrência é montado só quando a linha é gravada.
+    """
+    for documento, tabela in tabelas:
+        for linha in tabela.linhas():
+            yield {
+                'Documento': documento,
+                'Cláusula Problemática': nomes_categorias.get(linha['id'], linha['id']),
+                'Página': linha['pagina'] or None,
+                'Regra': linha['regra'],
+                'Início': linha['inicio'],
+                'Fim': linha['fim'],
+                'Trecho Encontrado': linha['contexto']
+            }
+
+
+def gerar_localizacoes(tabelas, nomes_categorias, formato):
+    """Bytes da lista de todas as ocorrências no formato pedido"""
+    destino = io.BytesIO()
+    gravar_tabela(
+        linhas_localizacoes(tabelas, nomes_categorias), COLUNAS_LOCALIZACOES, destino, formato,
+        tipos={'Página': 'int64', 'Regra': 'int64', 'Início': 'int64', 'Fim': 'int64'}
+    )
+    return destino.getvalue()
+
+
+def nome_arquivo(prefixo, formato):
+    return f"{prefixo}.{FORMATOS_EXPORTACAO[formato][0]}"
+
+
+def tipo_mime(formato):
+    return FORMATOS_EXPORTACAO[formato][1]
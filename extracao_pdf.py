@@ -0,0 +1,472 @@
+import hashlib
+import io
+import os
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from cache_resultados import CacheResultados
+
+# --------------------------------------------------
+# EXTRAÇÃO DE TEXTO POR PÁGINA
+# --------------------------------------------------
+
+# Número de processos para extração paralela (padrão: um por núcleo)
+TRABALHADORES_PDF = int(os.environ.get('BUROCRATA_TRABALHADORES_PDF', os.cpu_count() or 1))
+
+# Abaixo deste número de páginas a extração é serial
+PAGINAS_MINIMAS_PARALELO = int(os.environ.get('BUROCRATA_PAGINAS_PARALELO', 16))
+
+# OCR (Tesseract, local) das páginas sem camada de texto, como contratos
+# digitalizados. Só entra se pytesseract e o executável estiverem
+# instalados; BUROCRATA_OCR=0 desliga.
+OCR_ATIVO = os.environ.get('BUROCRATA_OCR', '1') != '0'
+DPI_OCR = int(os.environ.get('BUROCRATA_OCR_DPI', 300))
+IDIOMA_OCR = os.environ.get('BUROCRATA_OCR_IDIOMA', 'por')
+
+# O OCR custa segundos por página e usa muito mais CPU que o pdfplumber:
+# pool próprio e menor, para não tomar o lugar da extração comum
+TRABALHADORES_OCR = int(os.environ.get('BUROCRATA_TRABALHADORES_OCR', max(1, (os.cpu_count() or 1) // 2)))
+
+_pools = {}   # nome -> (pool, trabalhadores)
+_pool_lock = threading.Lock()
+_ocr_disponivel = None
+_cache_ocr = None
+
+
+def _abrir_pdf(conteudo):
+    # pdfplumber só é importado na primeira extração: a importação custa
+    # mais que carregar as regras e não deve atrasar a inicialização
+    import pdfplumber
+
+    return pdfplumber.open(io.BytesIO(conteudo))
+
+
+def _extrair_pagina(pagina):
+    """Texto de uma página, ou vazio se a extração falhar"""
+    try:
+        return pagina.extract_text() or ""
+    except Exception:
+        return ""
+    finally:
+        pagina.close()
+
+
+def _extrair_indices(conteudo, indices):
+    """Executado no processo filho: abre o PDF a partir dos bytes e extrai as páginas indicadas"""
+    with _abrir_pdf(conteudo) as pdf:
+        return [_extrair_pagina(pdf.pages[indice]) for indice in indices]
+
+
+def _atualizar_assinatura(resumo, objeto, profundidade):
+    from pdfminer.pdftypes import PDFStream, resolve1
+
+    objeto = resolve1(objeto)
+    if isinstance(objeto, PDFStream):
+        # Bytes brutos: identificam o fluxo sem precisar descomprimir
+        resumo.update(objeto.get_rawdata() or b"")
+        objeto = objeto.attrs
+
+    if isinstance(objeto, dict):
+        for chave in sorted(objeto):
+            if chave == 'Parent':
+                continue
+            resumo.update(chave.encode())
+            if profundidade:
+                _atualizar_assinatura(resumo, objeto[chave], profundidade - 1)
+    elif isinstance(objeto, list):
+        for item in objeto:
+            if profundidade:
+                _atualizar_assinatura(resumo, item, profundidade - 1)
+    else:
+        resumo.update(repr(objeto).encode())
+
+
+def assinatura_pagina(pagina):
+    """Hash do que determina o texto da página, sem extraí-lo
+
+    Cobre os fluxos de conteúdo, os recursos (fontes, codificações,
+    ToUnicode, XObjects) e a geometria da página.
+    """
+    objeto = pagina.page_obj
+    resumo = hashlib.blake2b(digest_size=16)
+    for fluxo in objeto.contents:
+        _atualizar_assinatura(resumo, fluxo, 0)
+    _atualizar_assinatura(resumo, objeto.resources, 6)
+    resumo.update(repr((objeto.mediabox, objeto.cropbox, objeto.rotate)).encode())
+    return resumo.hexdigest()
+
+
+def _obter_pool(trabalhadores, nome='extracao'):
+    """Pool de processos persistente, recriado se o número de trabalhadores mudar"""
+    with _pool_lock:
+        pool, atuais = _pools.get(nome, (None, 0))
+        if pool is None or atuais != trabalhadores:
+            if pool is not None:
+                pool.shutdown(wait=False)
+            # spawn: o processo do Streamlit tem várias threads e fork não é seguro
+            pool = ProcessPoolExecutor(
+                max_workers=trabalhadores,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+            _pools[nome] = (pool, trabalhadores)
+        return pool
+
+
+def _dividir_intervalos(total_paginas, trabalhadores):
+    """Intervalos [inicio, fim) de páginas para distribuir entre os processos"""
+    # Dois intervalos por processo equilibram páginas mais pesadas
+    quantidade = min(total_paginas, trabalhadores * 2)
+    tamanho = -(-total_paginas // quantidade)
+    return [
+        (inicio, min(inicio + tamanho, total_paginas))
+        for inicio in range(0, total_paginas, tamanho)
+    ]
+
+
+def _descartar_pool(nome='extracao'):
+    """Esquece o pool quebrado; o próximo uso cria outro"""
+    with _pool_lock:
+        _pools.pop(nome, None)
+
+
+def _extrair_paralelo(conteudo, indices, trabalhadores):
+    """Distribui as páginas entre os processos e entrega na ordem de indices"""
+    partes = _dividir_intervalos(len(indices), trabalhadores)
+
+    pool = _obter_pool(trabalhadores)
+    futuros = [
+        pool.submit(_extrair_indices, conteudo, indices[inicio:fim])
+        for inicio, fim in partes
+    ]
+
+    for futuro in futuros:
+        yield from futuro.result()
+
+
+# --------------------------------------------------
+# OCR DAS PÁGINAS SEM TEXTO
+# --------------------------------------------------
+
+def ocr_disponivel():
+    """True se pytesseract e o executável do Tesseract estão instalados (verificado uma vez)"""
+    global _ocr_disponivel
+    if _ocr_disponivel is None:
+        try:
+            import pytesseract
+
+            pytesseract.get_tesseract_version()
+            _ocr_disponivel = True
+        except Exception:
+            _ocr_disponivel = False
+    return _ocr_disponivel
+
+
+def obter_cache_ocr():
+    """Cache do texto reconhecido, por assinatura da página, DPI e idioma
+
+    Em memória, com segundo nível em disco opcional
+    (ex.: BUROCRATA_CACHE_OCR_DB=/var/cache/burocrata_ocr.db).
+    """
+    global _cache_ocr
+    with _pool_lock:
+        if _cache_ocr is None:
+            _cache_ocr = CacheResultados(
+                capacidade=int(os.environ.get('BUROCRATA_CACHE_OCR', 1000)),
+                caminho_disco=os.environ.get('BUROCRATA_CACHE_OCR_DB')
+            )
+        return _cache_ocr
+
+
+def _ocr_indices(conteudo, indices, dpi, idioma):
+    """Renderiza as páginas e passa pelo Tesseract; None nas que falharem"""
+    import pytesseract
+
+    textos = []
+    with _abrir_pdf(conteudo) as pdf:
+        for indice in indices:
+            pagina = pdf.pages[indice]
+            try:
+                imagem = pagina.to_image(resolution=dpi).original
+                textos.append(pytesseract.image_to_string(imagem, lang=idioma) or "")
+            except Exception:
+                textos.append(None)
+            finally:
+                pagina.close()
+    return textos
+
+
+def _ocr_no_pool(conteudo, indices, dpi, idioma):
+    """_ocr_indices num processo do pool de OCR"""
+    # Vários processos de OCR ao mesmo tempo: uma thread do Tesseract em cada
+    os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+    return _ocr_indices(conteudo, indices, dpi, idioma)
+
+
+def _guardar_ocr(cache, chave, texto):
+    # Falha de OCR não vai para o cache: a página é tentada de novo na próxima vez
+    if texto is None:
+        return ""
+    cache.guardar(chave, texto)
+    return texto
+
+
+def _completar_com_ocr(conteudo, textos, trabalhadores):
+    """Repassa os textos das páginas, trocando os vazios pelo OCR, na mesma ordem
+
+    Cada página sem texto vai sozinha para o pool de OCR e as seguintes
+    continuam sendo extraídas enquanto isso. O PDF só é aberto aqui se
+    houver página sem texto.
+    """
+    fila = deque()   # texto pronto ou (futuro, chave, indice)
+    pdf = None
+    cache = None
+
+    def resolver(item):
+        if isinstance(item, str):
+            return item
+        futuro, chave, indice = item
+        try:
+            texto = futuro.result()[0]
+        except BrokenProcessPool:
+            _descartar_pool('ocr')
+            texto = _ocr_indices(conteudo, [indice], DPI_OCR, IDIOMA_OCR)[0]
+        return _guardar_ocr(cache, chave, texto)
+
+    try:
+        for indice, texto in enumerate(textos):
+            if texto.strip() or not ocr_disponivel():
+                fila.append(texto)
+            else:
+                if pdf is None:
+                    pdf = _abrir_pdf(conteudo)
+                    cache = obter_cache_ocr()
+                chave = f"{assinatura_pagina(pdf.pages[indice])}:{DPI_OCR}:{IDIOMA_OCR}"
+                reconhecido = cache.obter(chave)
+                if reconhecido is not None:
+                    fila.append(reconhecido)
+                elif trabalhadores <= 1:
+                    reconhecido = _ocr_indices(conteudo, [indice], DPI_OCR, IDIOMA_OCR)[0]
+                    fila.append(_guardar_ocr(cache, chave, reconhecido))
+                else:
+                    futuro = _obter_pool(trabalhadores, 'ocr').submit(
+                        _ocr_no_pool, conteudo, [indice], DPI_OCR, IDIOMA_OCR
+                    )
+                    fila.append((futuro, chave, indice))
+
+            # Entrega o que já está pronto no começo da fila
+            while fila and (isinstance(fila[0], str) or fila[0][0].done()):
+                yield resolver(fila.popleft())
+
+        while fila:
+            yield resolver(fila.popleft())
+    finally:
+        if pdf is not None:
+            pdf.close()
+
+
+def iterar_paginas(conteudo, trabalhadores=None, paginas_minimas_paralelo=None, cache_paginas=None, ocr=None):
+    """Gera o texto de cada página do PDF, na ordem, à medida que é extraído
+
+    Com cache_paginas (ex.: CacheResultados), o texto de cada página fica
+    guardado pela assinatura_pagina e só as páginas novas ou alteradas são
+    extraídas de novo. Páginas sem camada de texto passam pelo OCR
+    (ocr=None segue BUROCRATA_OCR); com trabalhadores=1, também o OCR é
+    feito no próprio processo.
+    """
+    if trabalhadores is None:
+        trabalhadores = TRABALHADORES_PDF
+    if ocr is None:
+        ocr = OCR_ATIVO
+
+    textos = _iterar_camada_texto(conteudo, trabalhadores, paginas_minimas_paralelo, cache_paginas)
+    if not ocr:
+        return textos
+    return _completar_com_ocr(conteudo, textos, min(trabalhadores, TRABALHADORES_OCR))
+
+
+def _iterar_camada_texto(conteudo, trabalhadores, paginas_minimas_paralelo, cache_paginas):
+    """Texto de cada página pelo pdfplumber (camada de texto), na ordem"""
+    if paginas_minimas_paralelo is None:
+        paginas_minimas_paralelo = PAGINAS_MINIMAS_PARALELO
+
+    with _abrir_pdf(conteudo) as pdf:
+        total_paginas = len(pdf.pages)
+
+        textos = {}
+        assinaturas = None
+        if cache_paginas is not None:
+            assinaturas = [assinatura_pagina(pagina) for pagina in pdf.pages]
+            for indice, assinatura in enumerate(assinaturas):
+                texto = cache_paginas.obter(assinatura)
+                if texto is not None:
+                    textos[indice] = texto
+        faltando = [indice for indice in range(total_paginas) if indice not in textos]
+
+        # Poucas páginas a extrair: abrir o PDF em outros processos custa mais que extrair
+        if trabalhadores <= 1 or len(faltando) < paginas_minimas_paralelo:
+            for indice, pagina in enumerate(pdf.pages):
+                texto = textos.get(indice)
+                if texto is None:
+                    texto = _extrair_pagina(pagina)
+                    if assinaturas is not None:
+                        cache_paginas.guardar(assinaturas[indice], texto)
+                yield texto
+            return
+
+    def extraidas():
+        entregues = 0
+        try:
+            for texto in _extrair_paralelo(conteudo, faltando, trabalhadores):
+                entregues += 1
+                yield texto
+        except BrokenProcessPool:
+            # Processo filho morreu (ex.: falta de memória): continua de forma
+            # serial e deixa o pool ser recriado na próxima chamada
+            _descartar_pool()
+            yield from _extrair_indices(conteudo, faltando[entregues:])
+
+    novas = extraidas()
+    for indice in range(total_paginas):
+        texto = textos.get(indice)
+        if texto is None:
+            texto = next(novas)
+            if assinaturas is not None:
+                cache_paginas.guardar(assinaturas[indice], texto)
+        yield texto
+
+
+def extrair_paginas(conteudo, trabalhadores=None, paginas_minimas_paralelo=None, cache_paginas=None, ocr=None):
+    """Retorna a lista com o texto de cada página do PDF, na ordem original"""
+    return list(iterar_paginas(conteudo, trabalhadores, paginas_minimas_paralelo, cache_paginas, ocr))
+
+
+def extrair_texto(conteudo, trabalhadores=None, paginas_minimas_paralelo=None, cache_paginas=None, ocr=None):
+    """Texto completo do PDF, cada página entre quebras de linha"""
+    paginas = iterar_paginas(conteudo, trabalhadores, paginas_minimas_paralelo, cache_paginas, ocr)
+
+    # Uma única junção em vez de concatenar página a página
+    return "".join(f"\n{texto_pagina}\n" for texto_pagina in paginas if texto_pagina)
+
+
+def extrair_documentos(conteudos, trabalhadores=None, paginas_minimas_paralelo=None, cache_paginas=None, ocr=None):
+    """Extrai vários PDFs ao mesmo tempo no pool compartilhado
+
+    Gera (indice, paginas, erro) à medida que cada documento fica pronto,
+    não na ordem de entrada. Documentos grandes são divididos em intervalos
+    de páginas; os pequenos vão inteiros para um processo. Em caso de falha,
+    paginas é None e erro traz a exceção. Com cache_paginas, como em
+    iterar_paginas, só as páginas ausentes do cache são extraídas. As
+    páginas sem texto de cada documento passam pelo OCR (como em
+    iterar_paginas) antes de entregá-lo.
+    """
+    if trabalhadores is None:
+        trabalhadores = TRABALHADORES_PDF
+    if paginas_minimas_paralelo is None:
+        paginas_minimas_paralelo = PAGINAS_MINIMAS_PARALELO
+    if ocr is None:
+        ocr = OCR_ATIVO
+
+    if trabalhadores <= 1:
+        for indice, conteudo in enumerate(conteudos):
+            try:
+                yield indice, extrair_paginas(conteudo, 1, cache_paginas=cache_paginas, ocr=ocr), None
+            except Exception as e:
+                yield indice, None, e
+        return
+
+    pool = _obter_pool(trabalhadores)
+    futuros = {}   # futuro -> (indice, posicao, inicio, fim)
+    partes = {}    # indice -> textos de cada intervalo (None = pendente)
+    paginas_documentos = {}  # indice -> (textos já conhecidos, páginas faltando, assinaturas)
+
+    for indice, conteudo in enumerate(conteudos):
+        try:
+            with _abrir_pdf(conteudo) as pdf:
+                total_paginas = len(pdf.pages)
+                textos = {}
+                assinaturas = None
+                if cache_paginas is not None:
+                    assinaturas = [assinatura_pagina(pagina) for pagina in pdf.pages]
+                    for numero, assinatura in enumerate(assinaturas):
+                        texto = cache_paginas.obter(assinatura)
+                        if texto is not None:
+                            textos[numero] = texto
+        except Exception as e:
+            yield indice, None, e
+            continue
+
+        faltando = [numero for numero in range(total_paginas) if numero not in textos]
+        if not faltando:
+            # Sem páginas ou todas já no cache
+            try:
+                paginas = [textos[numero] for numero in range(total_paginas)]
+                paginas = _completar_documento(conteudo, paginas, ocr, trabalhadores)
+            except Exception as e:
+                yield indice, None, e
+                continue
+            yield indice, paginas, None
+            continue
+
+        paginas_documentos[indice] = (textos, faltando, assinaturas)
+
+        if len(faltando) >= paginas_minimas_paralelo:
+            intervalos = _dividir_intervalos(len(faltando), trabalhadores)
+        else:
+            intervalos = [(0, len(faltando))]
+
+        partes[indice] = [None] * len(intervalos)
+        for posicao, (inicio, fim) in enumerate(intervalos):
+            futuro = pool.submit(_extrair_indices, conteudo, faltando[inicio:fim])
+            futuros[futuro] = (indice, posicao, inicio, fim)
+
+    for futuro in as_completed(futuros):
+        indice, posicao, inicio, fim = futuros[futuro]
+        if indice not in partes:
+            continue  # outro intervalo do documento já falhou
+
+        try:
+            textos = futuro.result()
+        except BrokenProcessPool:
+            # Mesmo tratamento de iterar_paginas: refaz o intervalo aqui mesmo
+            _descartar_pool()
+            try:
+                textos = _extrair_indices(conteudos[indice], paginas_documentos[indice][1][inicio:fim])
+            except Exception as e:
+                del partes[indice], paginas_documentos[indice]
+                yield indice, None, e
+                continue
+        except Exception as e:
+            del partes[indice], paginas_documentos[indice]
+            yield indice, None, e
+            continue
+
+        partes[indice][posicao] = textos
+        if all(parte is not None for parte in partes[indice]):
+            extraidas = [texto for parte in partes.pop(indice) for texto in parte]
+            paginas = _juntar_paginas(paginas_documentos.pop(indice), extraidas, cache_paginas)
+            try:
+                paginas = _completar_documento(conteudos[indice], paginas, ocr, trabalhadores)
+            except Exception as e:
+                yield indice, None, e
+                continue
+            yield indice, paginas, None
+
+
+def _juntar_paginas(paginas_documento, extraidas, cache_paginas):
+    """Páginas do documento na ordem, com as extraídas agora guardadas no cache"""
+    textos, faltando, assinaturas = paginas_documento
+    for numero, texto in zip(faltando, extraidas):
+        textos[numero] = texto
+        if assinaturas is not None:
+            cache_paginas.guardar(assinaturas[numero], texto)
+    return [textos[numero] for numero in range(len(textos))]
+
+
+def _completar_documento(conteudo, paginas, ocr, trabalhadores):
+    """Páginas do documento com OCR nas que ficaram sem texto, se ativo"""
+    if not ocr:
+        return paginas
+    return list(_completar_com_ocr(conteudo, paginas, min(trabalhadores, TRABALHADORES_OCR)))
@@ -0,0 +1,136 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# --------------------------------------------------
+# FILA DE AUDITORIAS EM SEGUNDO PLANO
+# --------------------------------------------------
+
+NA_FILA = 'na_fila'
+PROCESSANDO = 'processando'
+CONCLUIDA = 'concluida'
+ERRO = 'erro'
+
+
+class FilaCheia(Exception):
+    """Envio recusado pelo controle de admissão"""
+
+
+class Tarefa:
+    """Uma auditoria enviada à fila e o estado dela"""
+
+    def __init__(self, descricao, dono=None):
+        self.id = uuid.uuid4().hex
+        self.descricao = descricao
+        self.dono = dono
+        self.estado = NA_FILA
+        self.progresso = {}   # preenchido pela própria auditoria
+        self.resultado = None
+        self.erro = None
+        self.criada_em = time.time()
+        self.iniciada_em = None
+        self.concluida_em = None
+
+    @property
+    def terminada(self):
+        return self.estado in (CONCLUIDA, ERRO)
+
+
+class FilaAuditorias:
+    """Pool limitado de threads com fila de tamanho máximo e retenção de resultados
+
+    As threads só coordenam: a extração pesada roda no pool de processos
+    de extracao_pdf. Envios além de max_fila (ou de max_por_dono para um
+    mesmo dono) são recusados com FilaCheia em vez de esperar sem limite.
+    Tarefas terminadas ficam disponíveis por retencao_segundos, até
+    max_retidas.
+    """
+
+    def __init__(self, trabalhadores=2, max_fila=32, max_por_dono=2, retencao_segundos=1800, max_retidas=256):
+        self.trabalhadores = trabalhadores
+        self.max_fila = max_fila
+        self.max_por_dono = max_por_dono
+        self.retencao_segundos = retencao_segundos
+        self.max_retidas = max_retidas
+        self._executor = ThreadPoolExecutor(max_workers=trabalhadores, thread_name_prefix='auditoria')
+        self._tarefas = OrderedDict()
+        self._lock = threading.Lock()
+
+    def enviar(self, funcao, *args, descricao='', dono=None):
+        """Coloca funcao(tarefa, *args) na fila e retorna a Tarefa
+
+        Levanta FilaCheia se a fila ou o limite do dono estiverem esgotados.
+        """
+        with self._lock:
+            self._limpar()
+
+            pendentes = [t for t in self._tarefas.values() if not t.terminada]
+            if len(pendentes) >= self.max_fila:
+                raise FilaCheia(f"Fila cheia ({len(pendentes)} auditorias pendentes)")
+            if dono is not None and self.max_por_dono:
+                do_dono = sum(1 for t in pendentes if t.dono == dono)
+                if do_dono >= self.max_por_dono:
+                    raise FilaCheia(f"Limite de {self.max_por_dono} auditorias simultâneas por sessão")
+
+            tarefa = Tarefa(descricao, dono)
+            self._tarefas[tarefa.id] = tarefa
+
+        self._executor.submit(self._executar, tarefa, funcao, args)
+        return tarefa
+
+    def _executar(self, tarefa, funcao, args):
+        tarefa.estado = PROCESSANDO
+        tarefa.iniciada_em = time.time()
+        try:
+            tarefa.resultado = funcao(tarefa, *args)
+            estado = CONCLUIDA
+        except Exception as e:
+            tarefa.erro = str(e)
+            estado = ERRO
+        # O estado vem por último: quem vê a tarefa terminada (o _limpar
+        # de outra thread, por exemplo) já encontra concluida_em preenchido
+        tarefa.concluida_em = time.time()
+        tarefa.estado = estado
+
+    def _limpar(self):
+        """Descarta tarefas terminadas vencidas ou além do limite (com o lock)"""
+        limite = time.time() - self.retencao_segundos
+        terminadas = [t for t in self._tarefas.values() if t.terminada]
+
+        excedentes = len(terminadas) - self.max_retidas
+        for tarefa in terminadas:
+            vencida = tarefa.concluida_em is not None and tarefa.concluida_em < limite
+            if vencida or excedentes > 0:
+                del self._tarefas[tarefa.id]
+                excedentes -= 1
+
+    def obter(self, tarefa_id):
+        """Tarefa pelo id, ou None se desconhecida ou já descartada"""
+        with self._lock:
+            return self._tarefas.get(tarefa_id)
+
+    def posicao(self, tarefa):
+        """Quantas tarefas estão na fila à frente desta (0 = em execução ou próxima)"""
+        with self._lock:
+            if tarefa.estado != NA_FILA:
+                return 0
+            frente = 0
+            for outra in self._tarefas.values():
+                if outra is tarefa:
+                    break
+                if outra.estado == NA_FILA:
+                    frente += 1
+            return frente
+
+    def estatisticas(self):
+        with self._lock:
+            estados = [t.estado for t in self._tarefas.values()]
+        return {
+            'na_fila': estados.count(NA_FILA),
+            'processando': estados.count(PROCESSANDO),
+            'retidas': estados.count(CONCLUIDA) + estados.count(ERRO),
+            'trabalhadores': self.trabalhadores,
+            'max_fila': self.max_fila
+        }
@@ -0,0 +1,272 @@
+import argparse
+import json
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+
+from normalizacao import normalizar_texto
+
+# --------------------------------------------------
+# ÍNDICE DO CORPUS DE CONTRATOS AUDITADOS
+# --------------------------------------------------
+#
+# Cada auditoria pode deixar no índice (SQLite) o texto normalizado das
+# cláusulas, os achados por categoria e as métricas do documento. As
+# consultas respondem sem reanalisar nada:
+#
+#   python indice_corpus.py indice.db --com garantia_dupla multa_abusiva --carteira X
+#   python indice_corpus.py indice.db --buscar "incc"
+#   python indice_corpus.py indice.db --buscar "reajuste" --com multa_abusiva --limite 20
+#   python indice_corpus.py indice.db --metricas --carteira X
+#
+# O texto das cláusulas fica na tabela clausulas; clausulas_fts é um índice
+# FTS5 sobre ela (external content), sem uma segunda cópia do texto.
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS documentos (
+    id INTEGER PRIMARY KEY,
+    sha256 TEXT NOT NULL UNIQUE,
+    nome TEXT,
+    carteira TEXT,
+    versao_regras TEXT,
+    indexado_em REAL NOT NULL,
+    total_problemas INTEGER,
+    criticos INTEGER,
+    medios INTEGER,
+    leves INTEGER,
+    score REAL,
+    nivel_risco TEXT
+);
+CREATE INDEX IF NOT EXISTS documentos_carteira ON documentos (carteira, score);
+CREATE INDEX IF NOT EXISTS documentos_score ON documentos (score);
+
+CREATE TABLE IF NOT EXISTS achados (
+    categoria TEXT NOT NULL,
+    documento_id INTEGER NOT NULL,
+    gravidade TEXT,
+    ocorrencias INTEGER,
+    confianca REAL,
+    PRIMARY KEY (categoria, documento_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS achados_documento ON achados (documento_id);
+
+CREATE TABLE IF NOT EXISTS clausulas (
+    id INTEGER PRIMARY KEY,
+    documento_id INTEGER NOT NULL,
+    inicio INTEGER NOT NULL,
+    texto TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS clausulas_documento ON clausulas (documento_id);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS clausulas_fts USING fts5 (
+    texto, content='clausulas', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+"""
+
+
+class IndiceCorpus:
+    """Índice persistente de documentos auditados, achados e cláusulas"""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        with self._conectar() as conexao:
+            # WAL: leituras não esperam a gravação de outra auditoria
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.executescript(ESQUEMA)
+
+    @contextmanager
+    def _conectar(self):
+        # Uma conexão por operação: app, API e lote gravam de threads e processos distintos
+        conexao = sqlite3.connect(self.caminho, timeout=30)
+        conexao.row_factory = sqlite3.Row
+        try:
+            with conexao:
+                yield conexao
+        finally:
+            conexao.close()
+
+    def registrar(self, sha256, problemas, metricas, clausulas=(), nome=None, carteira=None, versao_regras=None):
+        """Grava (ou substitui) um documento auditado
+
+        clausulas são pares (posição, texto normalizado), como os de
+        AnaliseIncremental.clausulas; cláusulas só com espaços são ignoradas.
+        """
+        with self._conectar() as conexao:
+            anterior = conexao.execute("SELECT id FROM documentos WHERE sha256 = ?", (sha256,)).fetchone()
+            if anterior is not None:
+                self._remover(conexao, anterior['id'])
+
+            documento_id = conexao.execute(
+                "INSERT INTO documentos (sha256, nome, carteira, versao_regras, indexado_em, total_problemas,"
+                " criticos, medios, leves, score, nivel_risco) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    sha256, nome, carteira, versao_regras, time.time(), metricas['total_problemas'],
+                    metricas['criticos'], metricas['medios'], metricas['leves'],
+                    metricas['score_conformidade'], metricas['nivel_risco']
+                )
+            ).lastrowid
+
+            conexao.executemany(
+                "INSERT INTO achados (categoria, documento_id, gravidade, ocorrencias, confianca) VALUES (?, ?, ?, ?, ?)",
+                [(p['id'], documento_id, p['gravidade'], p['ocorrencias'], p['confianca']) for p in problemas]
+            )
+
+            linhas = [(documento_id, inicio, texto.strip()) for inicio, texto in clausulas if texto.strip()]
+            conexao.executemany("INSERT INTO clausulas (documento_id, inicio, texto) VALUES (?, ?, ?)", linhas)
+            conexao.execute(
+                "INSERT INTO clausulas_fts (rowid, texto) SELECT id, texto FROM clausulas WHERE documento_id = ?",
+                (documento_id,)
+            )
+            return documento_id
+
+    def _remover(self, conexao, documento_id):
+        # Com external content, o FTS5 precisa do texto antigo para apagar os termos
+        conexao.execute(
+            "INSERT INTO clausulas_fts (clausulas_fts, rowid, texto) "
+            "SELECT 'delete', id, texto FROM clausulas WHERE documento_id = ?",
+            (documento_id,)
+        )
+        conexao.execute("DELETE FROM clausulas WHERE documento_id = ?", (documento_id,))
+        conexao.execute("DELETE FROM achados WHERE documento_id = ?", (documento_id,))
+        conexao.execute("DELETE FROM documentos WHERE id = ?", (documento_id,))
+
+    def remover(self, sha256):
+        """Tira um documento do índice; False se ele não estava lá"""
+        with self._conectar() as conexao:
+            linha = conexao.execute("SELECT id FROM documentos WHERE sha256 = ?", (sha256,)).fetchone()
+            if linha is None:
+                return False
+            self._remover(conexao, linha['id'])
+            return True
+
+    # --------------------------------------------------
+    # CONSULTAS
+    # --------------------------------------------------
+
+    @staticmethod
+    def _filtros(categorias, carteira, coluna_documento):
+        """Condições SQL e parâmetros comuns às consultas"""
+        condicoes = []
+        parametros = []
+        if categorias:
+            # Um INTERSECT por categoria: cada um usa a chave primária de achados
+            condicoes.append(
+                f"{coluna_documento} IN ("
+                + " INTERSECT ".join("SELECT documento_id FROM achados WHERE categoria = ?" for _ in categorias)
+                + ")"
+            )
+            parametros.extend(categorias)
+        if carteira is not None:
+            condicoes.append("d.carteira = ?")
+            parametros.append(carteira)
+        return condicoes, parametros
+
+    def documentos_com(self, categorias=(), carteira=None, limite=100):
+        """Documentos com todas as categorias pedidas, dos de menor score para os de maior"""
+        condicoes, parametros = self._filtros(list(categorias), carteira, 'd.id')
+        sql = (
+            "SELECT d.sha256, d.nome, d.carteira, d.versao_regras, d.score, d.nivel_risco,"
+            " d.total_problemas, d.criticos FROM documentos d"
+            + (" WHERE " + " AND ".join(condicoes) if condicoes else "")
+            + " ORDER BY d.score, d.id LIMIT ?"
+        )
+        with self._conectar() as conexao:
+            return [dict(linha) for linha in conexao.execute(sql, parametros + [limite])]
+
+    def buscar_clausulas(self, consulta, categorias=(), carteira=None, limite=50, sintaxe_fts=False):
+        """Cláusulas que contêm a consulta, com um trecho destacado
+
+        A consulta passa pela mesma normalização dos contratos e é buscada
+        como frase; com sintaxe_fts=True vai direto para o MATCH do FTS5
+        (ex.: 'incc OR igpm', 'reajuste NEAR(indice, 5)').
+        """
+        if not sintaxe_fts:
+            consulta = '"' + normalizar_texto(consulta).strip().replace('"', '""') + '"'
+
+        condicoes, parametros = self._filtros(list(categorias), carteira, 'c.documento_id')
+        sql = (
+            "SELECT d.sha256, d.nome, d.carteira, c.inicio,"
+            " snippet(clausulas_fts, 0, '[', ']', '…', 24) AS trecho"
+            " FROM clausulas_fts JOIN clausulas c ON c.id = clausulas_fts.rowid"
+            " JOIN documentos d ON d.id = c.documento_id"
+            " WHERE clausulas_fts MATCH ?"
+            + "".join(" AND " + condicao for condicao in condicoes)
+            + " LIMIT ?"
+        )
+        with self._conectar() as conexao:
+            return [dict(linha) for linha in conexao.execute(sql, [consulta] + parametros + [limite])]
+
+    def achados_em_colunas(self, carteira=None):
+        """Documentos e achados em colunas, para metricas_lote.metricas_em_lote
+
+        Os achados de cada documento vêm na ordem de ordenar_problemas.
+        """
+        filtro, parametros = (" WHERE d.carteira = ?", [carteira]) if carteira is not None else ("", [])
+        with self._conectar() as conexao:
+            documentos = [linha[0] for linha in conexao.execute(
+                "SELECT d.sha256 FROM documentos d" + filtro + " ORDER BY d.id", parametros
+            )]
+            linhas = conexao.execute(
+                "SELECT d.sha256, a.categoria, a.gravidade, a.confianca FROM documentos d"
+                " JOIN achados a ON a.documento_id = d.id" + filtro +
+                " ORDER BY d.id, CASE a.gravidade WHEN 'critical' THEN 0 WHEN 'medium' THEN 1"
+                " WHEN 'low' THEN 2 ELSE 3 END, a.ocorrencias DESC, a.confianca DESC",
+                parametros
+            ).fetchall()
+
+        colunas = {'contrato': [], 'id': [], 'gravidade': [], 'confianca': []}
+        for linha in linhas:
+            for nome, valor in zip(colunas, linha):
+                colunas[nome].append(valor)
+        return documentos, colunas
+
+    def estatisticas(self):
+        """Totais do índice e documentos por categoria"""
+        with self._conectar() as conexao:
+            return {
+                'documentos': conexao.execute("SELECT COUNT(*) FROM documentos").fetchone()[0],
+                'clausulas': conexao.execute("SELECT COUNT(*) FROM clausulas").fetchone()[0],
+                'por_categoria': dict(conexao.execute(
+                    "SELECT categoria, COUNT(*) FROM achados GROUP BY categoria ORDER BY COUNT(*) DESC"
+                ).fetchall())
+            }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Consultas ao índice de contratos auditados")
+    parser.add_argument('indice', help="Arquivo SQLite do índice")
+    parser.add_argument('--com', nargs='+', default=[], metavar='CATEGORIA', help="Exige todas estas categorias")
+    parser.add_argument('--buscar', help="Texto a procurar nas cláusulas")
+    parser.add_argument('--fts', action='store_true', help="--buscar usa a sintaxe do FTS5 sem normalizar")
+    parser.add_argument('--carteira', help="Só documentos desta carteira")
+    parser.add_argument('--limite', type=int, default=100)
+    parser.add_argument('--estatisticas', action='store_true', help="Totais do índice")
+    parser.add_argument('--metricas', action='store_true', help="Resumo de risco e score da carteira")
+    args = parser.parse_args(argv)
+
+    indice = IndiceCorpus(args.indice)
+    if args.estatisticas:
+        print(json.dumps(indice.estatisticas(), ensure_ascii=False, indent=2))
+        return 0
+    if args.metricas:
+        from metricas_lote import metricas_em_lote, resumo_carteira
+
+        documentos, achados = indice.achados_em_colunas(args.carteira)
+        print(json.dumps(resumo_carteira(metricas_em_lote(achados, documentos)), ensure_ascii=False, indent=2))
+        return 0
+
+    inicio = time.perf_counter()
+    if args.buscar:
+        linhas = indice.buscar_clausulas(args.buscar, args.com, args.carteira, args.limite, args.fts)
+    else:
+        linhas = indice.documentos_com(args.com, args.carteira, args.limite)
+
+    for linha in linhas:
+        print(json.dumps(linha, ensure_ascii=False))
+    print(f"{len(linhas)} resultado(s) em {time.perf_counter() - inicio:.3f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
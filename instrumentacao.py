@@ -0,0 +1,229 @@
+import json
+import os
+import threading
+from bisect import bisect_left
+
+# --------------------------------------------------
+# INSTRUMENTAÇÃO DAS REGRAS
+# --------------------------------------------------
+
+# Limites (segundos) dos baldes dos histogramas de tempo
+LIMITES_SEGUNDOS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+class Histograma:
+    """Histograma de baldes fixos, no formato cumulativo do Prometheus"""
+
+    def __init__(self, limites=LIMITES_SEGUNDOS):
+        self.limites = limites
+        self.contagens = [0] * (len(limites) + 1)  # último balde: +Inf
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        self.contagens[bisect_left(self.limites, valor)] += 1
+        self.soma += valor
+        self.total += 1
+
+    def acumulado(self):
+        """Pares (limite, contagem acumulada), terminando em +Inf"""
+        pares = []
+        acumulado = 0
+        for limite, contagem in zip(list(self.limites) + [float('inf')], self.contagens):
+            acumulado += contagem
+            pares.append((limite, acumulado))
+        return pares
+
+    def como_dict(self):
+        return {
+            'baldes': [['+Inf' if l == float('inf') else l, c] for l, c in self.acumulado()],
+            'soma': round(self.soma, 6),
+            'total': self.total
+        }
+
+
+class MedicaoAnalise:
+    """Tempo, ocorrências e bytes examinados por regra e categoria em uma análise
+
+    Uma mesma medição pode receber várias buscas (ex.: página a página);
+    os valores são somados.
+    """
+
+    def __init__(self, versao_regras=None):
+        # Versão das regras medidas: os índices só valem para ela
+        self.versao_regras = versao_regras
+        self.segundos_total = 0.0
+        # chave -> [segundos, ocorrencias, bytes]
+        self.categorias = {}
+        # (chave, indice_regra) -> [segundos, ocorrencias, bytes]
+        self.regras = {}
+        # (chave, indice_regra) -> segundos da chamada de match mais lenta
+        self.maior_chamada = {}
+        # (chave, indice_regra) que esgotaram o orçamento de tempo
+        self.excedidas = set()
+
+    def registrar_categoria(self, chave, segundos, ocorrencias, bytes_examinados):
+        valores = self.categorias.setdefault(chave, [0.0, 0, 0])
+        valores[0] += segundos
+        valores[1] += ocorrencias
+        valores[2] += bytes_examinados
+
+    def registrar_regra(self, chave, indice, segundos, casou, bytes_examinados):
+        valores = self.regras.setdefault((chave, indice), [0.0, 0, 0])
+        valores[0] += segundos
+        valores[1] += casou
+        valores[2] += bytes_examinados
+        if segundos > self.maior_chamada.get((chave, indice), 0.0):
+            self.maior_chamada[(chave, indice)] = segundos
+
+    def linhas_regras(self, motor=None):
+        """Uma linha por regra, das mais lentas para as mais rápidas
+
+        Com motor (o da mesma versao_regras), cada linha traz o padrão.
+        """
+        linhas = []
+        for (chave, indice), (segundos, ocorrencias, bytes_examinados) in self.regras.items():
+            linha = {
+                'categoria': chave,
+                'regra': indice,
+                'segundos': round(segundos, 6),
+                'maior_chamada_s': round(self.maior_chamada.get((chave, indice), 0.0), 6),
+                'ocorrencias': ocorrencias,
+                'bytes_examinados': bytes_examinados
+            }
+            if motor is not None:
+                linha['padrao'] = motor.padroes[chave][indice]
+            linhas.append(linha)
+
+        linhas.sort(key=lambda l: -l['segundos'])
+        return linhas
+
+
+class InstrumentacaoRegras:
+    """Agrega as medições de todas as análises do processo
+
+    Cada regra e categoria tem um histograma do tempo gasto por análise,
+    além de contadores de ocorrências e bytes examinados. Exporta em JSON
+    ou no formato de texto do Prometheus.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.analises = 0
+        self.histograma_analise = Histograma()
+        self.categorias = {}  # chave -> [Histograma, ocorrencias, bytes]
+        self.regras = {}      # (chave, indice) -> [Histograma, ocorrencias, bytes]
+        self.excedidas = {}   # (chave, indice) -> análises em que a regra foi interrompida
+        self.ultima = None
+
+    @staticmethod
+    def _acumular(destino, chave, segundos, ocorrencias, bytes_examinados):
+        valores = destino.get(chave)
+        if valores is None:
+            valores = destino[chave] = [Histograma(), 0, 0]
+        valores[0].observar(segundos)
+        valores[1] += ocorrencias
+        valores[2] += bytes_examinados
+
+    def registrar(self, medicao):
+        """Incorpora a medição de uma análise concluída"""
+        with self._lock:
+            self.analises += 1
+            self.histograma_analise.observar(medicao.segundos_total)
+            for chave, valores in medicao.categorias.items():
+                self._acumular(self.categorias, chave, *valores)
+            for chave, valores in medicao.regras.items():
+                self._acumular(self.regras, chave, *valores)
+            for chave in medicao.excedidas:
+                self.excedidas[chave] = self.excedidas.get(chave, 0) + 1
+            self.ultima = medicao
+
+    def exportar_json(self):
+        """Dicionário serializável com todos os agregados"""
+        with self._lock:
+            return {
+                'analises': self.analises,
+                'analise_segundos': self.histograma_analise.como_dict(),
+                'categorias': [
+                    {
+                        'categoria': chave,
+                        'segundos': histograma.como_dict(),
+                        'ocorrencias': ocorrencias,
+                        'bytes_examinados': bytes_examinados
+                    }
+                    for chave, (histograma, ocorrencias, bytes_examinados) in sorted(self.categorias.items())
+                ],
+                'regras': [
+                    {
+                        'categoria': chave,
+                        'regra': indice,
+                        'segundos': histograma.como_dict(),
+                        'ocorrencias': ocorrencias,
+                        'bytes_examinados': bytes_examinados,
+                        'excedidas': self.excedidas.get((chave, indice), 0)
+                    }
+                    for (chave, indice), (histograma, ocorrencias, bytes_examinados) in sorted(self.regras.items())
+                ]
+            }
+
+    def exportar_prometheus(self, prefixo='burocrata'):
+        """Texto no formato de exposição do Prometheus"""
+        linhas = []
+
+        def histograma(nome, rotulos, valor):
+            for limite, contagem in valor.acumulado():
+                le = '+Inf' if limite == float('inf') else repr(limite)
+                separador = ',' if rotulos else ''
+                linhas.append(f'{nome}_bucket{{{rotulos}{separador}le="{le}"}} {contagem}')
+            chaves = f'{{{rotulos}}}' if rotulos else ''
+            linhas.append(f'{nome}_sum{chaves} {valor.soma:.6f}')
+            linhas.append(f'{nome}_count{chaves} {valor.total}')
+
+        with self._lock:
+            linhas.append(f'# TYPE {prefixo}_analises_total counter')
+            linhas.append(f'{prefixo}_analises_total {self.analises}')
+
+            linhas.append(f'# TYPE {prefixo}_analise_segundos histogram')
+            histograma(f'{prefixo}_analise_segundos', '', self.histograma_analise)
+
+            for nivel, agregados in (('categoria', self.categorias), ('regra', self.regras)):
+                nome = f'{prefixo}_{nivel}'
+                rotulos = {}
+                for chave in sorted(agregados):
+                    if nivel == 'categoria':
+                        rotulos[chave] = f'categoria="{chave}"'
+                    else:
+                        rotulos[chave] = f'categoria="{chave[0]}",regra="{chave[1]}"'
+
+                linhas.append(f'# TYPE {nome}_segundos histogram')
+                for chave, texto in rotulos.items():
+                    histograma(f'{nome}_segundos', texto, agregados[chave][0])
+
+                linhas.append(f'# TYPE {nome}_ocorrencias_total counter')
+                for chave, texto in rotulos.items():
+                    linhas.append(f'{nome}_ocorrencias_total{{{texto}}} {agregados[chave][1]}')
+
+                linhas.append(f'# TYPE {nome}_bytes_examinados_total counter')
+                for chave, texto in rotulos.items():
+                    linhas.append(f'{nome}_bytes_examinados_total{{{texto}}} {agregados[chave][2]}')
+
+            linhas.append(f'# TYPE {prefixo}_regra_excedida_total counter')
+            for (chave, indice), total in sorted(self.excedidas.items()):
+                linhas.append(f'{prefixo}_regra_excedida_total{{categoria="{chave}",regra="{indice}"}} {total}')
+
+        return '\n'.join(linhas) + '\n'
+
+    def gravar(self, caminho):
+        """Grava a exportação de forma atômica (.prom em texto, demais em JSON)
+
+        Serve, por exemplo, ao textfile collector do node_exporter.
+        """
+        if caminho.endswith('.prom'):
+            conteudo = self.exportar_prometheus()
+        else:
+            conteudo = json.dumps(self.exportar_json(), ensure_ascii=False)
+
+        temporario = f"{caminho}.{os.getpid()}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(conteudo)
+        os.replace(temporario, caminho)
@@ -0,0 +1,155 @@
+from itertools import repeat
+
+import numpy as np
+
+# --------------------------------------------------
+# MÉTRICAS DE MUITOS CONTRATOS DE UMA VEZ
+# --------------------------------------------------
+#
+# Mesmo cálculo de SistemaAuditoria100Efetivo.gerar_metricas_avancadas,
+# feito em colunas para carteiras inteiras (painéis sobre dezenas de
+# milhares de auditorias). A penalidade de cada contrato é somada na ordem
+# das linhas dele, como no laço original, então o score é idêntico até o
+# último bit, e não apenas próximo.
+
+PESOS_GRAVIDADE = {'critical': 30, 'medium': 15}
+
+# gravidade -> código da coluna de gravidades (3: fora do catálogo)
+CODIGOS_GRAVIDADE = {'critical': 0, 'medium': 1, 'low': 2}
+
+COLUNAS_METRICAS = (
+    'total_problemas', 'criticos', 'medios', 'leves',
+    'score_conformidade', 'nivel_risco', 'tem_criticos'
+)
+
+
+def _codificar(valores, codigos, padrao=None):
+    """Coluna de códigos inteiros a partir de uma sequência de valores
+
+    Um dicionário percorrido em Python sai mais barato que converter a
+    coluna de strings para um array do NumPy e comparar depois.
+    """
+    if padrao is None:
+        convertidos = map(codigos.__getitem__, valores)
+    else:
+        convertidos = map(codigos.get, valores, repeat(padrao))
+    return np.fromiter(convertidos, dtype=np.intp, count=len(valores))
+
+
+def _agrupar(ids_achados, contratos):
+    """Contratos do resultado e o índice do contrato de cada linha"""
+    if contratos is None:
+        # Ordem de primeira aparição, como em um groupby(sort=False)
+        posicoes = {}
+        for contrato in ids_achados:
+            posicoes.setdefault(contrato, len(posicoes))
+        contratos = list(posicoes)
+    else:
+        posicoes = dict(zip(contratos, range(len(contratos))))
+
+    try:
+        grupos = _codificar(ids_achados, posicoes)
+    except KeyError as e:
+        raise ValueError(f"Achados do contrato {e.args[0]!r}, ausente de contratos") from None
+    return np.asarray(contratos), grupos
+
+
+def _penalidades(grupos, contribuicoes, total_contratos):
+    """Soma das contribuições de cada contrato, na ordem das linhas
+
+    Uma passada por posição dentro do contrato (1º problema de todos, 2º de
+    todos...): vetorizada entre contratos e sequencial dentro de cada um.
+    """
+    penalidades = np.zeros(total_contratos)
+    if not len(grupos):
+        return penalidades
+
+    ordem = np.argsort(grupos, kind='stable')
+    grupos_ordenados = grupos[ordem]
+    inicios = np.flatnonzero(np.r_[True, grupos_ordenados[1:] != grupos_ordenados[:-1]])
+    tamanhos = np.diff(np.r_[inicios, len(grupos_ordenados)])
+    posicao = np.arange(len(grupos_ordenados)) - np.repeat(inicios, tamanhos)
+
+    contribuicoes = contribuicoes[ordem]
+    for k in range(int(tamanhos.max())):
+        linhas = posicao == k
+        penalidades[grupos_ordenados[linhas]] += contribuicoes[linhas]
+    return penalidades
+
+
+def metricas_em_lote(achados, contratos=None):
+    """Métricas de gerar_metricas_avancadas para vários contratos
+
+    achados tem as colunas 'contrato', 'gravidade' e 'confianca' (um
+    dicionário de sequências ou um DataFrame), uma linha por problema, na
+    ordem da lista de problemas de cada contrato. contratos lista todos os
+    contratos do resultado, inclusive os sem problemas; sem ela, são os
+    que aparecem em achados. Retorna um dicionário de colunas (arrays),
+    com 'contrato' e as chaves de gerar_metricas_avancadas.
+    """
+    gravidades = _codificar(achados['gravidade'], CODIGOS_GRAVIDADE, padrao=3)
+    confiancas = np.asarray(achados['confianca'], dtype=np.float64)
+
+    contratos, grupos = _agrupar(achados['contrato'], contratos)
+    total_contratos = len(contratos)
+
+    criticos_linha = gravidades == CODIGOS_GRAVIDADE['critical']
+    medios_linha = gravidades == CODIGOS_GRAVIDADE['medium']
+    criticos = np.bincount(grupos[criticos_linha], minlength=total_contratos)
+    medios = np.bincount(grupos[medios_linha], minlength=total_contratos)
+    leves = np.bincount(grupos[gravidades == CODIGOS_GRAVIDADE['low']], minlength=total_contratos)
+    total = np.bincount(grupos, minlength=total_contratos)
+
+    # Mesmos produtos do laço original (peso inteiro × confiança)
+    contribuicoes = np.where(
+        criticos_linha, PESOS_GRAVIDADE['critical'] * confiancas,
+        np.where(medios_linha, PESOS_GRAVIDADE['medium'] * confiancas, 0.0)
+    )
+    penalidades = _penalidades(grupos, contribuicoes, total_contratos)
+
+    return {
+        'contrato': contratos,
+        'total_problemas': total,
+        'criticos': criticos,
+        'medios': medios,
+        'leves': leves,
+        'score_conformidade': np.maximum(100 - penalidades, 0),
+        'nivel_risco': np.select(
+            [criticos >= 3, criticos >= 1, medios >= 2],
+            ['RISCO EXTREMO', 'ALTO RISCO', 'ATENÇÃO'],
+            'BAIXO RISCO'
+        ),
+        'tem_criticos': criticos > 0
+    }
+
+
+def colunas_de_problemas(listas_problemas):
+    """Colunas de achados a partir de listas de problemas (contrato -> problemas)"""
+    colunas = {'contrato': [], 'id': [], 'gravidade': [], 'confianca': []}
+    for contrato, problemas in listas_problemas.items():
+        for problema in problemas:
+            colunas['contrato'].append(contrato)
+            colunas['id'].append(problema['id'])
+            colunas['gravidade'].append(problema['gravidade'])
+            colunas['confianca'].append(problema['confianca'])
+    return colunas
+
+
+def linhas_metricas(metricas):
+    """Pares (contrato, dicionário de gerar_metricas_avancadas), com tipos do Python"""
+    colunas = {nome: metricas[nome].tolist() for nome in ('contrato',) + COLUNAS_METRICAS}
+    for indice, contrato in enumerate(colunas['contrato']):
+        yield contrato, {nome: colunas[nome][indice] for nome in COLUNAS_METRICAS}
+
+
+def resumo_carteira(metricas):
+    """Visão agregada de uma carteira: contratos por nível de risco e score"""
+    niveis, quantidades = np.unique(metricas['nivel_risco'], return_counts=True)
+    scores = metricas['score_conformidade']
+    return {
+        'contratos': int(len(metricas['contrato'])),
+        'por_nivel_risco': {str(nivel): int(total) for nivel, total in zip(niveis, quantidades)},
+        'com_criticos': int(metricas['tem_criticos'].sum()),
+        'score_medio': round(float(scores.mean()), 2) if len(scores) else None,
+        'score_mediano': round(float(np.median(scores)), 2) if len(scores) else None
+    }
@@ -0,0 +1,672 @@
+import re
+from bisect import bisect_left
+from time import perf_counter
+
+# --------------------------------------------------
+# MOTOR DE REGRAS COMPILADO
+# --------------------------------------------------
+
+# Caracteres que sobrevivem à normalização e que o re.IGNORECASE iguala a
+# uma letra ASCII (ex.: 'proibıdo' casa com 'proibido')
+EQUIVALENTES_CAIXA = {ord('ı'): 'i'}
+
+
+def _texto_literais(texto):
+    """Texto em que os literais são procurados, com as mesmas posições"""
+    for codigo in EQUIVALENTES_CAIXA:
+        if chr(codigo) in texto:
+            return texto.translate(EQUIVALENTES_CAIXA)
+    return texto
+
+
+# Referência numerada a grupo (\1): na alternação da categoria os grupos
+# das regras anteriores mudam a numeração e a referência deixa de valer
+REGEX_REFERENCIA_NUMERADA = re.compile(r'(?<!\\)(?:\\\\)*\\[1-9]')
+
+
+def compilar_regra(padrao, flags):
+    """Compila o padrão do catálogo com o retrocesso limitado"""
+    return re.compile(limitar_retrocesso(padrao), flags)
+
+
+def montar_localizador(regras, flags):
+    """Localizador: alternação de todas as regras da categoria
+
+    Levanta re.error quando as regras, válidas sozinhas, não podem ser
+    combinadas (flag global como '(?s)' fora do início, nome de grupo
+    repetido).
+    """
+    return re.compile('|'.join(f'(?:{regra.pattern})' for regra in regras), flags)
+
+
+class MotorRegras:
+    """Compila os padrões de auditoria uma única vez, agrupados por categoria"""
+
+    def __init__(self, padroes_completos, flags=re.IGNORECASE):
+        self.flags = flags
+        self.categorias = {}
+        self.categorias_sem_filtro = set()
+        self.literais_regras = {}
+        self.padroes = {}    # chave -> padrões como escritos no catálogo
+        literais_categoria = {}
+
+        for chave, config in padroes_completos.items():
+            regras = []
+            padroes = []
+            for padrao in config.get('padroes', []):
+                try:
+                    regras.append(compilar_regra(padrao, flags))
+                except re.error:
+                    # Padrão inválido é ignorado, como na busca original
+                    continue
+                padroes.append(padrao)
+
+            if not regras:
+                continue
+
+            self.categorias[chave] = (montar_localizador(regras, flags), regras)
+            self.padroes[chave] = padroes
+
+            # Literais obrigatórios da categoria (None = sempre executar)
+            literais = set()
+            literais_regras = []
+            for padrao in padroes:
+                literais_regra = extrair_literais(padrao)
+                if literais_regra is None:
+                    literais = None
+                    break
+                literais |= literais_regra
+                literais_regras.append(tuple(sorted(literais_regra)))
+
+            self.literais_regras[chave] = literais_regras if literais is not None else None
+
+            if literais is None:
+                self.categorias_sem_filtro.add(chave)
+                continue
+            for literal in literais:
+                literais_categoria.setdefault(literal, set()).add(chave)
+
+        self.literais_categoria = literais_categoria
+
+    def pre_filtrar(self, texto):
+        """Localiza os literais obrigatórios e retorna as posições por categoria
+
+        O texto deve estar em minúsculas, como o de preparar_texto_para_analise.
+        Categorias ausentes do resultado não podem ter ocorrências no texto.
+        Categorias cujas regras não têm literal extraível mapeiam para None.
+        """
+        posicoes = {chave: None for chave in self.categorias_sem_filtro}
+        texto = _texto_literais(texto)
+
+        # str.find é uma busca em C sem backtracking, bem mais rápida que
+        # uma alternação de literais no módulo re
+        for literal, categorias in self.literais_categoria.items():
+            inicio = texto.find(literal)
+            if inicio == -1:
+                continue
+
+            encontrados = []
+            while inicio != -1:
+                encontrados.append(inicio)
+                inicio = texto.find(literal, inicio + 1)
+
+            for chave in categorias:
+                posicoes.setdefault(chave, []).extend(encontrados)
+
+        for chave, lista in posicoes.items():
+            if lista is not None:
+                lista.sort()
+
+        return posicoes
+
+    def buscar_categoria(self, chave, texto, janelas=None, posicoes=None, medicao=None, orcamento=None):
+        """Retorna as ocorrências (inicio, fim, indice_regra) de uma categoria
+
+        A ordem e a contagem são as mesmas de um re.finditer por regra,
+        concatenados na ordem em que os padrões foram declarados. Com
+        janelas, nenhuma correspondência ultrapassa os limites da janela.
+        Com posicoes (do pre_filtrar), cada regra só é testada onde começa
+        um dos seus literais, nas janelas que contêm algum deles. Com
+        medicao (MedicaoAnalise), registra tempo, ocorrências e bytes
+        examinados de cada regra e da categoria. Com orcamento
+        (OrcamentoRegras), a regra que esgota o tempo deixa de ser testada
+        e o que ela já encontrou é mantido.
+        """
+        localizador, regras = self.categorias[chave]
+        literais = self.literais_regras[chave]
+        proxima = [0] * len(regras)
+        achados = [[] for _ in regras]
+        cronometrar = medicao is not None or orcamento is not None
+
+        if orcamento is not None:
+            for indice in range(len(regras)):
+                if (chave, indice) in orcamento.excedidas:
+                    proxima[indice] = ESGOTADA
+
+        if janelas is None:
+            janelas = [(0, len(texto))]
+
+        if posicoes is not None:
+            texto_literais = _texto_literais(texto)
+
+        if medicao is not None:
+            inicio_categoria = perf_counter()
+            bytes_categoria = 0
+
+        for inicio_janela, fim_janela in janelas:
+            # Todas as regras esgotaram o orçamento
+            if min(proxima) == ESGOTADA:
+                break
+
+            if posicoes is not None:
+                indice_literal = bisect_left(posicoes, inicio_janela)
+                if indice_literal == len(posicoes) or posicoes[indice_literal] >= fim_janela:
+                    continue
+                candidatas = _candidatas_literais(posicoes, indice_literal, fim_janela)
+                primeira = posicoes[indice_literal]
+            else:
+                candidatas = _candidatas_localizador(
+                    chave, localizador, texto, inicio_janela, fim_janela, proxima, orcamento
+                )
+                primeira = inicio_janela
+
+            if medicao is not None:
+                bytes_categoria += fim_janela - primeira
+
+            for inicio in candidatas:
+                for indice, regra in enumerate(regras):
+                    # Regra ainda dentro da última correspondência dela
+                    if inicio < proxima[indice]:
+                        continue
+                    # Toda correspondência da regra começa por um dos seus literais
+                    if posicoes is not None and not texto_literais.startswith(literais[indice], inicio):
+                        continue
+
+                    if not cronometrar:
+                        match = regra.match(texto, inicio, fim_janela)
+                    else:
+                        inicio_regra = perf_counter()
+                        match = regra.match(texto, inicio, fim_janela)
+                        segundos = perf_counter() - inicio_regra
+                        if medicao is not None:
+                            medicao.registrar_regra(
+                                chave, indice, segundos, match is not None, fim_janela - inicio
+                            )
+
+                    if match:
+                        fim = match.end()
+                        achados[indice].append((inicio, fim, indice))
+                        proxima[indice] = fim if fim > inicio else inicio + 1
+
+                    if orcamento is not None and orcamento.gastar(chave, indice, segundos):
+                        proxima[indice] = ESGOTADA
+
+        ocorrencias = [ocorrencia for lista in achados for ocorrencia in lista]
+
+        if medicao is not None:
+            medicao.registrar_categoria(
+                chave, perf_counter() - inicio_categoria, len(ocorrencias), bytes_categoria
+            )
+
+        return ocorrencias
+
+    def buscar(self, texto, janelas=None, candidatos=None, medicao=None, orcamento=None):
+        """Busca todas as categorias e retorna apenas as que tiveram ocorrências"""
+        if candidatos is None:
+            candidatos = self.pre_filtrar(texto)
+
+        resultados = {}
+        for chave in self.categorias:
+            if chave not in candidatos:
+                continue
+            ocorrencias = self.buscar_categoria(
+                chave, texto, janelas, candidatos[chave], medicao, orcamento
+            )
+            if ocorrencias:
+                resultados[chave] = ocorrencias
+        return resultados
+
+
+def _candidatas_literais(posicoes, indice, fim_janela):
+    """Posições de literais (sem repetição) a partir de indice, dentro da janela"""
+    anterior = -1
+    while indice < len(posicoes) and posicoes[indice] < fim_janela:
+        posicao = posicoes[indice]
+        indice += 1
+        if posicao != anterior:
+            anterior = posicao
+            yield posicao
+
+
+def _candidatas_localizador(chave, localizador, texto, inicio_janela, fim_janela, proxima, orcamento):
+    """Posições em que alguma regra casa, para categorias sem literais
+
+    O tempo do localizador não é de nenhuma regra em particular, então é
+    cobrado de todas as que ainda estão ativas.
+    """
+    pos = inicio_janela
+    while pos <= fim_janela:
+        if orcamento is None:
+            encontrado = localizador.search(texto, pos, fim_janela)
+        else:
+            inicio_busca = perf_counter()
+            encontrado = localizador.search(texto, pos, fim_janela)
+            segundos = perf_counter() - inicio_busca
+            for indice, p in enumerate(proxima):
+                if p != ESGOTADA and orcamento.gastar(chave, indice, segundos):
+                    proxima[indice] = ESGOTADA
+
+        if not encontrado:
+            return
+
+        inicio = encontrado.start()
+        yield inicio
+
+        # Nenhuma regra pode voltar a casar antes disso
+        pos = min(max(p, inicio + 1) for p in proxima)
+
+
+# --------------------------------------------------
+# ORÇAMENTO DE TEMPO POR REGRA
+# --------------------------------------------------
+
+# Marca, em proxima, a regra que não deve mais ser testada
+ESGOTADA = float('inf')
+
+
+class OrcamentoRegras:
+    """Tempo máximo de cada regra em uma análise
+
+    A conta é feita entre uma chamada de match e outra: uma chamada em
+    andamento não é interrompida. O custo de cada chamada é limitado pelo
+    limitar_retrocesso e pela janela de cláusula. A regra que passa do
+    limite fica inconclusiva.
+    """
+
+    def __init__(self, segundos_por_regra):
+        self.segundos_por_regra = segundos_por_regra
+        self.consumido = {}    # (chave, indice) -> segundos
+        self.excedidas = set()
+
+    def gastar(self, chave, indice, segundos):
+        """Desconta o tempo da regra; True se ela acabou de esgotar o orçamento"""
+        regra = (chave, indice)
+        total = self.consumido.get(regra, 0.0) + segundos
+        self.consumido[regra] = total
+
+        if total > self.segundos_por_regra and regra not in self.excedidas:
+            self.excedidas.add(regra)
+            return True
+        return False
+
+    def inconclusivas(self):
+        """chave -> índices das regras que excederam o orçamento"""
+        por_categoria = {}
+        for chave, indice in sorted(self.excedidas):
+            por_categoria.setdefault(chave, []).append(indice)
+        return por_categoria
+
+
+# --------------------------------------------------
+# PRÉ-FILTRO DE LITERAIS
+# --------------------------------------------------
+
+METACARACTERES = set('.^$*+?{}[]\\|()')
+
+
+def _dividir_alternativas(padrao):
+    """Divide o padrão nos '|' de nível superior"""
+    partes = []
+    atual = []
+    nivel = 0
+    escape = False
+
+    for c in padrao:
+        if escape:
+            escape = False
+        elif c == '\\':
+            escape = True
+        elif c in '([':
+            nivel += 1
+        elif c in ')]':
+            nivel -= 1
+        elif c == '|' and nivel == 0:
+            partes.append(''.join(atual))
+            atual = []
+            continue
+        atual.append(c)
+
+    partes.append(''.join(atual))
+    return partes
+
+
+def _fechamento(padrao):
+    """Índice do ')' que fecha o '(' inicial, ou -1"""
+    nivel = 0
+    escape = False
+
+    for i, c in enumerate(padrao):
+        if escape:
+            escape = False
+        elif c == '\\':
+            escape = True
+        elif c == '(':
+            nivel += 1
+        elif c == ')':
+            nivel -= 1
+            if nivel == 0:
+                return i
+    return -1
+
+
+def _prefixo_literal(padrao):
+    """Prefixo literal obrigatório do padrão (pode ser vazio)"""
+    prefixo = []
+    for c in padrao:
+        if c in METACARACTERES:
+            # Quantificador torna o último caractere opcional
+            if c in '*?{' and prefixo:
+                prefixo.pop()
+            break
+        prefixo.append(c)
+    return ''.join(prefixo)
+
+
+def extrair_literais(padrao):
+    """Literais com que toda correspondência do padrão começa, ou None"""
+    literais = set()
+
+    for alternativa in _dividir_alternativas(padrao):
+        if alternativa.startswith('('):
+            fim = _fechamento(alternativa)
+            if fim == -1 or alternativa[fim + 1:fim + 2] in ('?', '*', '{'):
+                return None
+
+            interno = alternativa[1:fim]
+            if interno.startswith('?:'):
+                interno = interno[2:]
+            elif interno.startswith('?'):
+                return None
+
+            opcoes = _dividir_alternativas(interno)
+        else:
+            opcoes = [alternativa]
+
+        for opcao in opcoes:
+            literal = _prefixo_literal(opcao)
+            if not literal:
+                return None
+            literais.add(literal.lower())
+
+    return literais
+
+
+# --------------------------------------------------
+# RETROCESSO LIMITADO
+# --------------------------------------------------
+
+# Lacuna preguiçosa entre dois trechos do padrão: 'aluguel.*?(ser|estar)'
+LACUNA = ('.', '*?')
+
+REGEX_QUANTIFICADOR = re.compile(r'(?:[*+?]|\{\d+(?:,\d*)?\}|\{,\d+\})[?+]?')
+
+
+def _fim_classe(padrao, i):
+    """Índice logo após o ']' que fecha a classe aberta em padrao[i]"""
+    j = i + 1
+    if padrao[j:j + 1] == '^':
+        j += 1
+    if padrao[j:j + 1] == ']':
+        j += 1
+    while j < len(padrao) and padrao[j] != ']':
+        j += 2 if padrao[j] == '\\' else 1
+    return j + 1
+
+
+def _fim_grupo(padrao, i):
+    """Índice logo após o ')' que fecha o grupo aberto em padrao[i]"""
+    nivel = 0
+    j = i
+    while j < len(padrao):
+        c = padrao[j]
+        if c == '\\':
+            j += 2
+            continue
+        if c == '[':
+            j = _fim_classe(padrao, j)
+            continue
+        if c == '(':
+            nivel += 1
+        elif c == ')':
+            nivel -= 1
+            if nivel == 0:
+                return j + 1
+        j += 1
+    return len(padrao)
+
+
+def _itens(padrao):
+    """Alternativas de nível superior, cada uma uma lista de (átomo, quantificador)"""
+    alternativas = [[]]
+    i = 0
+    while i < len(padrao):
+        c = padrao[i]
+        if c == '|':
+            alternativas.append([])
+            i += 1
+            continue
+
+        if c == '\\':
+            fim = i + 2
+        elif c == '[':
+            fim = _fim_classe(padrao, i)
+        elif c == '(':
+            fim = _fim_grupo(padrao, i)
+        else:
+            fim = i + 1
+
+        quantificador = REGEX_QUANTIFICADOR.match(padrao, fim)
+        fim_quantificador = quantificador.end() if quantificador else fim
+        alternativas[-1].append((padrao[i:fim], padrao[fim:fim_quantificador]))
+        i = fim_quantificador
+
+    return alternativas
+
+
+def _limitar_grupo(grupo, quantificador, livre_depois):
+    """Aplica limitar_retrocesso dentro de um grupo de captura ou (?:...)"""
+    if grupo.startswith('(?P<'):
+        abertura = grupo[:grupo.find('>') + 1]
+    elif grupo.startswith(('(?:', '(?>')):
+        abertura = grupo[:3]
+    elif grupo.startswith('(?'):
+        # Lookaround, flags, condicional e comentário ficam como estão
+        return grupo + quantificador
+    else:
+        abertura = '('
+
+    if not grupo.endswith(')') or len(grupo) <= len(abertura):
+        return grupo + quantificador
+
+    # Grupo repetido volta a ser testado logo depois de si mesmo
+    livre = livre_depois and not quantificador
+    corpo = _limitar(grupo[len(abertura):-1], livre)
+    return abertura + corpo + ')' + quantificador
+
+
+def _limitar(padrao, livre_depois):
+    """limitar_retrocesso de um trecho; livre_depois: o que vem em seguida
+    é uma lacuna ou o fim do padrão"""
+    alternativas = []
+    for itens in _itens(padrao):
+        segmentos = [[]]
+        for item in itens:
+            if item == LACUNA:
+                segmentos.append([])
+            else:
+                segmentos[-1].append(item)
+
+        partes = []
+        for n, segmento in enumerate(segmentos):
+            ultimo = n == len(segmentos) - 1
+            livre = livre_depois or not ultimo
+            corpo = ''.join(
+                _limitar_grupo(atomo, quantificador, livre and k == len(segmento) - 1)
+                if atomo.startswith('(') else atomo + quantificador
+                for k, (atomo, quantificador) in enumerate(segmento)
+            )
+
+            if n == 0:
+                partes.append(corpo)
+            elif not segmento:
+                # Lacunas seguidas valem por uma; a final casa vazio
+                if ultimo:
+                    partes.append('.*?')
+            elif livre:
+                partes.append(f'(?>.*?{corpo})')
+            else:
+                partes.append(f'.*?{corpo}')
+
+        alternativas.append(''.join(partes))
+
+    return '|'.join(alternativas)
+
+
+def limitar_retrocesso(padrao):
+    """Reescreve as lacunas '.*?' do padrão em grupos atômicos
+
+    Em 'aluguel.*?(ser|estar).*?(sujeito).*?(reajuste).*?(livre)' sem o
+    último termo, o re volta a cada 'ser', 'sujeito' e 'reajuste' já
+    vistos e testa todas as combinações: o custo cresce com o número de
+    repetições elevado ao número de lacunas. Em '(?>.*?trecho)' a
+    primeira ocorrência do trecho fica fixada, e cada lacuna percorre a
+    janela uma vez só.
+
+    Só é reescrita a lacuna cujo trecho é seguido por outra lacuna ou
+    pelo fim do padrão. Aí fixar a primeira ocorrência não muda o
+    resultado: se o restante não casa depois dela, também não casa
+    depois de uma ocorrência posterior. A exceção é uma ocorrência
+    posterior que termina antes, o que exige alternativas sobrepostas,
+    como '(dias|dia)' seguido de 's...' colado a elas.
+    """
+    return _limitar(padrao, True)
+
+
+def _exemplo(padrao):
+    """Um texto que o trecho casa: a primeira alternativa de cada grupo"""
+    partes = []
+    for atomo, quantificador in _itens(padrao)[0]:
+        if (atomo, quantificador) == LACUNA:
+            partes.append(' ')
+            continue
+
+        # Quantificador que admite zero repetições: o átomo fica de fora
+        minimo = REGEX_MINIMO.match(quantificador)
+        repeticoes = int(minimo.group(1)) if minimo else 1
+        if quantificador[:1] in ('*', '?') or not repeticoes:
+            continue
+
+        if atomo.startswith('(?') and not atomo.startswith(('(?:', '(?>', '(?P<')):
+            continue
+        if atomo.startswith('('):
+            abertura = atomo.find('>') + 1 if atomo.startswith('(?P<') else 3 if atomo.startswith('(?') else 1
+            texto = _exemplo(atomo[abertura:-1])
+        elif atomo.startswith('['):
+            texto = 'x' if atomo.startswith('[^') else atomo[1:2]
+        elif atomo.startswith('\\'):
+            texto = EXEMPLOS_ESCAPE.get(atomo, atomo[1:])
+        elif atomo in '^$':
+            texto = ''
+        elif atomo == '.':
+            texto = 'x'
+        else:
+            texto = atomo
+        partes.append(texto * repeticoes)
+
+    return ''.join(partes)
+
+
+REGEX_MINIMO = re.compile(r'\{(\d+)')
+
+EXEMPLOS_ESCAPE = {'\\s': ' ', '\\d': '0', '\\w': 'a', '\\b': '', '\\B': ''}
+
+
+def trechos_padrao(padrao):
+    """Exemplos de texto dos trechos entre as lacunas '.*?'
+
+    Usa a alternativa de nível superior com mais lacunas. Serve para
+    montar o pior caso da regra: o primeiro trecho seguido dos
+    intermediários repetidos, sem o último.
+    """
+    itens = max(_itens(padrao), key=lambda alternativa: alternativa.count(LACUNA))
+
+    trechos = [[]]
+    for item in itens:
+        if item == LACUNA:
+            if trechos[-1]:
+                trechos.append([])
+        else:
+            trechos[-1].append(item)
+
+    return [
+        _exemplo(''.join(atomo + quantificador for atomo, quantificador in trecho))
+        for trecho in trechos if trecho
+    ]
+
+
+# --------------------------------------------------
+# SEGMENTAÇÃO EM CLÁUSULAS
+# --------------------------------------------------
+
+# Abreviações comuns em contratos que não encerram a frase
+ABREVIACOES = {
+    'art', 'arts', 'inc', 'n', 'no', 'nº', 'sr', 'sra', 'dr', 'dra',
+    'fls', 'pag', 'p', 'ex', 'obs', 'cf', 'min', 'max', 'ltda', 'cia'
+}
+
+REGEX_FIM_SENTENCA = re.compile(r'(\w*)([.;])(?=\s|$)')
+
+REGEX_INICIO_CLAUSULA = re.compile(
+    r'(?:clausula|paragrafo)\s+(?:\d+\s*[ªºo°]?|unic[oa]|primeir[oa]|segund[oa]|'
+    r'terceir[oa]|quart[oa]|quint[oa]|sext[oa]|setim[oa]|oitav[oa]|non[oa]|'
+    r'decim[oa])\s*[-–.:)]|§',
+    re.IGNORECASE
+)
+
+
+def segmentar_clausulas(texto, tamanho_maximo=1500):
+    """Divide o texto em janelas de cláusulas/frases com tamanho máximo"""
+    if not texto:
+        return []
+
+    cortes = set()
+
+    # Fim de frase por ponto ou ponto e vírgula
+    for match in REGEX_FIM_SENTENCA.finditer(texto):
+        if match.group(2) == '.' and match.group(1).lower() in ABREVIACOES:
+            continue
+        cortes.add(match.end())
+
+    # Início de cláusula, parágrafo ou §
+    for match in REGEX_INICIO_CLAUSULA.finditer(texto):
+        cortes.add(match.start())
+
+    janelas = []
+    inicio = 0
+    for corte in sorted(cortes) + [len(texto)]:
+        if corte <= inicio:
+            continue
+
+        # Janelas longas demais são quebradas no último espaço possível
+        while corte - inicio > tamanho_maximo:
+            quebra = texto.rfind(' ', inicio + 1, inicio + tamanho_maximo)
+            if quebra == -1:
+                quebra = inicio + tamanho_maximo
+            janelas.append((inicio, quebra))
+            inicio = quebra
+
+        if texto[inicio:corte].strip():
+            janelas.append((inicio, corte))
+        inicio = corte
+
+    return janelas
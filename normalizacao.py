@@ -0,0 +1,161 @@
+import re
+import unicodedata
+from bisect import bisect_right
+
+# --------------------------------------------------
+# NORMALIZAÇÃO DE TEXTO EM UMA PASSADA
+# --------------------------------------------------
+
+REGEX_ESPACO = re.compile(r'\s')
+REGEX_ESPACOS_REPETIDOS = re.compile(r' {2,}')
+
+
+class _TabelaNormalizacao(dict):
+    """Tabela para str.translate: minúsculas, sem acentos e espaços como ' '
+
+    Cada caractere recebe o mesmo resultado de lower() + NFKD + remoção
+    de marcas combinantes aplicados a ele isoladamente. Caracteres novos
+    são calculados na primeira vez que aparecem e ficam guardados. Única
+    diferença para lower() no texto inteiro: o sigma maiúsculo no fim de
+    palavra vira 'σ', e não 'ς'.
+    """
+
+    def __init__(self):
+        super().__init__()
+        # Caracteres que não viram exatamente um caractere (ex.: 'ﬁ', '½')
+        self.irregulares = set()
+        self._regex_irregulares = None
+
+        # Latim básico e estendido, cobrindo todos os acentos do português
+        for codigo in range(0x250):
+            self[codigo]
+
+    def __missing__(self, codigo):
+        decomposto = unicodedata.normalize('NFKD', chr(codigo).lower())
+        valor = ''.join(c for c in decomposto if not unicodedata.combining(c))
+        valor = REGEX_ESPACO.sub(' ', valor)
+
+        if len(valor) != 1:
+            self.irregulares.add(chr(codigo))
+            self._regex_irregulares = None
+
+        self[codigo] = valor
+        return valor
+
+    def regex_irregulares(self):
+        """Classe de caracteres com os irregulares conhecidos até agora"""
+        regex = self._regex_irregulares
+        if regex is None:
+            caracteres = ''.join(re.escape(c) for c in sorted(self.irregulares))
+            regex = re.compile(f'[{caracteres}]') if caracteres else None
+            self._regex_irregulares = regex
+        return regex
+
+
+TABELA_NORMALIZACAO = _TabelaNormalizacao()
+
+
+def normalizar_texto(texto):
+    """Minúsculas, sem acentos e com espaços padronizados"""
+    traduzido = texto.translate(TABELA_NORMALIZACAO)
+    return REGEX_ESPACOS_REPETIDOS.sub(' ', traduzido)
+
+
+class MapaPosicoes:
+    """Converte posições do texto normalizado para o texto original
+
+    Guarda apenas os pontos em que o deslocamento muda (caracteres que
+    somem ou se expandem e sequências de espaços), então o tamanho é
+    proporcional às irregularidades e não ao documento.
+    """
+
+    def __init__(self, ancoras_traduzido, ancoras_normalizado):
+        # (posição, deslocamento) em ordem crescente de posição
+        self._pos_traduzido = [p for p, _ in ancoras_traduzido]
+        self._desl_traduzido = [d for _, d in ancoras_traduzido]
+        self._pos_normalizado = [p for p, _ in ancoras_normalizado]
+        self._desl_normalizado = [d for _, d in ancoras_normalizado]
+
+    @staticmethod
+    def _aplicar(posicoes, deslocamentos, posicao):
+        indice = bisect_right(posicoes, posicao) - 1
+        return posicao + (deslocamentos[indice] if indice >= 0 else 0)
+
+    @staticmethod
+    def _ancoras_entre(posicoes, inicio, fim):
+        return bisect_right(posicoes, fim) - bisect_right(posicoes, inicio)
+
+    def original(self, posicao):
+        """Posição no texto original correspondente à posição normalizada"""
+        traduzida = self._aplicar(self._pos_normalizado, self._desl_normalizado, posicao)
+        return self._aplicar(self._pos_traduzido, self._desl_traduzido, traduzida)
+
+    def trecho_original(self, texto_original, inicio, fim):
+        """Trecho do texto original que corresponde a [inicio, fim) normalizado"""
+        return texto_original[self.original(inicio):self.original(fim)]
+
+    def alinhar(self, texto_original, texto_normalizado, inicio, fim):
+        """Texto original de [inicio, fim) com um caractere por posição normalizada
+
+        Mantém maiúsculas e acentos, para exibição, nas mesmas posições
+        do texto normalizado. Sequências de espaços e caracteres que não
+        viram exatamente um (ex.: 'ﬁ') ficam como no texto normalizado.
+        """
+        traduzido_inicio = self._aplicar(self._pos_normalizado, self._desl_normalizado, inicio)
+        traduzido_fim = self._aplicar(self._pos_normalizado, self._desl_normalizado, fim)
+
+        # Sem irregularidades no intervalo: o deslocamento é constante
+        if (not self._ancoras_entre(self._pos_normalizado, inicio, fim)
+                and not self._ancoras_entre(self._pos_traduzido, traduzido_inicio, traduzido_fim)):
+            original = self.original(inicio)
+            return texto_original[original:original + fim - inicio]
+
+        partes = []
+        atual = self.original(inicio)
+        for posicao in range(inicio, fim):
+            proximo = self.original(posicao + 1)
+            caractere = texto_original[atual:proximo]
+            if len(caractere) != 1:
+                # Letra seguida de acento combinante volta a ser um caractere
+                caractere = unicodedata.normalize('NFC', caractere)
+            if caractere.translate(TABELA_NORMALIZACAO) != texto_normalizado[posicao]:
+                caractere = texto_normalizado[posicao]
+            partes.append(caractere)
+            atual = proximo
+        return ''.join(partes)
+
+
+def normalizar_com_mapa(texto):
+    """Igual a normalizar_texto, retornando também o MapaPosicoes"""
+    traduzido = texto.translate(TABELA_NORMALIZACAO)
+
+    # Original -> traduzido: só os caracteres que não viram um único caractere
+    ancoras_traduzido = []
+    regex = TABELA_NORMALIZACAO.regex_irregulares()
+    if regex is not None:
+        diferenca = 0  # traduzido - original acumulado
+        for match in regex.finditer(texto):
+            original = match.start()
+            tamanho = len(TABELA_NORMALIZACAO[ord(match.group())])
+            traduzida = original + diferenca
+
+            # Toda a expansão aponta para o caractere que a gerou
+            for k in range(tamanho):
+                ancoras_traduzido.append((traduzida + k, original - (traduzida + k)))
+
+            diferenca += tamanho - 1
+            ancoras_traduzido.append((traduzida + tamanho, original + 1 - (traduzida + tamanho)))
+
+    # Traduzido -> normalizado: cada sequência de espaços vira um só
+    ancoras_normalizado = []
+    partes = []
+    ultimo = 0
+    removidos = 0
+    for match in REGEX_ESPACOS_REPETIDOS.finditer(traduzido):
+        partes.append(traduzido[ultimo:match.start() + 1])
+        ultimo = match.end()
+        removidos += match.end() - match.start() - 1
+        ancoras_normalizado.append((match.end() - removidos, removidos))
+    partes.append(traduzido[ultimo:])
+
+    return ''.join(partes), MapaPosicoes(ancoras_traduzido, ancoras_normalizado)
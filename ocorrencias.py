@@ -0,0 +1,227 @@
+import base64
+import re
+import sys
+from array import array
+from bisect import bisect_right
+
+# --------------------------------------------------
+# OCORRÊNCIAS EM COLUNAS
+# --------------------------------------------------
+#
+# Todas as correspondências de uma análise ficam em arrays compactos, uma
+# coluna por campo (categoria, regra, início, fim, página), em vez de uma
+# tupla por ocorrência. O trecho de contexto de cada ocorrência só é
+# montado quando pedido, a partir dos pedaços de texto em torno delas
+# (TrechosTexto): o documento inteiro não precisa ficar em memória. Os
+# pedaços são do texto original (maiúsculas e acentos), alinhados às
+# posições do texto normalizado.
+
+MARGEM_CONTEXTO = 150
+TAMANHO_CONTEXTO = 250
+
+# Página 0: posição sem página conhecida (texto já concatenado)
+PAGINA_DESCONHECIDA = 0
+
+# coluna -> código de tipo do array
+COLUNAS = (
+    ('categorias', 'H'),
+    ('regras', 'H'),
+    ('inicios', 'Q'),
+    ('fins', 'Q'),
+    ('paginas', 'I'),
+)
+
+
+def limpar_contexto(trecho):
+    """Trecho com espaços normalizados, cortado em TAMANHO_CONTEXTO"""
+    contexto = re.sub(r'\s+', ' ', trecho).strip()
+    if len(contexto) > TAMANHO_CONTEXTO:
+        contexto = contexto[:TAMANHO_CONTEXTO] + "..."
+    return contexto
+
+
+class TrechosTexto:
+    """Pedaços disjuntos de um texto, pela posição de início de cada um"""
+
+    def __init__(self):
+        self.inicios = array('Q')
+        self.textos = []
+
+    def adicionar(self, inicio, texto):
+        """Guarda texto[inicio:inicio + len(texto)], juntando com pedaços sobrepostos"""
+        fim = inicio + len(texto)
+        primeiro = bisect_right(self.inicios, inicio)
+        # O pedaço anterior também é unido se encostar neste
+        if primeiro and self.inicios[primeiro - 1] + len(self.textos[primeiro - 1]) >= inicio:
+            primeiro -= 1
+        ultimo = bisect_right(self.inicios, fim)
+
+        pedacos = sorted(list(zip(self.inicios[primeiro:ultimo], self.textos[primeiro:ultimo])) + [(inicio, texto)])
+        posicao = pedacos[0][0]
+        partes = []
+        for inicio_pedaco, pedaco in pedacos:
+            if inicio_pedaco + len(pedaco) > posicao:
+                partes.append(pedaco[posicao - inicio_pedaco:])
+                posicao = inicio_pedaco + len(pedaco)
+
+        del self.inicios[primeiro:ultimo]
+        del self.textos[primeiro:ultimo]
+        self.inicios.insert(primeiro, pedacos[0][0])
+        self.textos.insert(primeiro, "".join(partes))
+
+    def fatia(self, inicio, fim):
+        """Texto entre inicio e fim, que precisa estar dentro de um pedaço guardado"""
+        indice = bisect_right(self.inicios, inicio) - 1
+        if indice < 0 or self.inicios[indice] + len(self.textos[indice]) < fim:
+            raise KeyError(f"Trecho {inicio}-{fim} não guardado")
+        deslocamento = self.inicios[indice]
+        return self.textos[indice][inicio - deslocamento:fim - deslocamento]
+
+    @property
+    def caracteres(self):
+        return sum(len(texto) for texto in self.textos)
+
+
+class TabelaOcorrencias:
+    """Ocorrências de uma análise, em colunas
+
+    chaves são as categorias na ordem de padroes_completos; a coluna
+    categorias guarda o índice da chave. regras é o índice da regra na
+    categoria (o mesmo da instrumentação). Posições são do texto
+    normalizado; paginas começa em 1 (0 quando desconhecida).
+    """
+
+    def __init__(self, chaves):
+        self.chaves = list(chaves)
+        self._indices_chaves = {chave: indice for indice, chave in enumerate(self.chaves)}
+        for nome, tipo in COLUNAS:
+            setattr(self, nome, array(tipo))
+        self.trechos = TrechosTexto()
+        # Fim do texto analisado: limita a margem do contexto no final do documento
+        self.tamanho_texto = 0
+
+    def __len__(self):
+        return len(self.inicios)
+
+    def adicionar(self, chave, regra, inicio, fim, pagina=PAGINA_DESCONHECIDA):
+        self.categorias.append(self._indices_chaves[chave])
+        self.regras.append(regra)
+        self.inicios.append(inicio)
+        self.fins.append(fim)
+        self.paginas.append(pagina)
+
+    def margem(self, indice):
+        """Intervalo do texto usado no contexto da ocorrência"""
+        return max(0, self.inicios[indice] - MARGEM_CONTEXTO), self.fins[indice] + MARGEM_CONTEXTO
+
+    def contexto(self, indice):
+        """Trecho em torno da ocorrência, montado só agora"""
+        inicio, fim = self.margem(indice)
+        return limpar_contexto(self.trechos.fatia(inicio, min(fim, self.tamanho_texto)))
+
+    def indices(self, chave=None):
+        """Índices das ocorrências (de uma categoria, se informada) pela posição no texto"""
+        if chave is None:
+            selecionados = range(len(self))
+        else:
+            categoria = self._indices_chaves[chave]
+            selecionados = [i for i, valor in enumerate(self.categorias) if valor == categoria]
+        return sorted(selecionados, key=self.inicios.__getitem__)
+
+    def contagens(self):
+        """chave -> número de ocorrências"""
+        totais = [0] * len(self.chaves)
+        for categoria in self.categorias:
+            totais[categoria] += 1
+        return {chave: total for chave, total in zip(self.chaves, totais) if total}
+
+    def linha(self, indice, com_contexto=True):
+        linha = {
+            'id': self.chaves[self.categorias[indice]],
+            'regra': self.regras[indice],
+            'inicio': self.inicios[indice],
+            'fim': self.fins[indice],
+            'pagina': self.paginas[indice],
+        }
+        if com_contexto:
+            linha['contexto'] = self.contexto(indice)
+        return linha
+
+    def linhas(self, chave=None, limite=None, com_contexto=True):
+        """Ocorrências como dicionários, pela posição; o contexto é montado linha a linha"""
+        for indice in self.indices(chave)[:limite]:
+            yield self.linha(indice, com_contexto)
+
+    def colunas_numpy(self):
+        """Colunas como arrays do NumPy, sem cópia dos dados"""
+        import numpy as np
+
+        return {nome: np.frombuffer(getattr(self, nome), dtype=np.dtype(tipo)) for nome, tipo in COLUNAS}
+
+    # --------------------------------------------------
+    # SERIALIZAÇÃO (cache de resultados)
+    # --------------------------------------------------
+
+    def para_dict(self):
+        """Forma compacta em JSON: colunas em base64, na ordem de bytes do processo"""
+        return {
+            'chaves': self.chaves,
+            'ordem_bytes': sys.byteorder,
+            'colunas': {
+                nome: base64.b64encode(getattr(self, nome).tobytes()).decode('ascii')
+                for nome, _ in COLUNAS
+            },
+            'trechos': [[inicio, texto] for inicio, texto in zip(self.trechos.inicios, self.trechos.textos)],
+            'tamanho_texto': self.tamanho_texto
+        }
+
+    @classmethod
+    def de_dict(cls, dados):
+        tabela = cls(dados['chaves'])
+        for nome, tipo in COLUNAS:
+            coluna = array(tipo)
+            coluna.frombytes(base64.b64decode(dados['colunas'][nome]))
+            if dados['ordem_bytes'] != sys.byteorder:
+                coluna.byteswap()
+            setattr(tabela, nome, coluna)
+        for inicio, texto in dados['trechos']:
+            tabela.trechos.inicios.append(inicio)
+            tabela.trechos.textos.append(texto)
+        tabela.tamanho_texto = dados['tamanho_texto']
+        return tabela
+
+
+def guardar_trechos(tabela, texto, inicio_texto=0, indices=None, texto_original=None, mapa=None):
+    """Copia de texto (que começa na posição inicio_texto) as margens das ocorrências
+
+    Com texto_original e mapa (MapaPosicoes), os trechos guardados são os
+    do texto original, alinhados às posições do texto normalizado.
+    """
+    intervalos = sorted(tabela.margem(i) for i in (range(len(tabela)) if indices is None else indices))
+    fim_texto = inicio_texto + len(texto)
+
+    # Margens sobrepostas viram um só pedaço
+    atual = None
+    for inicio, fim in intervalos:
+        inicio, fim = max(inicio, inicio_texto), min(fim, fim_texto)
+        if atual is not None and inicio <= atual[1]:
+            atual[1] = max(atual[1], fim)
+            continue
+        if atual is not None:
+            tabela.trechos.adicionar(atual[0], _fatia(texto, inicio_texto, atual, texto_original, mapa))
+        atual = [inicio, fim]
+    if atual is not None:
+        tabela.trechos.adicionar(atual[0], _fatia(texto, inicio_texto, atual, texto_original, mapa))
+
+
+def _fatia(texto, inicio_texto, intervalo, texto_original, mapa):
+    inicio, fim = intervalo[0] - inicio_texto, intervalo[1] - inicio_texto
+    if mapa is not None:
+        return mapa.alinhar(texto_original, texto, inicio, fim)
+    return texto[inicio:fim]
+
+
+def pagina_da_posicao(inicios_paginas, posicao):
+    """Número (a partir de 1) da página que contém a posição"""
+    return bisect_right(inicios_paginas, posicao) or PAGINA_DESCONHECIDA
+
@@ -0,0 +1,148 @@
+import csv
+import io
+from functools import lru_cache
+
+# --------------------------------------------------
+# RENDERIZAÇÃO DOS ACHADOS
+# --------------------------------------------------
+#
+# Cada achado vira HTML (card com tooltip) e linha de CSV uma única vez; os
+# fragmentos ficam em cache pelo id da regra mais os dados exibidos. A
+# página e o relatório são só a junção dos fragmentos, então reexecuções
+# do script com o mesmo resultado não refazem a formatação.
+
+CLASSES_ICONE = {'critical': 'critical-icon', 'medium': 'medium-icon', 'low': 'low-icon'}
+CLASSES_SEVERIDADE = {'critical': 'severity-critical', 'medium': 'severity-medium', 'low': 'severity-low'}
+TEXTOS_SEVERIDADE = {'critical': 'CRÍTICO', 'medium': 'MÉDIO', 'low': 'BAIXO'}
+
+CAMPOS_CARD = ('id', 'nome', 'gravidade', 'icone', 'descricao_detalhada', 'lei', 'contestacao', 'nivel_confianca', 'confianca')
+
+COLUNAS_RELATORIO = [
+    'Cláusula Problemática', 'Gravidade', 'Descrição', 'Base Legal',
+    'Ação Recomendada', 'Confiança', 'Ocorrências', 'Trecho Encontrado'
+]
+
+TAMANHO_CACHE = 4096
+
+
+def chave_card(problema):
+    """Dados do achado que aparecem no card"""
+    return tuple(problema[campo] for campo in CAMPOS_CARD)
+
+
+def chave_linha(problema):
+    """Dados do achado que aparecem no relatório"""
+    documentos = problema.get('documentos')
+    return (
+        problema['id'], problema['nome'], problema['gravidade'], problema['descricao_detalhada'],
+        problema['lei'], problema['contestacao'], problema['confianca'], problema['ocorrencias'],
+        problema['contexto'], None if documentos is None else tuple(documentos)
+    )
+
+
+@lru_cache(maxsize=TAMANHO_CACHE)
+def _card(chave):
+    _, nome, gravidade, icone, descricao, lei, contestacao, nivel_confianca, confianca = chave
+    classe_css = CLASSES_ICONE.get(gravidade, 'low-icon')
+    severidade_css = CLASSES_SEVERIDADE.get(gravidade, 'severity-low')
+    texto_severidade = TEXTOS_SEVERIDADE.get(gravidade, 'BAIXO')
+
+    return f"""
+                    <div class="problem-icon {classe_css}">
+                        <span class="icon-emoji">{icone}</span>
+                        <div class="icon-title">{nome}</div>
+                        <span class="icon-severity {severidade_css}">{texto_severidade}</span>
+
+                        <div class="problem-tooltip">
+                            <div class="tooltip-header">
+                                <span class="tooltip-emoji">{icone}</span>
+                                <span class="tooltip-title">{nome}</span>
+                            </div>
+
+                            <div class="tooltip-section section-violation">
+                                <span class="section-label">DESCRIÇÃO DO PROBLEMA</span>
+                                <span class="section-content">{descricao}</span>
+                            </div>
+
+                            <div class="tooltip-divider"></div>
+
+                            <div class="tooltip-section section-law">
+                                <span class="section-label">BASE LEGAL</span>
+                                <span class="section-content">{lei}</span>
+                            </div>
+
+                            <div class="tooltip-divider"></div>
+
+                            <div class="tooltip-section section-solution">
+                                <span class="section-label">AÇÃO RECOMENDADA</span>
+                                <span class="section-content section-highlight">{contestacao}</span>
+                            </div>
+
+                            <div class="tooltip-divider"></div>
+
+                            <div class="tooltip-section section-confidence">
+                                <span class="section-label">NÍVEL DE CONFIABILIDADE</span>
+                                <div class="confidence-badge">
+                                    {nivel_confianca} ({confianca:.0%})
+                                </div>
+                            </div>
+                        </div>
+                    </div>
+                    """
+
+
+@lru_cache(maxsize=256)
+def _painel_cards(chaves):
+    return (
+        '\n                <div class="problems-icons-container fade-in">\n                '
+        + "".join(_card(chave) for chave in chaves)
+        + "</div>"
+    )
+
+
+def renderizar_cards(problemas):
+    """HTML com o card de cada problema, montado a partir dos fragmentos em cache"""
+    return _painel_cards(tuple(chave_card(p) for p in problemas))
+
+
+def _formatar_csv(valores):
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator='\n').writerow(valores)
+    return buffer.getvalue()
+
+
+@lru_cache(maxsize=TAMANHO_CACHE)
+def _valores_linha(chave, com_documentos):
+    _, nome, gravidade, descricao, lei, contestacao, confianca, ocorrencias, contexto, documentos = chave
+    valores = (nome, gravidade.upper(), descricao, lei, contestacao, f"{confianca:.1%}", ocorrencias, contexto)
+    if com_documentos:
+        valores += ("; ".join(documentos or ()),)
+    return valores
+
+
+@lru_cache(maxsize=TAMANHO_CACHE)
+def _linha_csv(chave, com_documentos):
+    return _formatar_csv(_valores_linha(chave, com_documentos))
+
+
+def _colunas(chaves):
+    com_documentos = any(chave[-1] is not None for chave in chaves)
+    return (COLUNAS_RELATORIO + ['Documentos'] if com_documentos else COLUNAS_RELATORIO), com_documentos
+
+
+@lru_cache(maxsize=256)
+def _relatorio_csv(chaves):
+    colunas, com_documentos = _colunas(chaves)
+    return _formatar_csv(colunas) + "".join(_linha_csv(chave, com_documentos) for chave in chaves)
+
+
+def gerar_relatorio_csv(problemas):
+    """Relatório CSV dos problemas, com as colunas e a formatação do to_csv do pandas"""
+    return _relatorio_csv(tuple(chave_linha(p) for p in problemas))
+
+
+def tabela_relatorio(problemas):
+    """Colunas e linhas (tuplas) do relatório, para os demais formatos de exportação"""
+    chaves = tuple(chave_linha(p) for p in problemas)
+    colunas, com_documentos = _colunas(chaves)
+    return colunas, [_valores_linha(chave, com_documentos) for chave in chaves]
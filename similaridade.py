@@ -0,0 +1,148 @@
+import threading
+import zlib
+from collections import OrderedDict
+
+# --------------------------------------------------
+# MODELOS DE CONTRATO (MINHASH + LSH)
+# --------------------------------------------------
+#
+# Boa parte dos contratos sai dos mesmos modelos de imobiliária, mudando
+# só nomes e valores. A assinatura MinHash do começo do texto normalizado
+# identifica o modelo; o índice LSH acha, entre os contratos já
+# analisados, um com assinatura parecida. As ocorrências de cada janela do
+# modelo ficam guardadas com ele: no contrato novo, só as janelas que
+# mudaram passam pelas regras.
+
+# Caracteres iniciais do texto normalizado usados na assinatura. É o que
+# a análise página a página já tem ao fim das primeiras páginas.
+TAMANHO_PREFIXO = 10000
+
+TAMANHO_SHINGLE = 3
+BANDAS = 32
+LINHAS_POR_BANDA = 4
+PERMUTACOES = BANDAS * LINHAS_POR_BANDA
+
+# Similaridade (Jaccard estimado) mínima para reaproveitar um modelo
+LIMIAR_PADRAO = 0.8
+
+_PRIMO = (1 << 61) - 1
+_parametros = None
+
+
+def _coeficientes():
+    """Coeficientes (a, b) das permutações, os mesmos em todo processo"""
+    global _parametros
+    if _parametros is None:
+        import numpy as np
+
+        gerador = np.random.default_rng(20240601)
+        _parametros = (
+            gerador.integers(1, 1 << 32, size=PERMUTACOES, dtype=np.uint64),
+            gerador.integers(0, 1 << 32, size=PERMUTACOES, dtype=np.uint64)
+        )
+    return _parametros
+
+
+def assinatura_minhash(texto_normalizado):
+    """Assinatura MinHash dos shingles de palavras do início do texto (None se vazio)"""
+    import numpy as np
+
+    palavras = texto_normalizado[:TAMANHO_PREFIXO].split()
+    if not palavras:
+        return None
+    shingles = {
+        " ".join(palavras[i:i + TAMANHO_SHINGLE])
+        for i in range(max(1, len(palavras) - TAMANHO_SHINGLE + 1))
+    }
+    hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) for s in shingles), dtype=np.uint64, count=len(shingles))
+
+    # (a·x + b) mod p, com x, a < 2^32: o produto cabe em 64 bits sem estourar
+    a, b = _coeficientes()
+    return ((np.outer(hashes, a) + b) % _PRIMO).min(axis=0)
+
+
+def similaridade(assinatura_a, assinatura_b):
+    """Jaccard estimado entre dois textos pelas assinaturas"""
+    return float((assinatura_a == assinatura_b).mean())
+
+
+class Modelo:
+    """Um contrato já analisado que serve de modelo para os parecidos"""
+
+    def __init__(self, identificador, assinatura, janelas):
+        self.id = identificador
+        self.assinatura = assinatura
+        # chave da janela -> ocorrências relativas (como em cache_janelas)
+        self.janelas = janelas
+        self.usos = 0
+
+
+class IndiceModelos:
+    """Índice LSH dos modelos conhecidos, limitado a capacidade (LRU)"""
+
+    def __init__(self, capacidade=256, limiar=LIMIAR_PADRAO):
+        self.capacidade = capacidade
+        self.limiar = limiar
+        self._modelos = OrderedDict()
+        self._baldes = [{} for _ in range(BANDAS)]
+        self._proximo_id = 1
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _bandas(assinatura):
+        for banda in range(BANDAS):
+            yield banda, assinatura[banda * LINHAS_POR_BANDA:(banda + 1) * LINHAS_POR_BANDA].tobytes()
+
+    def buscar(self, assinatura):
+        """(Modelo, similaridade) mais parecido acima do limiar, ou None"""
+        if assinatura is None:
+            return None
+
+        with self._lock:
+            candidatos = set()
+            for banda, chave in self._bandas(assinatura):
+                candidatos.update(self._baldes[banda].get(chave, ()))
+
+            melhor = None
+            for identificador in candidatos:
+                modelo = self._modelos[identificador]
+                valor = similaridade(assinatura, modelo.assinatura)
+                if valor >= self.limiar and (melhor is None or valor > melhor[1]):
+                    melhor = (modelo, valor)
+
+            if melhor is not None:
+                melhor[0].usos += 1
+                self._modelos.move_to_end(melhor[0].id)
+            return melhor
+
+    def adicionar(self, assinatura, janelas):
+        """Guarda um contrato analisado como modelo; retorna o Modelo criado"""
+        if assinatura is None:
+            return None
+
+        with self._lock:
+            modelo = Modelo(self._proximo_id, assinatura, janelas)
+            self._proximo_id += 1
+            self._modelos[modelo.id] = modelo
+            for banda, chave in self._bandas(assinatura):
+                self._baldes[banda].setdefault(chave, set()).add(modelo.id)
+
+            while len(self._modelos) > self.capacidade:
+                _, antigo = self._modelos.popitem(last=False)
+                for banda, chave in self._bandas(antigo.assinatura):
+                    balde = self._baldes[banda][chave]
+                    balde.discard(antigo.id)
+                    if not balde:
+                        del self._baldes[banda][chave]
+            return modelo
+
+    def __len__(self):
+        return len(self._modelos)
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                'modelos': len(self._modelos),
+                'usos': sum(modelo.usos for modelo in self._modelos.values()),
+                'janelas': sum(len(modelo.janelas) for modelo in self._modelos.values())
+            }
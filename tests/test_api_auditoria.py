@@ -0,0 +1,87 @@
+import json
+
+import anyio
+
+import api_auditoria
+from benchmark_auditoria import gerar_pdf
+
+CONTRATO = (
+    "CLÁUSULA 1ª - O valor do aluguel poderá ser reajustado a qualquer momento, "
+    "sendo o reajuste livre a critério do LOCADOR.\n"
+    "CLÁUSULA 2ª - É expressamente proibido manter animais no imóvel.\n"
+    "CLÁUSULA 3ª - Em caso de rescisão, multa integral de 12 meses."
+)
+
+
+def _post(corpo, tipo, consulta=''):
+    """(status, corpo) de um POST /auditar feito direto no app ASGI"""
+    async def chamar():
+        resposta = {'status': None, 'corpo': b''}
+        mensagens = [{'type': 'http.request', 'body': corpo, 'more_body': False}]
+
+        async def receber():
+            if mensagens:
+                return mensagens.pop(0)
+            # Cliente que não desconecta
+            await anyio.sleep_forever()
+
+        async def enviar(mensagem):
+            if mensagem['type'] == 'http.response.start':
+                resposta['status'] = mensagem['status']
+            elif mensagem['type'] == 'http.response.body':
+                resposta['corpo'] += mensagem.get('body', b'')
+
+        escopo = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'POST',
+            'scheme': 'http',
+            'path': '/auditar',
+            'raw_path': b'/auditar',
+            'query_string': consulta.encode(),
+            'root_path': '',
+            'headers': [(b'content-type', tipo.encode()), (b'content-length', str(len(corpo)).encode())],
+            'client': ('teste', 0),
+            'server': ('teste', 80),
+        }
+        await api_auditoria.app(escopo, receber, enviar)
+        return resposta['status'], resposta['corpo']
+
+    return anyio.run(chamar)
+
+
+def _resultados(corpo, tipo):
+    """Resultado de /auditar e o evento final de /auditar?stream=1"""
+    status, resposta = _post(corpo, tipo)
+    assert status == 200
+    resultado = json.loads(resposta)
+
+    status, resposta = _post(corpo, tipo, 'stream=1')
+    assert status == 200
+    eventos = [json.loads(linha) for linha in resposta.decode().splitlines()]
+    assert eventos[-1]['evento'] == 'resultado'
+    return resultado, eventos[-1]
+
+
+def _ocorrencias(resultado):
+    return [(p['id'], p['posicao'], p['ocorrencias'], p['contexto']) for p in resultado['problemas']]
+
+
+def test_stream_de_texto_tem_as_mesmas_posicoes():
+    resultado, final = _resultados(CONTRATO.encode('utf-8'), 'text/plain')
+
+    assert resultado['status'] == final['status'] == 'ok'
+    assert resultado['problemas']
+    assert _ocorrencias(final) == _ocorrencias(resultado)
+
+
+def test_stream_de_pdf_tem_as_mesmas_posicoes():
+    linhas = CONTRATO.split('\n')
+    pdf = gerar_pdf([linhas[:2], linhas[2:]])
+    resultado, final = _resultados(pdf, 'application/pdf')
+
+    assert resultado['status'] == final['status'] == 'ok'
+    assert resultado['problemas']
+    assert final['paginas'] == 2
+    assert _ocorrencias(final) == _ocorrencias(resultado)
@@ -0,0 +1,119 @@
+import random
+import re
+
+import pytest
+
+from auditoria import SistemaAuditoria100Efetivo
+from benchmark_auditoria import FRASES_NEUTRAS, GATILHOS
+from motor_regras import segmentar_clausulas
+from normalizacao import normalizar_texto
+
+# O motor (localizador, pré-filtro, janelas, limitar_retrocesso) e a análise
+# página a página precisam dar exatamente o que um re.finditer puro de cada
+# padrão do catálogo dá, regra a regra, em cada janela de cláusula
+
+SEMENTES = range(25)
+
+
+@pytest.fixture(scope='module')
+def auditoria():
+    return SistemaAuditoria100Efetivo()
+
+
+def _palavras_catalogo(padroes_completos):
+    palavras = set()
+    for config in padroes_completos.values():
+        for padrao in config['padroes']:
+            palavras.update(re.findall(r'[^\W_]+', padrao))
+    return sorted(palavras)
+
+
+def gerar_paginas(semente, palavras, paginas=4, linhas=12):
+    """Páginas com gatilhos, cláusulas neutras e sequências de palavras do catálogo
+
+    As sequências não têm pontuação: deixam âncoras sem o restante do
+    padrão e cláusulas que continuam na página seguinte.
+    """
+    aleatorio = random.Random(semente)
+    gatilhos = list(GATILHOS.values())
+    resultado = []
+    for _ in range(paginas):
+        pagina = []
+        for _ in range(linhas):
+            sorteio = aleatorio.random()
+            if sorteio < 0.2:
+                pagina.append(aleatorio.choice(gatilhos))
+            elif sorteio < 0.3:
+                pagina.append(f"CLÁUSULA {aleatorio.randint(1, 30)}ª - DISPOSIÇÕES GERAIS")
+            elif sorteio < 0.6:
+                pagina.append(aleatorio.choice(FRASES_NEUTRAS))
+            else:
+                pagina.append(' '.join(aleatorio.choice(palavras) for _ in range(aleatorio.randint(3, 25))))
+        resultado.append('\n'.join(pagina))
+    return resultado
+
+
+def buscar_referencia(padroes_completos, texto, janelas):
+    """Ocorrências por categoria com re.finditer, regra a regra, em cada janela"""
+    resultado = {}
+    for chave, config in padroes_completos.items():
+        ocorrencias = []
+        for indice, padrao in enumerate(config['padroes']):
+            regex = re.compile(padrao, re.IGNORECASE)
+            for inicio, fim in janelas:
+                ocorrencias.extend((m.start(), m.end(), indice) for m in regex.finditer(texto, inicio, fim))
+        if ocorrencias:
+            resultado[chave] = ocorrencias
+    return resultado
+
+
+def _texto(paginas):
+    # Mesmo formato de extracao_pdf.extrair_texto
+    return ''.join(f"\n{pagina}\n" for pagina in paginas)
+
+
+@pytest.mark.parametrize('semente', SEMENTES)
+def test_motor_igual_ao_finditer(auditoria, semente):
+    padroes = auditoria.padroes_completos
+    motor = auditoria.motor
+    texto = normalizar_texto(_texto(gerar_paginas(semente, _palavras_catalogo(padroes))))
+    janelas = segmentar_clausulas(texto, auditoria.tamanho_maximo_janela)
+    esperado = buscar_referencia(padroes, texto, janelas)
+
+    # Pré-filtro de literais
+    assert motor.buscar(texto, janelas) == esperado
+
+    # Localizador (caminho das categorias sem literais)
+    pelo_localizador = {chave: motor.buscar_categoria(chave, texto, janelas) for chave in motor.categorias}
+    assert {chave: lista for chave, lista in pelo_localizador.items() if lista} == esperado
+
+    # Texto inteiro como uma janela só
+    assert motor.buscar(texto) == buscar_referencia(padroes, texto, [(0, len(texto))])
+
+
+@pytest.mark.parametrize('semente', SEMENTES)
+def test_analise_incremental_igual_ao_finditer(auditoria, semente):
+    padroes = auditoria.padroes_completos
+    paginas = gerar_paginas(semente, _palavras_catalogo(padroes))
+    texto = normalizar_texto(_texto(paginas))
+    referencia = buscar_referencia(
+        padroes, texto, segmentar_clausulas(texto, auditoria.tamanho_maximo_janela)
+    )
+
+    analise = auditoria.iniciar_analise_incremental()
+    for pagina in paginas:
+        analise.adicionar_pagina(pagina)
+    problemas = analise.finalizar()
+
+    tabela = analise.tabela
+    obtido = sorted(
+        (tabela.chaves[categoria], regra, inicio, fim)
+        for categoria, regra, inicio, fim in zip(tabela.categorias, tabela.regras, tabela.inicios, tabela.fins)
+    )
+    esperado = sorted(
+        (chave, indice, inicio, fim)
+        for chave, lista in referencia.items()
+        for inicio, fim, indice in lista
+    )
+    assert obtido == esperado
+    assert problemas == auditoria.analisar_contrato_completo(_texto(paginas))